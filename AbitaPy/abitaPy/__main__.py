@@ -5,10 +5,15 @@
 
 import sys
 import logging
-from typing import Tuple, List
+from typing import Any, Dict, Tuple, List
 from .abiFile import AbiFile
 from .algo import Algo
+from .cache import GeomCache
+from .catalogue import LotCatalogue
+from .components import ComponentSolver
 from .geom import Geom
+from .multilevel import MultilevelSolver
+from .pipeline import FloorPipeline
 from .population import Population
 
 
@@ -22,11 +27,69 @@ Usage: python3 -m abitaPy [option]
 
 Options:
   -h, --help       show this help message and exit
+  -w, --weld TOL   merge the points of a floor closer than TOL meters
+  -s, --split      split the edges at the points of collinear edges
+  -r, --renumber   renumber the elements so that neighbours are close in
+                   memory
+  -n, --no-cache   do not use the cache of built geometries
+  -j, --jobs N     solve the independent parts of the geometry (floors,
+                   buildings) in N processes, 0 for one per processor
+  -f, --floors     solve the floors separately, under quotas of the numbers
+                   of lots of each type reallocated between the floors
+  -m, --multilevel solve coarser geometries first, merging small adjacent
+                   elements, then refine the solutions on the geometry
+  -c, --catalogue  seed the random solutions with candidate lots enumerated
+                   once per geometry (and kept in the cache)
 """
 
 logging.basicConfig(format="%(levelname)s: %(message)s")
 
 
+def getOptions(*args: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """Get the options given before the file names.
+    
+    Parameters
+    ----------
+    args: str[]
+        The list of arguments passed to the command
+    
+    Returns
+    -------
+    options, args: Dict[str, Any], str[]
+        The options by name, and the remaining arguments.
+    """
+
+    options = {'weld': 0.0, 'split': False, 'renumber': False, 'cache': True,
+               'jobs': None, 'floors': False, 'multilevel': False,
+               'catalogue': False}
+    args = list(args)
+    while len(args) > 0 and args[0].startswith('-'):
+        option = args.pop(0)
+        if option == "-h" or option == "--help":
+            print(HELP_MESSAGE)
+            exit()
+        elif (option == "-w" or option == "--weld") and len(args) > 0:
+            options['weld'] = float(args.pop(0))
+        elif option == "-s" or option == "--split":
+            options['split'] = True
+        elif option == "-r" or option == "--renumber":
+            options['renumber'] = True
+        elif option == "-n" or option == "--no-cache":
+            options['cache'] = False
+        elif (option == "-j" or option == "--jobs") and len(args) > 0:
+            options['jobs'] = int(args.pop(0))
+        elif option == "-f" or option == "--floors":
+            options['floors'] = True
+        elif option == "-m" or option == "--multilevel":
+            options['multilevel'] = True
+        elif option == "-c" or option == "--catalogue":
+            options['catalogue'] = True
+        else:
+            print(HELP_MESSAGE)
+            exit()
+    return options, args
+
+
 def getFileNames(*args: List[str]) -> Tuple[str, str]:
     """Get the name of the files for input and output.
     
@@ -80,13 +143,25 @@ def getFileNames(*args: List[str]) -> Tuple[str, str]:
     return fileNameIn, fileNameOut
 
 
-def readInput(fileNameIn: str) -> Tuple[Geom, Population, Algo]:
+def readInput(fileNameIn: str, weldTolerance: float = 0.0,
+              splitEdges: bool = False, renumber: bool = False,
+              useCache: bool = False) -> Tuple[Geom, Population, Algo]:
     """Read a file and construct the apropriate geom, popu and algo objects.
     
     Parameters
     ----------
     fileNameIn: str
         The name of the input file
+    weldTolerance: float, optional
+        The distance under which points are merged, default to 0 (no merge)
+    splitEdges: bool, optional
+        Whether the edges are split at T-junctions, default to False
+    renumber: bool, optional
+        Whether the elements are renumbered in reverse Cuthill-McKee order,
+        default to False
+    useCache: bool, optional
+        Whether built geometries are restored from and saved in the cache,
+        default to False
     
     Returns
     -------
@@ -99,14 +174,40 @@ def readInput(fileNameIn: str) -> Tuple[Geom, Population, Algo]:
     """
 
     geom = Geom()
+    geom.weldTolerance = weldTolerance
+    geom.splitEdges = splitEdges
+    geom.renumber = renumber
     popu = Population()
     algo = Algo(geom, popu)
-    file = AbiFile(fileNameIn)
+    file = AbiFile(fileNameIn, GeomCache() if useCache else None)
     file.read(geom, popu, algo)
+    if weldTolerance > 0:
+        print('Points welded: {}'.format(geom.nbWelded))
     return geom, popu, algo
 
 
-def solveProblem(geom: Geom, popu: Population, algo: Algo) -> None:
+def buildCatalogue(algo: Algo, useCache: bool = False) -> None:
+    """Build the catalogue of candidate lots of the problem, used by the
+    algorithm.
+
+    Parameters
+    ----------
+    algo:
+        The algorithm parameters, with the built geometry
+    useCache: bool, optional
+        Whether the catalogue is restored from and saved in the cache,
+        default to False
+    """
+
+    algo.setDefaultTypes()
+    algo.catalogue = LotCatalogue(algo)
+    algo.catalogue.build(GeomCache() if useCache else None)
+    print('Candidate lots: {}'.format(algo.catalogue.nbLots))
+
+
+def solveProblem(geom: Geom, popu: Population, algo: Algo,
+                 nbJobs: int = None, byFloor: bool = False,
+                 multilevel: bool = False) -> None:
     """Solve the given problem. Update geom, popu and algo during the execution.
     
     Parameters
@@ -117,8 +218,45 @@ def solveProblem(geom: Geom, popu: Population, algo: Algo) -> None:
         The population of the algorithm
     algo:
         The algorithm parameters
+    nbJobs: int, optional
+        If given, the connected components of the geometry are solved
+        independently in nbJobs processes (0 for one per processor), default
+        to None (the geometry is solved as a whole)
+    byFloor: bool, optional
+        If True, the floors are solved separately by a FloorPipeline, in
+        nbJobs processes, default to False
+    multilevel: bool, optional
+        If True, the problem is solved by a MultilevelSolver, default to
+        False
     """
 
+    if byFloor:
+        solver = FloorPipeline(algo, nbJobs or 0)
+        solver.run()
+        print("")
+        print("Floors solved: {} in {} rounds".format(
+            len(solver.floorParts()), solver.nbRounds))
+        print("Fitness: min {:.2f}, average {:.2f}, max {:.2f}".format(
+            popu.minFitness, popu.avgFitness, popu.maxFitness))
+        return
+    if multilevel:
+        solver = MultilevelSolver(algo)
+        solver.run()
+        print("")
+        print("Levels solved: {}".format(len(solver.levelList) + 1))
+        print("Fitness: min {:.2f}, average {:.2f}, max {:.2f}".format(
+            popu.minFitness, popu.avgFitness, popu.maxFitness))
+        return
+    if nbJobs is not None:
+        solver = ComponentSolver(algo, nbJobs)
+        print("")
+        print("Components solved: {}".format(len(solver.componentList)))
+        solver.run()
+        print("")
+        print("Fitness: min {:.2f}, average {:.2f}, max {:.2f}".format(
+            popu.minFitness, popu.avgFitness, popu.maxFitness))
+        return
+
     print("")
     print("")
     print("             statistics              ")
@@ -162,13 +300,14 @@ def saveOuput(geom: Geom, popu: Population, algo: Algo, fileNameOut: str) -> Non
 
 def main():
     """Run the main program."""
-    args = sys.argv[1:]
-    if len(args) > 0 and (args[0] == "-h" or args[0] == "--help"):
-        print(HELP_MESSAGE)
-        exit()
+    options, args = getOptions(*sys.argv[1:])
     fileNameIn, fileNameOut = getFileNames(*args)
-    geom, popu, algo = readInput(fileNameIn)
-    solveProblem(geom, popu, algo)
+    geom, popu, algo = readInput(fileNameIn, options['weld'], options['split'],
+                                 options['renumber'], options['cache'])
+    if options['catalogue']:
+        buildCatalogue(algo, options['cache'])
+    solveProblem(geom, popu, algo, options['jobs'], options['floors'],
+                 options['multilevel'])
     saveOuput(geom, popu, algo, fileNameOut)
     
 
@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 
 from .algo import Algo
+from .cache import GeomCache
 from .geom import Geom
 from .population import Population
-from .utils import exists_by_attr, get_by_attr
+from .utils import get_by_no
 
 import ply.lex as lex
 import ply.yacc as yacc
@@ -17,10 +18,12 @@ class AbiFile:
     ----------
     _fileName : str
         The name of the file we want to read or write in
+    _cache : GeomCache
+        The cache of built geometries used when reading, or None
     
     Methods
     -------
-    __init__(fileName: str) -> None
+    __init__(fileName: str, cache: GeomCache) -> None
         Create an AbiFile instance with its file name
     write(geom: Geom, popu: Population, algo: Algo) -> None
         Write and save current data in a .abi file
@@ -28,15 +31,20 @@ class AbiFile:
         Read a .abi file and import data in the program
     """
 
-    def __init__(self, fileName:str) -> None:
+    def __init__(self, fileName:str, cache:GeomCache=None) -> None:
         """Constructor for the AbiFile class.
         
         Parameters
         ----------
         fileName : str
             The name of the file we want to read or write in.
+        cache : GeomCache, optional
+            The cache from which built geometries are restored when reading,
+            instead of parsing and building them again, default to None (no
+            cache)
         """
         self._fileName = fileName
+        self._cache = cache
     
     
     def write(self, geom: Geom, popu: Population, algo: Algo) -> None:
@@ -166,12 +174,35 @@ class AbiFile:
         program = finput.read()
         finput.close()
 
-        # execute the parser
-        parser = AbiParser(geom, popu, algo).parser
-        parser.parse(program)
+        # restore the built geometry from the cache, then only parse the
+        # other commands, or parse the whole file and build the geometry
+        abiParser = AbiParser(geom, popu, algo)
+        parser = abiParser.parser
+        if self._cache is not None:
+            try:
+                geometry, others = self._cache.split(program)
+                key = self._cache.key(geometry, geom)
+            except ValueError:
+                # syntax error, reported by the parser
+                key = None
+            if key is not None and self._cache.load(key, geom):
+                if len(others) > 0:
+                    parser.parse(others)
+            else:
+                parser.parse(program)
+                geom.build()
+                if key is not None:
+                    self._cache.store(key, geom)
+        else:
+            parser.parse(program)
+            geom.build()
+
+        # the lots are distributed once the elements have their final index,
+        # and the solutions indexed by the hash of their distribution
+        abiParser.setLots()
+        popu.reindex()
 
-        # initialize geometry, population, and algorithm
-        geom.build()
+        # initialize population, and algorithm
         for sol in popu.solutionList: 
             algo.evaluate(sol)
         popu.stats()
@@ -239,6 +270,7 @@ class AbiParser:
 
         self.floorId = 0
         self.solId = -1
+        self.lotList = []
         self.geom = geom
         self.popu = popu
         self.algo = algo
@@ -281,7 +313,7 @@ class AbiParser:
                 p.lineno(1),
                 no))
         # check if element already exists
-        if exists_by_attr(self.geom.elementList, 'no', no):
+        if no in self.geom.elementMap:
             raise Exception('Error at line {}: Element {} is already defined!'.format(
                 p.lineno(1),
                 no))
@@ -295,7 +327,7 @@ class AbiParser:
     def p_point_list(self, p):
         '''p_list : id p_list 
                   | id'''
-        pt = get_by_attr(self.geom.pointList, 'no', p[1])
+        pt = get_by_no(self.geom.pointMap, p[1])
         p[0] = [pt]
         if len(p) > 2:
             p[0] += p[2]
@@ -314,14 +346,25 @@ class AbiParser:
             raise Exception('Error at line {}: Lot {} has wrong number of elements.'.format(
                 p.lineno(1),
                 no))
+        sol = self.popu.solutionList[self.solId]
         for elt in elt_list:
-            elt_id = self.geom.elementList.index(elt)
-            self.popu.solutionList[self.solId].distribution[elt_id] = no
+            sol.distribution[elt.index] = no
+        self.lotList.append((sol, no, elt_list))
+
+    def setLots(self):
+        """Distribute again the elements of the lots read in their solutions,
+        as the elements may be renumbered when the geometry is built."""
+        for sol, _, _ in self.lotList:
+            sol.distribution = [-1] * sol.nbElements
+        for sol, no, elt_list in self.lotList:
+            for elt in elt_list:
+                sol.distribution[elt.index] = no
+        self.lotList = []
     
     def p_elt_list(self, p):
         '''elt_list : id elt_list 
                     | id'''
-        elt = get_by_attr(self.geom.elementList, 'no', p[1])
+        elt = get_by_no(self.geom.elementMap, p[1])
         p[0] = [elt]
         if len(p) > 2:
             p[0] += p[2]
@@ -329,7 +372,7 @@ class AbiParser:
     def p_def_point(self, p):
         '''cmd : DEF_POINT id NUMBER NUMBER'''
         no, x, y = p[2:]
-        if exists_by_attr(self.geom.pointList, 'no', no):
+        if no in self.geom.pointMap:
             raise Exception('Error at line {}: Point {} is already defined!'.format(
                 p.lineno(1),
                 no))
@@ -350,7 +393,7 @@ class AbiParser:
         '''cmd : DEF_TYPE id NUMBER NUMBER NUMBER nb nb'''
         no, benefit, areaMin, areaMax, nbMin, nbMax = p[2:]
         # check if tye already exists
-        if exists_by_attr(self.algo.typeList, 'no', no):
+        if no in self.algo.typeMap:
             raise Exception('Error at line {}: Type {} is already defined!'.format(
                 p.lineno(1),
                 no))
@@ -365,26 +408,26 @@ class AbiParser:
     def p_cmd_set_bonus(self, p):
         '''cmd : SET_BONUS id NUMBER'''
         no, val = p[2:]
-        elt = get_by_attr(self.geom.elementList, 'no', no)
+        elt = get_by_no(self.geom.elementMap, no)
         elt.bonus = val
     
     def p_cmd_set_as_common(self, p):
         '''cmd : SET_AS_COMMON id'''
         no = p[2]
-        elt = get_by_attr(self.geom.elementList, 'no', no)
+        elt = get_by_no(self.geom.elementMap, no)
         elt.common = True
     
     def p_cmd_set_as_imposed(self, p):
         '''cmd : SET_AS_IMPOSED id'''
         no = p[2]
-        elt = get_by_attr(self.geom.elementList, 'no', no)
+        elt = get_by_no(self.geom.elementMap, no)
         elt.common = True
         elt.imposed = True
     
     def p_set_as_exit(self, p):
         '''cmd : SET_AS_EXIT id'''
         no = p[2]
-        elt = get_by_attr(self.geom.elementList, 'no', no)
+        elt = get_by_no(self.geom.elementMap, no)
         elt.common = True
         elt.imposed = True
         elt.exit = True
@@ -1,12 +1,17 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import logging
+
+from .element import Element
 from .geom import Geom
+from .move import Move
 from .population import Population
+from .presolve import Presolve
 from .solution import Solution
 from .tx import Tx
 
-from typing import Union
+from typing import Dict, List, Tuple, Union
 from random import random
 
 class Algo:
@@ -32,10 +37,18 @@ class Algo:
         Length of the typeList list
     typeList : List[Tx]
         List of all type of lots we have to use
+    typeMap : Dict[int, Tx]
+        Types of typeList indexed by their numero
     _minLots : int
         The minimum number of lots we want in each solution
     _maxLots : int
         The maxmimum number of lots we want in each solution
+    presolve : Presolve
+        The analysis of the problem done before the first iteration, None
+        until then
+    catalogue : LotCatalogue
+        The candidate lots from which random solutions are seeded, or None
+        to grow the lots from single elements
     
     Methods
     -------
@@ -67,6 +80,9 @@ class Algo:
         self.alpha = 0.0
         self.nbTypes = 0
         self.typeList = []
+        self.typeMap = {}
+        self.presolve = None
+        self.catalogue = None
     
 
     def addType(self, type: Tx) -> None:
@@ -86,18 +102,37 @@ class Algo:
         if type is None:
             raise Exception("AddTypeError: null type")
         
-        #Check if the argument already in list 
-        for i in range(self.nbTypes):
-            #probablement coder une fonction égal sur Tx.py
-            if self.typeList[i] == type:
-                raise Exception("AddTypeError: type already exists")
+        #Check if a type with the same numero is already in list
+        if type.no in self.typeMap:
+            raise Exception("AddTypeError: type already exists")
 
         #Add the type if not null nor already inside the list
         self.typeList.append(type)
+        self.typeMap[type.no] = type
         self.nbTypes += 1
 
 
-    def evaluate(self, sol: Solution) -> None:
+    def setDefaultTypes(self) -> None:
+        """Add the default types, unless types are already specified.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+
+        if self.nbTypes == 0:
+            self.addType(Tx(70.,  30., 45.,  0, 1000, 1))
+            self.addType(Tx(80.,  45., 60.,  0, 1000, 2))
+            self.addType(Tx(100., 60., 75.,  0, 1000, 3))
+            self.addType(Tx(50.,  75., 85.,  0, 1000, 4))
+            self.addType(Tx(40.,  85., 100., 0, 1000, 5))
+
+
+    def evaluate(self, sol: Solution, sort: bool = False) -> None:
         """Calculate the fitness for each lot of a solution, and then the
         global fitness of the solution.
         
@@ -105,6 +140,11 @@ class Algo:
         ----------
         sol : Solution
             The solution from which we want to compute fitnesses
+        sort : bool, optional
+            Whether the lots are numbered afterwards in order of appearance
+            (see Solution.sortLots), default to False: the population
+            numbers the solutions it keeps, and a solution changed in place
+            by a Move must not be renumbered, so that the move can be undone
         
         Returns
         -------
@@ -122,50 +162,172 @@ class Algo:
         for j in range(self.nbTypes):
             self.typeList[j].nb = 0
         
-        # Compute fitness
+        # Compute fitness, from the area, length and bonus of each lot
         for i in range(1, sol.nbLots):
             lot = sol.lotList[i]
-
-            # Compute the TYPE benefit
-            for j in range(self.nbTypes):
-                if (lot.area > self.typeList[j].areaMin and 
-                    lot.area <= self.typeList[j].areaMax):
-                    lot.fitness = lot.area * self.typeList[j].benefit
-                    lot.typeNo = self.typeList[j].no
-                    self.typeList[j].nb += 1
-
-            # Add (or remove) bonus for good (bad) elements
-            if lot.fitness > 0:
-                for j in range(lot.nbElements):
-                    lot.fitness += lot.elementList[j].bonus * lot.elementList[j].area
-            
-            # Penalize for aspect ration
-            lot.fitness *= 1 + self.alpha * (lot.area/(lot.length**2) - 1)
+            lot.value, typeIndexes = self.lotFitness(lot.area, lot.length,
+                                                     lot.bonus)
+            lot.typeNo = 0
+            for j in typeIndexes:
+                lot.typeNo = self.typeList[j].no
+                self.typeList[j].nb += 1
 
             # Accumulate solution fitness
-            sol.fitness += lot.fitness
+            sol.fitness += lot.value
             sumArea += lot.area
+        sol.typeCounts = [type.nb for type in self.typeList]
         
         # Penalize for out of bounds
-        i=0
-        for j in range(self.nbTypes):
-            i += self.typeList[j].nb
-            if (self.typeList[j].nb > self.typeList[j].nbMax or 
-                self.typeList[j].nb < self.typeList[j].nbMin):
-                sol.fitness = 0
-                break
-
-        if i != sol.nbLots - 1:
+        if not self._inBounds(sol.typeCounts, sol.nbLots - 1):
             sol.fitness = 0
         
         # Reduce benefits to unit area
         for i in range(1, sol.nbLots):
-            sol.lotList[i].fitness /= sol.lotList[i].area
+            sol.lotList[i].fitness = sol.lotList[i].value / sol.lotList[i].area
         sol.fitness /= sumArea
 
-        # Sort lots for futur comparison
-        sol.sortLots()
+        # Number lots for futur comparison
+        if sort:
+            sol.sortLots()
+
+
+
+    def lotFitness(self, area: float, length: float,
+                   bonus: float) -> Tuple[float, List[int]]:
+        """Calculate the fitness of a lot, before its reduction to unit
+        area, from its measures.
+        
+        Parameters
+        ----------
+        area : float
+            The area of the lot
+        length : float
+            The length of the border of the lot
+        bonus : float
+            The sum of the bonus of its elements, weighted by their area
+        
+        Returns
+        -------
+        fitness : float
+            The fitness of the lot, 0 if its area is in no range of a type
+        typeIndexes : List[int]
+            The indexes in typeList of the types whose range contains the
+            area
+        """
+
+        fitness = 0.0
+        typeIndexes = []
+
+        # Compute the TYPE benefit
+        for j in range(self.nbTypes):
+            if (area > self.typeList[j].areaMin and 
+                area <= self.typeList[j].areaMax):
+                fitness = area * self.typeList[j].benefit
+                typeIndexes.append(j)
+
+        # Add (or remove) bonus for good (bad) elements
+        if fitness > 0:
+            fitness += bonus
+        
+        # Penalize for aspect ration
+        fitness *= 1 + self.alpha * (area/(length**2) - 1)
+        return fitness, typeIndexes
+
+
+    def moveFitness(self, sol: Solution, elt: Element, lotID: int) -> float:
+        """Calculate the fitness of an evaluated solution after an element
+        is moved to another lot, without changing the solution. The area,
+        length and bonus of the two lots changed are updated from the
+        neighbours of the element, in the same order as Lot.removeElement
+        and Lot.mergeElement do, and the fitnesses of the other lots are
+        those kept by evaluate: the result is exactly the fitness evaluate
+        gives to the solution after the move.
+        
+        Parameters
+        ----------
+        sol : Solution
+            The solution, evaluated
+        elt : Element
+            The element to move, in a lot of sol
+        lotID : int
+            The index of the lot where the element moves
+        
+        Returns
+        -------
+        fitness : float
+            The fitness of the solution after the move
+        """
+
+        if len(sol.typeCounts) != self.nbTypes:
+            raise Exception("MoveFitnessError: solution not evaluated")
+        geom = self.geom
+        distribution = sol.distribution
+        source = distribution[elt.index]
+        i = elt.index
+
+        # split the border of the element, as the lots do
+        sharedSource = 0.0
+        sharedTarget = 0.0
+        outerSource = geom.extLengths[i]
+        outerTarget = geom.extLengths[i]
+        for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]):
+            lotIndex = distribution[geom.adjIndices[k]]
+            if lotIndex == source:
+                sharedSource += geom.adjLengths[k]
+            else:
+                outerSource += geom.adjLengths[k]
+            if lotIndex == lotID:
+                sharedTarget += geom.adjLengths[k]
+            else:
+                outerTarget += geom.adjLengths[k]
+
+        # measures of the two lots after the move
+        lot = sol.lotList[source]
+        measures = {source: (lot.area - elt.area,
+                             lot.length + (sharedSource - outerSource),
+                             lot.bonus - elt.bonus * elt.area)}
+        lot = sol.lotList[lotID]
+        measures[lotID] = (lot.area + elt.area,
+                           lot.length + (outerTarget - sharedTarget),
+                           lot.bonus + elt.bonus * elt.area)
+
+        # update the numbers of lots of each type
+        typeCounts = list(sol.typeCounts)
+        values = {}
+        for index, (area, length, bonus) in measures.items():
+            if index == 0:
+                continue
+            lot = sol.lotList[index]
+            for j in self.lotFitness(lot.area, lot.length, lot.bonus)[1]:
+                typeCounts[j] -= 1
+            values[index], typeIndexes = self.lotFitness(area, length, bonus)
+            for j in typeIndexes:
+                typeCounts[j] += 1
+
+        # accumulate in the order of evaluate
+        fitness = 0
+        sumArea = measures[0][0] if 0 in measures else sol.lotList[0].area
+        for index in range(1, sol.nbLots):
+            if index in measures:
+                fitness += values[index]
+                sumArea += measures[index][0]
+            else:
+                fitness += sol.lotList[index].value
+                sumArea += sol.lotList[index].area
+        if not self._inBounds(typeCounts, sol.nbLots - 1):
+            fitness = 0
+        return fitness / sumArea
+
+
+    def _inBounds(self, typeCounts: List[int], nbLots: int) -> bool:
+        """Check if the numbers of lots of each type are within their bounds
+        and account for all the private lots."""
 
+        for j in range(self.nbTypes):
+            if (typeCounts[j] > self.typeList[j].nbMax or 
+                typeCounts[j] < self.typeList[j].nbMin):
+                return False
+        return sum(typeCounts) == nbLots
 
 
     def currentIteration(self):
@@ -201,18 +363,15 @@ class Algo:
         # Generate randomized solutions
         if self._currentIT <= self.initIT:
             newSol = Solution(self.geom)
-            newSol.rndSet(self._rnd(self._minLots, self._maxLots))
+            if self.catalogue is not None and self.catalogue.nbLots > 0:
+                self.catalogue.seed(newSol, self._rnd(self._minLots, self._maxLots))
+            else:
+                newSol.rndSet(self._rnd(self._minLots, self._maxLots))
             self.evaluate(newSol)
 
             if self.popu.insertSolution(newSol):
                 newPopu.resize(self.popu.nbSolutions)
-                for j in range(newSol.nbLots):
-                    for k in range(newSol.lotList[j].nbSegments):
-                        sol = Solution(newSol)
-                        sol.swap(j, k)
-                        self.evaluate(sol)
-                        if not newPopu.insertSolution(sol):
-                            del sol
+                self._explore(newSol, newPopu)
                 for i in range(newPopu.nbSolutions):
                     if self.popu.insertSolution(newPopu.solutionList[i]):
                         newPopu.solutionList[i] = None
@@ -223,13 +382,7 @@ class Algo:
         else:
             newPopu.resize(self.popu.nbSolutions)
             for i in range(self.popu.nbSolutions):
-                for j in range(self.popu.solutionList[i].nbLots):
-                    for k in range(self.popu.solutionList[i].lotList[j].nbSegments):
-                        newSol = Solution(self.popu.solutionList[i])
-                        newSol.swap(j, k)
-                        self.evaluate(newSol)
-                        if not newPopu.insertSolution(newSol):
-                            del newSol
+                self._explore(self.popu.solutionList[i], newPopu)
             k = 0
             for i in range(newPopu.nbSolutions):
                 if self.popu.insertSolution(newPopu.solutionList[i]):
@@ -243,6 +396,39 @@ class Algo:
         return True
 
 
+    def _explore(self, sol: Solution, popu: Population) -> None:
+        """Insert in a population the solutions reached from a solution by
+        moving one element to a neighbour lot. Each move is evaluated in
+        place, and the solution is only copied when the population can keep
+        the result.
+        
+        Parameters
+        ----------
+        sol : Solution
+            The evaluated solution whose neighbours are explored
+        popu : Population
+            The population in which the neighbours are inserted
+        
+        Returns
+        -------
+        None
+        """
+
+        for j in range(sol.nbLots):
+            # the same neighbour is reached through each of its segments
+            moved = set()
+            for k in range(sol.lotList[j].nbSegments):
+                move = Move(sol, j, k)
+                if not move.valid() or move.element.index in moved:
+                    continue
+                moved.add(move.element.index)
+                if not popu.accepts(move.fitness(self)):
+                    continue
+                newSol = move.copy(self)
+                if not popu.insertSolution(newSol):
+                    del newSol
+
+
     def _rnd(self, low:Union[int, float], high:Union[int, float]) -> Union[int, float]:
         """Choose a random int or float between a low value and high value.
         In the following, A might be int or float.
@@ -282,12 +468,7 @@ class Algo:
         sol = Solution(self.geom)
 
         # Set the default types if not already specified
-        if self.nbTypes == 0:
-            self.addType(Tx(70.,  30., 45.,  0, 1000, 1))
-            self.addType(Tx(80.,  45., 60.,  0, 1000, 2))
-            self.addType(Tx(100., 60., 75.,  0, 1000, 3))
-            self.addType(Tx(50.,  75., 85.,  0, 1000, 4))
-            self.addType(Tx(40.,  85., 100., 0, 1000, 5))
+        self.setDefaultTypes()
 
         # Compute the maximum number of lots
         from .lot import Lot
@@ -335,6 +516,31 @@ class Algo:
             self.initIT = 250 * self._maxLots
         if self.endIT < 0:
             self.endIT = 10 * self._maxLots
+
+        # Fix the elements which cannot move, and tighten the numbers of lots
+        # by the areas to share, unless it leaves no number of lots
+        self.presolve = Presolve(self)
+        self.presolve.run()
+        if (max(self._minLots, self.presolve.minLots) <=
+                min(self._maxLots, self.presolve.maxLots)):
+            self._minLots = max(self._minLots, self.presolve.minLots)
+            self._maxLots = min(self._maxLots, self.presolve.maxLots)
+        else:
+            logging.warning(
+                "the area to share needs between %d and %d lots, out of the "
+                "%d to %d lots allowed by the types", self.presolve.minLots,
+                self.presolve.maxLots, self._minLots, self._maxLots)
+        if not self.presolve.feasible():
+            dead = self.presolve.deadList
+            if len(dead) > 0:
+                logging.warning(
+                    "no solution can have a positive fitness: %d element(s) "
+                    "cannot be in any lot (%s%s)", len(dead),
+                    ", ".join("E{}".format(elt.no) for elt in dead[:10]),
+                    ", ..." if len(dead) > 10 else "")
+            else:
+                logging.warning("no solution can have a positive fitness: "
+                                "the area cannot be shared between the types")
         
         # Resize the population
         self.popu.resize(self.nbSols)
@@ -0,0 +1,173 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Iterable, Iterator
+
+from .segment import Segment
+
+
+class Border:
+    """Class representing the border of a lot: its segments in the order in
+    which they were added, indexed by segment so that a segment is added,
+    found and removed in O(1), and accessed by its position as in a list.
+    The segments are indexed by identity, as a geometry holds a single
+    segment between two points (see Geom._addSegment), and the index is
+    only built when the border first changes, as most borders never do.
+
+    A removed segment leaves a hole in the sequence, and the holes are
+    closed at the next access by position or iteration, so that the
+    segments keep the order a list would give them, whatever the number of
+    segments removed in between.
+
+    Attributes
+    ----------
+    _segments : List[Segment]
+        The segments in the order in which they were added, None for the
+        removed ones
+    _positions : Dict[int, int]
+        The position in _segments of each segment, by its id, or None until
+        the border changes
+    _nbHoles : int
+        The number of removed segments left in _segments
+
+    Methods
+    -------
+    __init__(segments: Iterable[Segment]) -> None
+        Create a border from segments, without duplicates
+    add(seg: Segment) -> bool
+        Add a segment at the end of the border
+    remove(seg: Segment) -> bool
+        Remove a segment from the border
+    copy() -> Border
+        Copy the border
+    __len__() -> int
+        Get the number of segments
+    __contains__(seg: Segment) -> bool
+        Check if a segment is in the border
+    __getitem__(i: int) -> Segment
+        Get the segment at a position
+    __iter__() -> Iterator[Segment]
+        Iterate over the segments in order
+    """
+
+    __slots__ = ('_segments', '_positions', '_nbHoles')
+
+    def __init__(self, segments: Iterable[Segment] = ()) -> None:
+        """Constructor of the Border class.
+
+        Parameters
+        ----------
+        segments : Iterable[Segment], optional
+            The segments of the border, without duplicates, default to none
+        """
+
+        self._segments = list(segments)
+        self._positions = None
+        self._nbHoles = 0
+
+
+    def add(self, seg: Segment) -> bool:
+        """Add a segment at the end of the border, if it is not in it.
+
+        Parameters
+        ----------
+        seg : Segment
+            The segment to add
+
+        Returns
+        -------
+        A boolean, True if the segment was added
+        """
+
+        positions = self._index()
+        if id(seg) in positions:
+            return False
+        positions[id(seg)] = len(self._segments)
+        self._segments.append(seg)
+        return True
+
+
+    def remove(self, seg: Segment) -> bool:
+        """Remove a segment from the border, if it is in it.
+
+        Parameters
+        ----------
+        seg : Segment
+            The segment to remove
+
+        Returns
+        -------
+        A boolean, True if the segment was removed
+        """
+
+        i = self._index().pop(id(seg), None)
+        if i is None:
+            return False
+        if i == len(self._segments) - 1:
+            self._segments.pop()
+        else:
+            self._segments[i] = None
+            self._nbHoles += 1
+        return True
+
+
+    def copy(self) -> 'Border':
+        """Copy the border.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        border : Border
+            A border with the same segments in the same order
+        """
+
+        self._compact()
+        border = Border.__new__(Border)
+        border._segments = self._segments[:]
+        border._positions = (None if self._positions is None else
+                             self._positions.copy())
+        border._nbHoles = 0
+        return border
+
+
+    def __len__(self) -> int:
+        return len(self._segments) - self._nbHoles
+
+
+    def __contains__(self, seg: Segment) -> bool:
+        return id(seg) in self._index()
+
+
+    def __getitem__(self, i: int) -> Segment:
+        if self._nbHoles > 0:
+            self._compact()
+        return self._segments[i]
+
+
+    def __iter__(self) -> Iterator[Segment]:
+        if self._nbHoles > 0:
+            self._compact()
+        return iter(self._segments)
+
+
+    def _compact(self) -> None:
+        """Close the holes left by the removed segments."""
+
+        if self._nbHoles == 0:
+            return
+        self._segments = [seg for seg in self._segments if seg is not None]
+        self._positions = None
+        self._nbHoles = 0
+
+
+    def _index(self) -> Dict[int, int]:
+        """Get the position of each segment by its id, building it if
+        needed."""
+
+        if self._positions is None:
+            self._positions = dict(zip(map(id, self._segments),
+                                       range(len(self._segments))))
+        return self._positions
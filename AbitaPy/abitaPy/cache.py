@@ -0,0 +1,265 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import pickle
+import re
+from typing import Any, Tuple
+
+from .geom import Geom
+
+
+class GeomCache:
+    """A persistent on-disk cache of built geometries. Each entry is a file
+    named by the hash of the geometry section of an .abi file (floors,
+    points, elements, flags and bonuses) and of the build options, so that an
+    entry is never used once the geometry has changed. The least recently
+    used entries are removed when the cache grows over its maximum size.
+    Other data computed once per geometry (see LotCatalogue) are saved in
+    the same cache, under keys of their own.
+
+    Attributes
+    ----------
+    directory : str
+        The directory where the entries are stored
+    maxSize : int
+        The maximum total size of the entries, in bytes
+
+    Methods
+    -------
+    __init__(directory: str, maxSize: int) -> None
+        Create a cache in a directory
+    split(program: str) -> Tuple[str, str]
+        Split an .abi program between geometry and other commands
+    key(geometry: str, geom: Geom) -> str
+        Compute the key of a geometry
+    load(key: str, geom: Geom) -> bool
+        Restore a built geometry from the cache
+    store(key: str, geom: Geom) -> None
+        Save a built geometry in the cache
+    fetch(key: str) -> Any
+        Restore plain data from the cache
+    save(key: str, data: Any) -> None
+        Save plain data in the cache
+    """
+
+    # version of the format of the entries, to change when it is modified
+    VERSION = 2
+
+    # commands of the geometry section of an .abi file
+    GEOMETRY_COMMANDS = 'FPECIXB'
+
+    def __init__(self, directory: str = None,
+                 maxSize: int = 256 * 1024 * 1024) -> None:
+        """Constructor for the GeomCache class.
+
+        Parameters
+        ----------
+        directory : str, optional
+            The directory where the entries are stored, default to the
+            ABITAPY_CACHE environment variable, or to ~/.cache/abitaPy
+        maxSize : int, optional
+            The maximum total size of the entries in bytes, default to 256 MB
+        """
+
+        if directory is None:
+            directory = os.environ.get('ABITAPY_CACHE', os.path.join(
+                os.path.expanduser('~'), '.cache', 'abitaPy'))
+        self.directory = directory
+        self.maxSize = maxSize
+
+
+    def split(self, program: str) -> Tuple[str, str]:
+        """Split the commands of an .abi program between the geometry section
+        and the other commands (parameters, types and solutions).
+
+        Parameters
+        ----------
+        program : str
+            The content of an .abi file
+
+        Returns
+        -------
+        geometry, others : str, str
+            The normalized geometry commands, one per line, and the other
+            commands, which can still be parsed once the geometry is known
+        """
+
+        program = re.sub(r'#.*', '', program)
+        commands = re.findall(r'([A-Za-z])([^A-Za-z]*)', program)
+        geometry = []
+        others = []
+        for name, args in commands:
+            if name in self.GEOMETRY_COMMANDS:
+                args = ' '.join(repr(float(a)) for a in args.split())
+                geometry.append('{} {}'.format(name, args))
+            else:
+                others.append('{} {}'.format(name, ' '.join(args.split())))
+        return '\n'.join(geometry), '\n'.join(others)
+
+
+    def key(self, geometry: str, geom: Geom) -> str:
+        """Compute the key of a geometry from its normalized commands and the
+        build options of the geometry.
+
+        Parameters
+        ----------
+        geometry : str
+            The normalized geometry commands returned by split
+        geom : Geom
+            The geometry to build, with its options set
+
+        Returns
+        -------
+        key : str
+            The key of the entry of the geometry
+        """
+
+        content = '{}\n{!r}\n{!r}\n{!r}\n{}'.format(
+            self.VERSION, float(geom.weldTolerance), bool(geom.splitEdges),
+            bool(geom.renumber), geometry)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+    def load(self, key: str, geom: Geom) -> bool:
+        """Restore a built geometry from the cache, if present.
+
+        Parameters
+        ----------
+        key : str
+            The key of the geometry
+        geom : Geom
+            An empty geometry, in which the cached geometry is restored
+
+        Returns
+        -------
+        found : bool
+            True if the geometry was restored, False if it is not in the cache
+        """
+
+        data = self.fetch(key)
+        if data is None:
+            return False
+        geom.unpack(data)
+        return True
+
+
+    def store(self, key: str, geom: Geom) -> None:
+        """Save a built geometry in the cache, then remove the least recently
+        used entries if the cache is too large. Errors of the file system
+        are ignored: the cache is only an optimisation.
+
+        Parameters
+        ----------
+        key : str
+            The key of the geometry
+        geom : Geom
+            The built geometry
+
+        Returns
+        -------
+        None
+        """
+
+        self.save(key, geom.pack())
+
+
+    def fetch(self, key: str) -> Any:
+        """Restore plain data from the cache, if present.
+
+        Parameters
+        ----------
+        key : str
+            The key of the data
+
+        Returns
+        -------
+        data : Any
+            The data, or None if they are not in the cache
+        """
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            # corrupted entry
+            self._remove(path)
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+
+    def save(self, key: str, data: Any) -> None:
+        """Save plain data in the cache, then remove the least recently used
+        entries if the cache is too large. Errors of the file system are
+        ignored: the cache is only an optimisation.
+
+        Parameters
+        ----------
+        key : str
+            The key of the data
+        data : Any
+            The data, made of numbers, strings, tuples, lists and
+            dictionaries only
+
+        Returns
+        -------
+        None
+        """
+
+        path = self._path(key)
+        tmpPath = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(tmpPath, 'wb') as f:
+                pickle.dump(data, f, 2)
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(tmpPath, path)
+        except (IOError, OSError):
+            self._remove(tmpPath)
+            return
+        self._evict()
+
+
+    def _path(self, key: str) -> str:
+        """Get the path of the file of an entry."""
+        return os.path.join(self.directory, key + '.pkl')
+
+
+    def _remove(self, path: str) -> None:
+        """Remove a file, ignoring errors."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the total size of
+        the cache is under its maximum size."""
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxSize:
+                break
+            self._remove(path)
+            total -= size
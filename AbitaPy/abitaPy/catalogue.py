@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import pickle
+from random import random
+from typing import List, Tuple
+
+from .solution import Solution
+
+
+class LotCatalogue:
+    """Class holding a catalogue of candidate lots, built once per geometry:
+    the connected sets of private elements (neither common nor imposed)
+    which touch a common element and whose area is in the range of a type,
+    so that random solutions are seeded with whole candidates instead of
+    single elements grown blindly.
+
+    The sets are enumerated from each private element in turn, the other elements of
+    a set having a greater index (ESU algorithm), so that each set is found
+    once. The enumeration is bounded: each element starts at most its share
+    of the maximum number of candidates, and a set is not extended over the
+    largest area of the types.
+
+    Attributes
+    ----------
+    algo : Algo
+        The algorithm, whose geometry is built and types are set
+    maxLots : int
+        The maximum number of candidates
+    nbLots : int
+        The number of candidates
+    lotList : List[Tuple[int]]
+        The candidates: the indexes of their elements in increasing order
+    areaMax : float
+        The largest area of the types
+
+    Methods
+    -------
+    __init__(algo: Algo, maxLots: int) -> None
+        Create an empty catalogue for the problem of an algorithm
+    build(cache: GeomCache) -> None
+        Enumerate the candidates, or restore them from a cache
+    key() -> str
+        Compute the key of the catalogue in a cache
+    seed(sol: Solution, nbLots: int) -> None
+        Fill a distribution from random candidates
+    """
+
+    # version of the format of the candidates, to change when it is modified
+    VERSION = 1
+
+    def __init__(self, algo: 'Algo', maxLots: int = 20000) -> None:
+        """Constructor of the LotCatalogue class.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm, whose geometry is built and types are set
+        maxLots : int, optional
+            The maximum number of candidates, default to 20000
+        """
+
+        self.algo = algo
+        self.maxLots = maxLots
+        self.nbLots = 0
+        self.lotList = []
+        self.areaMax = 0.0
+
+
+    def build(self, cache: 'GeomCache' = None) -> None:
+        """Enumerate the candidates, or restore them from a cache if they
+        were saved for the same geometry and types.
+
+        Parameters
+        ----------
+        cache : GeomCache, optional
+            The cache in which the candidates are restored and saved, default
+            to None (no cache)
+
+        Returns
+        -------
+        None
+        """
+
+        types = [t for t in self.algo.typeList if t.nbMax > 0]
+        self.areaMax = max([t.areaMax for t in types] or [0])
+        key = None
+        lotList = None
+        if cache is not None:
+            key = self.key()
+            lotList = cache.fetch(key)
+        if lotList is None:
+            lotList = self._enumerate()
+            if cache is not None:
+                cache.save(key, lotList)
+
+        self.lotList = lotList
+        self.nbLots = len(lotList)
+
+
+    def key(self) -> str:
+        """Compute the key of the catalogue in a cache, from what the
+        enumeration depends on: the elements and the adjacency of the
+        geometry, the ranges of area of the types and the parameters.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        key : str
+            The key of the entry of the catalogue
+        """
+
+        geom = self.algo.geom
+        content = pickle.dumps((
+            'catalogue', self.VERSION, self.maxLots,
+            [(t.areaMin, t.areaMax) for t in self.algo.typeList
+             if t.nbMax > 0],
+            [(e.area, e.common, e.imposed) for e in geom.elementList],
+            list(geom.adjOffsets), list(geom.adjIndices)), 2)
+        return hashlib.sha1(content).hexdigest()
+
+
+    def seed(self, sol: Solution, nbLots: int) -> None:
+        """Fill the distribution of an empty solution: the common elements
+        are put in the common lot, then up to nbLots random candidates are
+        placed without overlapping, and the elements left are shared by
+        diffusion (see Solution.rndSet).
+
+        Parameters
+        ----------
+        sol : Solution
+            A solution whose elements are not in any lot yet
+        nbLots : int
+            The number of candidates to place
+
+        Returns
+        -------
+        None
+        """
+
+        distribution = sol.distribution
+        for elt in sol.elementList:
+            if elt.common and distribution[elt.index] < 0:
+                distribution[elt.index] = 0
+
+        nb = 0
+        tries = 0
+        while nb < nbLots and tries < 10 * nbLots and self.nbLots > 0:
+            tries += 1
+            n = min(int(self.nbLots * random()), self.nbLots - 1)
+            indices = self.lotList[n]
+            if all(distribution[i] < 0 for i in indices):
+                nb += 1
+                for i in indices:
+                    distribution[i] = nb
+        sol.rndSet(0)
+
+
+    def _enumerate(self) -> List[Tuple[int]]:
+        """Enumerate the candidates, from each private element in turn, by
+        extension of the sets with the neighbours of greater index not
+        adjacent to the set yet (ESU algorithm)."""
+
+        geom = self.algo.geom
+        elementList = geom.elementList
+        adjOffsets = geom.adjOffsets
+        adjIndices = geom.adjIndices
+        areaMax = self.areaMax
+        types = [t for t in self.algo.typeList if t.nbMax > 0]
+
+        private = [not (elt.common or elt.imposed) for elt in elementList]
+        roots = [elt.index for elt in elementList
+                 if private[elt.index] and elt.area <= areaMax]
+        share = max(1, self.maxLots // max(1, len(roots)))
+        lotList = []
+        for v in roots:
+            if len(lotList) >= self.maxLots:
+                break
+            found = 0
+            visits = 0
+            closed = set(adjIndices[adjOffsets[v]:adjOffsets[v+1]])
+            closed.add(v)
+            ext = [u for u in closed if u > v and private[u]]
+            stack = [([v], ext, elementList[v].area, closed)]
+            while len(stack) > 0 and found < share and visits < 20 * share:
+                sub, ext, area, closed = stack.pop()
+                visits += 1
+                if any(area > t.areaMin and area <= t.areaMax for t in types):
+                    if self._isCandidate(sub):
+                        lotList.append(tuple(sorted(sub)))
+                        found += 1
+                # the first child explored has the widest extension, so that
+                # the sets grow compact rather than along paths
+                children = []
+                ext = list(ext)
+                while len(ext) > 0:
+                    w = ext.pop()
+                    if area + elementList[w].area > areaMax:
+                        continue
+                    neighbours = adjIndices[adjOffsets[w]:adjOffsets[w+1]]
+                    newExt = ext + [u for u in neighbours
+                                    if u > v and u not in closed and
+                                    private[u]]
+                    newClosed = closed.union(neighbours)
+                    children.append((sub + [w], newExt,
+                                     area + elementList[w].area, newClosed))
+                stack.extend(reversed(children))
+        return lotList[:self.maxLots]
+
+
+    def _isCandidate(self, sub: List[int]) -> bool:
+        """Check if a connected set of private elements touches a common
+        element."""
+
+        geom = self.algo.geom
+        elementList = geom.elementList
+        for i in sub:
+            for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]):
+                if elementList[geom.adjIndices[k]].common:
+                    return True
+        return False
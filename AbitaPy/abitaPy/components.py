@@ -0,0 +1,305 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import heapq
+import multiprocessing
+import random
+from typing import List, Tuple
+
+from .algo import Algo
+from .geom import Geom
+from .population import Population
+from .solution import Solution
+from .tx import Tx
+
+
+def solveComponent(task: tuple) -> Tuple[int, int, List[Tuple[float, List[int], List[int]]]]:
+    """Solve the problem restricted to a part of a geometry. Defined at the
+    top level of the module, so that it can be run in the processes of a
+    multiprocessing pool.
+
+    Parameters
+    ----------
+    task : tuple
+        The packed part of the geometry (see Geom.pack), the types as tuples
+        (benefit, areaMin, areaMax, nbMin, nbMax, no), the parameters
+        (nbSols, initIT, endIT, alpha), the distributions of the initial
+        solutions and the seed of the random generator
+
+    Returns
+    -------
+    initIT, endIT : int
+        The numbers of iterations used to solve the part
+    solutions : List[Tuple[float, List[int], List[int]]]
+        The fitness, the distribution and the number of lots of each type of
+        the solutions found, by decreasing fitness
+    """
+
+    data, types, params, seeds, seed = task
+    random.seed(seed)
+    geom = Geom()
+    geom.unpack(data)
+    popu = Population()
+    algo = Algo(geom, popu)
+    algo.nbSols, algo.initIT, algo.endIT, algo.alpha = params
+    for type in types:
+        algo.addType(Tx(*type))
+    for distribution in seeds:
+        sol = Solution(geom)
+        sol.distribution = list(distribution)
+        sol.sortLots()
+        if not popu.contains(sol):
+            popu.addSolution(sol)
+
+    # without common elements, no lot can be seeded: each area is a lot
+    if any(elt.common for elt in geom.elementList):
+        while algo.run():
+            pass
+    else:
+        for sol in popu.solutionList:
+            algo.evaluate(sol)
+    if popu.nbSolutions == 0:
+        sol = Solution(geom)
+        for elt in geom.elementList:
+            if elt.common:
+                sol.distribution[elt.index] = 0
+        for i, indices in enumerate(geom.components(False)):
+            for j in indices:
+                sol.distribution[j] = i + 1
+        algo.evaluate(sol)
+        popu.addSolution(sol)
+
+    # the numbers of lots of each type are counted by the evaluation
+    solutions = []
+    for sol in popu.solutionList:
+        algo.evaluate(sol)
+        solutions.append((sol.fitness, list(sol.distribution),
+                          [type.nb for type in algo.typeList]))
+    return max(0, algo.initIT), max(0, algo.endIT), solutions
+
+
+class ComponentSolver:
+    """Class solving a problem by parts: the connected components of the
+    geometry (floors, separate buildings) are solved independently in a
+    pool of processes, then their solutions are combined into solutions of
+    the whole geometry.
+
+    The fitness of a solution is the sum of the fitnesses of its lots,
+    divided by its area, so that the best combinations are found by a
+    best-first enumeration of the ranks of the solutions of each component.
+    The numbers of lots of each type are only bounded globally: the
+    components are solved without the minimum numbers, and the combinations
+    are checked by a global evaluation.
+
+    Attributes
+    ----------
+    algo : Algo
+        The algorithm, with the geometry, the population to fill, and the
+        parameters of the problem
+    nbJobs : int
+        The number of processes solving the components
+    maxCombinations : int
+        The maximum number of combinations evaluated, as a multiple of the
+        number of solutions of the population
+    componentList : List[List[int]]
+        The indexes of the elements of each component
+    initIT : int
+        The first iteration number of the parts, -1 for a default one
+    endIT : int
+        The last iteration number of the parts, -1 for a default one
+
+    Methods
+    -------
+    __init__(algo: Algo, nbJobs: int) -> None
+        Create a solver for the problem of an algorithm
+    run() -> None
+        Solve the problem and fill the population of the algorithm
+    solve(parts: List[List[int]], quotas: List[List[List[int]]]) -> List[List[Tuple[float, List[int], List[int]]]]
+        Solve the problems restricted to parts of the geometry
+    combine(parts: List[List[int]], solutions: List[List[Tuple[float, List[int], List[int]]]]) -> None
+        Combine the solutions of the parts into the population
+    """
+
+    def __init__(self, algo: Algo, nbJobs: int = 0) -> None:
+        """Constructor of the ComponentSolver class.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm, whose geometry is built
+        nbJobs : int, optional
+            The number of processes, default to 0 (one per processor)
+        """
+
+        self.algo = algo
+        self.nbJobs = nbJobs if nbJobs > 0 else multiprocessing.cpu_count()
+        self.maxCombinations = 10
+        self.componentList = algo.geom.components()
+        self.initIT = algo.initIT
+        self.endIT = algo.endIT
+
+
+    def run(self) -> None:
+        """Solve the problem and fill the population of the algorithm. A
+        geometry made of only one component is solved as a whole.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        if len(self.componentList) < 2:
+            while self.algo.run():
+                pass
+            return
+        self.combine(self.componentList, self.solve(self.componentList))
+
+
+    def solve(self, parts: List[List[int]],
+              quotas: List[List[List[int]]] = None) -> List[List[Tuple[float, List[int], List[int]]]]:
+        """Solve the problems restricted to parts of the geometry, each
+        being a union of components. The largest parts are sent first to the
+        processes, and the solutions of the population are restricted to
+        each part to seed it.
+
+        Parameters
+        ----------
+        parts : List[List[int]]
+            The indexes of the elements of each part
+        quotas : List[List[List[int]]], optional
+            For each part, the minimum and maximum numbers of lots of each
+            type, default to None (no minimum, and the maximum of the type)
+
+        Returns
+        -------
+        solutions : List[List[Tuple[float, List[int], List[int]]]]
+            For each part, the fitness, the distribution and the number of
+            lots of each type of its solutions, by decreasing fitness
+        """
+
+        algo = self.algo
+        algo.setDefaultTypes()
+        if quotas is None:
+            quotas = [[(0, t.nbMax) for t in algo.typeList] for _ in parts]
+        params = (algo.nbSols, self.initIT, self.endIT, algo.alpha)
+        order = sorted(range(len(parts)), key=lambda i: -len(parts[i]))
+        tasks = []
+        for i in order:
+            types = [(t.benefit, t.areaMin, t.areaMax, nbMin, nbMax, t.no)
+                     for t, (nbMin, nbMax) in zip(algo.typeList, quotas[i])]
+            seeds = [self._restrict(sol.distribution, parts[i])
+                     for sol in algo.popu.solutionList]
+            tasks.append((algo.geom.pack(parts[i]), types, params, seeds,
+                          random.random()))
+
+        if self.nbJobs < 2 or len(tasks) < 2:
+            results = [solveComponent(task) for task in tasks]
+        else:
+            pool = multiprocessing.Pool(min(self.nbJobs, len(tasks)))
+            try:
+                results = pool.map(solveComponent, tasks, 1)
+            finally:
+                pool.close()
+                pool.join()
+
+        # report the total number of iterations if not specified
+        if self.initIT < 0:
+            algo.initIT = (max(0, algo.initIT) +
+                           sum(initIT for initIT, _, _ in results))
+        if self.endIT < 0:
+            algo.endIT = (max(0, algo.endIT) +
+                          sum(endIT for _, endIT, _ in results))
+
+        solutions = [None] * len(parts)
+        for i, (_, _, sols) in zip(order, results):
+            solutions[i] = sols
+        return solutions
+
+
+    def combine(self, parts: List[List[int]],
+                solutions: List[List[Tuple[float, List[int], List[int]]]]) -> None:
+        """Combine the solutions of the parts of the geometry into solutions
+        of the whole geometry, inserted in the population. The combinations
+        are enumerated by decreasing sum of the fitnesses of the parts
+        weighted by their areas, which bounds the fitness of the combined
+        solution, until the population cannot be improved any more.
+
+        Parameters
+        ----------
+        parts : List[List[int]]
+            The indexes of the elements of each part
+        solutions : List[List[Tuple[float, List[int], List[int]]]]
+            For each part, the fitness, the distribution and the number of
+            lots of each type of its solutions, by decreasing fitness
+
+        Returns
+        -------
+        None
+        """
+
+        algo = self.algo
+        popu = algo.popu
+        popu.resize(algo.nbSols)
+        elementList = algo.geom.elementList
+        weights = [sum(elementList[i].area for i in part) for part in parts]
+        totalArea = sum(weights)
+
+        def score(ranks):
+            return sum(w * sols[r][0]
+                       for w, sols, r in zip(weights, solutions, ranks))
+
+        ranks = tuple(0 for _ in parts)
+        heap = [(-score(ranks), ranks)]
+        seen = set([ranks])
+        nb = 0
+        while len(heap) > 0 and nb < self.maxCombinations * algo.nbSols:
+            bound, ranks = heapq.heappop(heap)
+            if (popu.nbSolutions >= algo.nbSols and
+                    -bound / totalArea <= popu.solutionList[-1].fitness):
+                break
+            nb += 1
+            sol = self._assemble(parts, [solutions[i][r][1]
+                                         for i, r in enumerate(ranks)])
+            algo.evaluate(sol)
+            popu.insertSolution(sol)
+            for i in range(len(parts)):
+                if ranks[i] + 1 < len(solutions[i]):
+                    next = ranks[:i] + (ranks[i] + 1,) + ranks[i+1:]
+                    if next not in seen:
+                        seen.add(next)
+                        heapq.heappush(heap, (-score(next), next))
+        popu.stats()
+
+
+    def _assemble(self, parts: List[List[int]],
+                  distributions: List[List[int]]) -> Solution:
+        """Build a solution of the whole geometry from a distribution of each
+        part: the lots of the parts are numbered one after the other, the
+        lot 0 of the common elements being shared."""
+
+        sol = Solution(self.algo.geom)
+        offset = 0
+        for part, distribution in zip(parts, distributions):
+            for i, lot in zip(part, distribution):
+                sol.distribution[i] = offset + lot if lot > 0 else lot
+            offset += max(0, max(distribution))
+        sol.setLots()
+        return sol
+
+
+    def _restrict(self, distribution: List[int], part: List[int]) -> List[int]:
+        """Restrict a distribution of the whole geometry to a part, with its
+        lots renumbered in order of appearance."""
+
+        numbers = {0: 0, -1: -1}
+        restricted = []
+        for i in part:
+            lot = distribution[i]
+            if lot not in numbers:
+                numbers[lot] = len(numbers) - 1
+            restricted.append(numbers[lot])
+        return restricted
@@ -1,6 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+from math import sqrt
+
 from .point import Point
 from .solution import Solution
 
@@ -25,8 +27,17 @@ class Element:
         True if the element can be a common place
     imposed : boolean
         True if the element must be a common place
+    fixed : boolean
+        True if the element is common and cannot be in a private lot, so
+        that it is never moved (see Presolve)
     area : float
         The surface of the element
+    perimeter : float
+        The length of the border of the element
+    centroid : Tuple[float, float]
+        The coordinates of the center of mass of the element
+    bbox : Tuple[float, float, float, float]
+        The bounding box of the element (xmin, ymin, xmax, ymax)
     nbPoints : int
         The length of the point list
     nbSegments : int
@@ -44,8 +55,14 @@ class Element:
         add a point to the element
     close() -> None
         Close the element when we give all points    
+    measure() -> None
+        Compute the area, perimeter, centroid and bounding box
     """
 
+    __slots__ = ('no', 'floorId', 'bonus', 'mark', 'index', 'exit', 'common',
+                 'imposed', 'fixed', 'area', 'perimeter', 'centroid', 'bbox',
+                 'nbPoints', 'nbSegments', 'pointList', 'segmentList')
+
     
     def __init__(self, floorId: int, no: int) -> None:
         """Constructor for Element
@@ -66,7 +83,11 @@ class Element:
         self.exit = False
         self.common = False
         self.imposed = False
+        self.fixed = False
         self.area = 0
+        self.perimeter = 0
+        self.centroid = (0, 0)
+        self.bbox = (0, 0, 0, 0)
         self.nbPoints = 0
         self.nbSegments = 0
         self.pointList = []
@@ -111,8 +132,9 @@ class Element:
 
     def close(self) -> None:
         """Close the perimeter of the element, add the first point
-        to the end of the point list, compute the area and generate
-        an empty segment list.
+        to the end of the point list and generate an empty segment list.
+        The measures of the element are computed afterwards, for all
+        elements at once, by the geometry (see Geom.build).
         
         Parameters
         ----------
@@ -129,21 +151,44 @@ class Element:
 
         # add first point in last position
         self.addPoint(self.pointList[0])
+        
+        # generate empty segment list
+        self.segmentList = []
+        self.nbSegments = 0
+
+
+    def measure(self) -> None:
+        """Compute the area, the perimeter, the centroid and the bounding box
+        of the closed element. Per-element fallback of the computation done
+        by the geometry when numpy is not available.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
 
-        # compute area
         p1 = None
         p2 = self.pointList[0]
-        self.area = 0
+        area = 0
+        cx = 0
+        cy = 0
+        self.perimeter = 0
         for i in range(1, self.nbPoints):
             p1 = p2
             p2 = self.pointList[i]
-            self.area += p2.x * p1.y - p1.x * p2.y
-        self.area *= 0.5
-        if self.area < 0:
-            self.area *= -1
-        if self.area == 0:
+            cross = p1.x * p2.y - p2.x * p1.y
+            area += cross
+            cx += (p1.x + p2.x) * cross
+            cy += (p1.y + p2.y) * cross
+            self.perimeter += sqrt((p2.x - p1.x)**2 + (p2.y - p1.y)**2)
+        if area == 0:
             raise Exception("Cannot close element: area is null")
-        
-        # generate empty segment list
-        self.segmentList = [None for _ in range(self.nbPoints-1)]
-        
+        self.area = abs(area) * 0.5
+        self.centroid = (cx / (3 * area), cy / (3 * area))
+        xs = [p.x for p in self.pointList]
+        ys = [p.y for p in self.pointList]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
@@ -0,0 +1,322 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from array import array
+from typing import Dict, List, Tuple
+
+from .element import Element
+
+
+class ExitForest:
+    """Class representing the reachability of the elements of the common lot
+    from its exits: a spanning forest of the lot, rooted at the exits, built
+    by a breadth-first search and then updated at each element merged in or
+    removed from the lot. The children of each element are linked by their
+    siblings, so that the subtree of an element is walked without searching.
+
+    Removing an element keeps all the elements of the lot connected to an
+    exit if each element of its subtree can be reattached to the rest of the
+    forest without going through it. Only the subtree is explored: removing
+    a leaf never disconnects the lot.
+
+    The arrays are indexed by the indexes of the elements of the geometry,
+    and the lot is given to each method, as the membership of the elements
+    is read in the distribution of its solution.
+
+    Attributes
+    ----------
+    parent : array[int]
+        The parent of each element in the forest, -1 for the exits, and -2
+        for the elements not reached from an exit (or not in the lot)
+    firstChild : array[int]
+        The first child of each element, -1 if it has none
+    nextSibling : array[int]
+        The next child of the parent of each element, -1 if it is the last
+    prevSibling : array[int]
+        The previous child of the parent of each element, -1 if it is the
+        first
+    nbReached : int
+        The number of elements of the lot reached from an exit
+    shared : bool
+        True if the forest is shared by several lots, which must copy it
+        before changing it
+
+    Methods
+    -------
+    __init__(lot: Lot) -> None
+        Build the forest of a lot from its exits
+    copy() -> ExitForest
+        Copy the forest
+    canRemove(lot: Lot, elt: Element) -> bool
+        Check if all elements remain connected to an exit without an element
+    add(lot: Lot, elt: Element) -> None
+        Update the forest after an element was merged in the lot
+    remove(lot: Lot, elt: Element) -> None
+        Update the forest after an element was removed from the lot
+    """
+
+    __slots__ = ('parent', 'firstChild', 'nextSibling', 'prevSibling',
+                 'nbReached', 'shared')
+
+    def __init__(self, lot:'Lot'=None) -> None:
+        """Constructor of the ExitForest class: breadth-first search of the
+        elements of the lot from its exits.
+
+        Parameters
+        ----------
+        lot : Lot, optional
+            The common lot, default to None (empty forest, see copy)
+        """
+
+        self.parent = array('l')
+        self.firstChild = array('l')
+        self.nextSibling = array('l')
+        self.prevSibling = array('l')
+        self.nbReached = 0
+        self.shared = False
+        if lot is None:
+            return
+
+        geom = lot.solution.geom
+        n = geom.nbElements
+        self.parent = array('l', [-2]) * n
+        self.firstChild = array('l', [-1]) * n
+        self.nextSibling = array('l', [-1]) * n
+        self.prevSibling = array('l', [-1]) * n
+        queue = []
+        for elt in lot.elementList:
+            if elt.exit:
+                self.parent[elt.index] = -1
+                queue.append(elt.index)
+        self.nbReached = len(queue) + self._flood(lot, queue)
+
+
+    def copy(self) -> 'ExitForest':
+        """Copy the forest.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        forest : ExitForest
+            A forest with the same links, not shared
+        """
+
+        forest = ExitForest()
+        forest.parent = self.parent[:]
+        forest.firstChild = self.firstChild[:]
+        forest.nextSibling = self.nextSibling[:]
+        forest.prevSibling = self.prevSibling[:]
+        forest.nbReached = self.nbReached
+        return forest
+
+
+    def canRemove(self, lot:'Lot', elt:Element) -> bool:
+        """Check if all the elements of the lot remain connected to an exit
+        when an element is removed from it.
+
+        Parameters
+        ----------
+        lot : Lot
+            The common lot, containing elt
+        elt : Element
+            The element to remove
+
+        Returns
+        -------
+        A boolean, True if every other element of the lot remains connected
+        to an exit
+        """
+
+        # unless it is the only one, an element not reached stays so
+        if self.nbReached < lot.nbElements:
+            return (self.nbReached == lot.nbElements - 1 and
+                    self.parent[elt.index] == -2)
+        if self.firstChild[elt.index] < 0:
+            return True
+        nodes, parents = self._reattach(lot, elt.index)
+        return len(parents) == len(nodes)
+
+
+    def add(self, lot:'Lot', elt:Element) -> None:
+        """Update the forest after an element was merged in the lot: the
+        element is attached to a neighbour reached from an exit, then the
+        elements it connects to the exits are attached below it.
+
+        Parameters
+        ----------
+        lot : Lot
+            The common lot, containing elt
+        elt : Element
+            The element merged
+
+        Returns
+        -------
+        None
+        """
+
+        i = elt.index
+        if elt.exit:
+            self.parent[i] = -1
+        else:
+            geom = lot.solution.geom
+            distribution = lot.solution.distribution
+            for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]):
+                j = geom.adjIndices[k]
+                if distribution[j] == lot.index and self.parent[j] != -2:
+                    self._attach(i, j)
+                    break
+            else:
+                return
+        self.nbReached += 1 + self._flood(lot, [i])
+
+
+    def remove(self, lot:'Lot', elt:Element) -> None:
+        """Update the forest after an element was removed from the lot: the
+        elements of its subtree are reattached to the rest of the forest if
+        they can be, and are left unreached otherwise.
+
+        Parameters
+        ----------
+        lot : Lot
+            The common lot, without elt
+        elt : Element
+            The element removed
+
+        Returns
+        -------
+        None
+        """
+
+        i = elt.index
+        if self.parent[i] == -2:
+            return
+        nodes, parents = self._reattach(lot, i)
+        self._detach(i)
+        self.firstChild[i] = -1
+        for j in nodes:
+            self.parent[j] = -2
+            self.firstChild[j] = -1
+            self.nextSibling[j] = -1
+            self.prevSibling[j] = -1
+        for j, p in parents.items():
+            self._attach(j, p)
+        self.nbReached -= 1 + len(nodes) - len(parents)
+
+
+    def _flood(self, lot:'Lot', queue:List[int]) -> int:
+        """Attach the elements of the lot not reached yet to the forest, in
+        breadth-first order from the elements of the queue, and return the
+        number of elements attached."""
+
+        geom = lot.solution.geom
+        adjOffsets = geom.adjOffsets
+        adjIndices = geom.adjIndices
+        distribution = lot.solution.distribution
+        parent = self.parent
+        nb = 0
+        k = 0
+        while k < len(queue):
+            i = queue[k]
+            k += 1
+            for l in range(adjOffsets[i], adjOffsets[i+1]):
+                j = adjIndices[l]
+                if parent[j] == -2 and distribution[j] == lot.index:
+                    self._attach(j, i)
+                    queue.append(j)
+                    nb += 1
+        return nb
+
+
+    def _reattach(self, lot:'Lot', i:int) -> Tuple[List[int], Dict[int, int]]:
+        """Find how the subtree of an element can be reattached to the rest
+        of the forest without it: the elements of the subtree having a
+        neighbour reached outside of it are attached to this neighbour, and
+        the other elements of the subtree are attached by a search from
+        them, which does not leave the subtree.
+
+        Parameters
+        ----------
+        lot : Lot
+            The common lot
+        i : int
+            The index of the element
+
+        Returns
+        -------
+        nodes : List[int]
+            The elements of the subtree of i, without i
+        parents : Dict[int, int]
+            The new parent of each element of the subtree which can be
+            reattached
+        """
+
+        geom = lot.solution.geom
+        adjOffsets = geom.adjOffsets
+        adjIndices = geom.adjIndices
+        distribution = lot.solution.distribution
+
+        # mark the subtree
+        stamp = geom.newMark()
+        marks = geom.marks
+        marks[i] = stamp
+        nodes = []
+        stack = [i]
+        while len(stack) > 0:
+            j = self.firstChild[stack.pop()]
+            while j > -1:
+                marks[j] = stamp
+                nodes.append(j)
+                stack.append(j)
+                j = self.nextSibling[j]
+
+        # attach the elements touching the rest of the forest
+        parents = {}
+        queue = []
+        for j in nodes:
+            for k in range(adjOffsets[j], adjOffsets[j+1]):
+                l = adjIndices[k]
+                if (marks[l] != stamp and distribution[l] == lot.index and
+                        self.parent[l] != -2):
+                    parents[j] = l
+                    queue.append(j)
+                    break
+
+        # and the elements connected to them inside the subtree
+        while len(queue) > 0:
+            j = queue.pop()
+            for k in range(adjOffsets[j], adjOffsets[j+1]):
+                l = adjIndices[k]
+                if marks[l] == stamp and l != i and l not in parents:
+                    parents[l] = j
+                    queue.append(l)
+        return nodes, parents
+
+
+    def _attach(self, i:int, p:int) -> None:
+        """Attach an element as the first child of another one."""
+        self.parent[i] = p
+        self.prevSibling[i] = -1
+        self.nextSibling[i] = self.firstChild[p]
+        if self.firstChild[p] > -1:
+            self.prevSibling[self.firstChild[p]] = i
+        self.firstChild[p] = i
+
+
+    def _detach(self, i:int) -> None:
+        """Detach an element from its parent, with its subtree."""
+        p = self.parent[i]
+        prev = self.prevSibling[i]
+        next = self.nextSibling[i]
+        if p > -1:
+            if prev > -1:
+                self.nextSibling[prev] = next
+            else:
+                self.firstChild[p] = next
+            if next > -1:
+                self.prevSibling[next] = prev
+        self.parent[i] = -2
+        self.prevSibling[i] = -1
+        self.nextSibling[i] = -1
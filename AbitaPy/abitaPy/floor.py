@@ -16,6 +16,8 @@ class Floor:
         list of the element which compose this floor
     nbElements : int
         number of elements which compose this floor
+    elementMap: dict[int, Element]
+        elements of elementList indexed by their numero
         
     Methods
     -------
@@ -37,6 +39,7 @@ class Floor:
 
         self.no = no
         self.elementList = []
+        self.elementMap = {}
         self.nbElements = 0
     
 
@@ -57,12 +60,12 @@ class Floor:
         # check if the element is an element 
         if elt is None :
             raise Exception("AddElementError : null elt")
-        # check if element is not already added
-        for i in range(self.nbElements):
-            if elt == self.elementList[i]:
-                raise Exception("AddElementError : elt E{} already defined".format(elt.index))
+        # check if an element with the same numero is not already added
+        if elt.no in self.elementMap:
+            raise Exception("AddElementError : elt E{} already defined".format(elt.no))
         # add the element
         self.elementList.append(elt)
+        self.elementMap[elt.no] = elt
         self.nbElements += 1
 
         
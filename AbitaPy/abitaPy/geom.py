@@ -1,11 +1,21 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+from array import array
+from bisect import bisect_left, bisect_right
+from math import floor, sqrt
+from typing import List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 from .element import Element
 from .floor import Floor
 from .point import Point
 from .segment import Segment
+from .utils import HASH_MASK, mix_hash
 
 class Geom:
     """
@@ -29,6 +39,72 @@ class Geom:
         List of elements composing the geometry
     floorList : list[Floor]
         List of the floors composing the geometry
+    pointMap : dict[int, Point]
+        Points of pointList indexed by their numero
+    elementMap : dict[int, Element]
+        Elements of elementList indexed by their numero
+    floorMap : dict[int, Floor]
+        Floors of floorList indexed by their numero
+    weldTolerance : float
+        Distance under which points of a same floor are merged when building
+        the geometry (no merge if null, which is the default)
+    nbWelded : int
+        Number of points merged by the last build
+    splitEdges : bool
+        If True, the edges of the elements are split at the points of the
+        collinear edges they contain (T-junctions) when building the geometry,
+        so that partially shared edges connect the elements (default is False)
+    renumber : bool
+        If True, the elements are renumbered in reverse Cuthill-McKee order
+        when building the geometry, so that neighbour elements have close
+        indexes; their numeros and the order of the floors are kept (default
+        is False)
+    areas : array[float]
+        Area of each element
+    perimeters : array[float]
+        Perimeter of each element
+    centroids : array[float]
+        Coordinates (x, y) of the centroid of each element
+    bboxes : array[float]
+        Bounding box (xmin, ymin, xmax, ymax) of each element
+    adjOffsets : array[int]
+        Offsets of the neighbours of each element in adjIndices and
+        adjLengths: the neighbours of the element of index i are stored
+        between adjOffsets[i] and adjOffsets[i+1] (excluded)
+    adjIndices : array[int]
+        Indexes of the neighbour elements, without duplicates
+    adjLengths : array[float]
+        Length of the border shared with each neighbour element
+    extLengths : array[float]
+        Length of the border of each element without neighbour element
+    marks : array[int]
+        Mark of each element for the traversals of the elements: an element
+        is marked by a traversal if its mark is the stamp given by newMark
+        for this traversal, so that the marks never need to be reset
+    symmetries : list[array[int]]
+        Permutations of the element indexes mapping the geometry on itself
+        (reflections or half-turns of a floor, translations between
+        identical floors), keeping the areas, flags, bonuses and adjacency
+        of the elements, without the identity
+    maxSymmetries : int
+        The maximum number of permutations kept in symmetries
+    hashKeys : list[int]
+        A 64-bit key of each element, from which the hash of a distribution
+        is computed (see Solution.__hash__): the elements exchanged by the
+        symmetries have the same key, so that equivalent distributions have
+        the same hash
+    bonusAreas : array[float]
+        Bonus of each element weighted by its area, summed by lot with the
+        areas (see lotMeasures)
+    _borders : tuple
+        The border of each element in one flat layout, for lotMeasures: the
+        index of the element of each entry, the index of the element on the
+        other side (nbElements for the exterior), its length, and the first
+        entry of each element (its exterior border)
+    _stamp : int
+        The stamp of the last traversal
+    _segmentMap : dict[frozenset[Point], Segment]
+        Segments of segmentList indexed by their pair of extremities
     
     Methods
     -------
@@ -36,14 +112,31 @@ class Geom:
         Creates an empty Geom instance 
     build() -> None
         Builds a geometry and sorts the elements by floor
+    weldPoints(tolerance:float) -> int
+        Merges the coincident points of the geometry
+    rcmOrder() -> list[int]
+        Finds the reverse Cuthill-McKee order of the elements
+    newMark() -> int
+        Gets the stamp marking the elements of a new traversal
+    lotMeasures(distribution:list[int], nbLots:int) -> tuple
+        Computes the area, bonus and border length of the lots of a
+        distribution
+    canonical(distribution:list[int]) -> list[int]
+        Gets the canonical form of a distribution under the symmetries
+    components(common:bool) -> list[list[int]]
+        Finds the connected components of the elements
+    pack(indices:list[int]) -> dict
+        Exports the built geometry, or a part of it, as plain data
+    unpack(data:dict) -> None
+        Restores a built geometry exported by pack
     addPoint(pt:Point) -> None
         Adds a point to the geometry
     addElement(elt:Element) -> None
         Adds an element to the geometry
     addFloor(floor:Floor) -> None
         Adds a floor to the geometry (?)
-    _addSegment(seg:Segment) -> int
-        Adds a segment to the geometry
+    _addSegment(seg:Segment) -> Segment
+        Adds a segment to the geometry if not already defined
     """
 
     def __init__(self) -> None:
@@ -62,6 +155,29 @@ class Geom:
         self.pointList = []
         self.elementList = []
         self.floorList = []
+        self.pointMap = {}
+        self.elementMap = {}
+        self.floorMap = {}
+        self.weldTolerance = 0.0
+        self.nbWelded = 0
+        self.splitEdges = False
+        self.renumber = False
+        self.areas = []
+        self.perimeters = []
+        self.centroids = []
+        self.bboxes = []
+        self.adjOffsets = array('l', [0])
+        self.adjIndices = array('l')
+        self.adjLengths = array('d')
+        self.extLengths = array('d')
+        self.marks = array('l')
+        self.symmetries = []
+        self.maxSymmetries = 64
+        self.hashKeys = []
+        self.bonusAreas = []
+        self._borders = None
+        self._stamp = 0
+        self._segmentMap = {}
 
     
     def build(self) -> None:
@@ -77,37 +193,1003 @@ class Geom:
         None
         """
 
+        # Merge coincident points
+        if self.weldTolerance > 0:
+            self.nbWelded = self.weldPoints(self.weldTolerance)
+
         # Close elements
         for i in range(self.nbElements):
             self.elementList[i].close()
+
+        # Compute areas, perimeters, centroids and bounding boxes
+        if np is not None:
+            self._measureElements()
+        else:
+            for elt in self.elementList:
+                elt.measure()
+            self.areas = [elt.area for elt in self.elementList]
+            self.perimeters = [elt.perimeter for elt in self.elementList]
+            self.centroids = [elt.centroid for elt in self.elementList]
+            self.bboxes = [elt.bbox for elt in self.elementList]
         
-        # Generate segment list
-        for i in range(self.nbElements):
-            elt = self.elementList[i]
-            for j in range(elt.nbPoints-1):
-                seg = Segment(elt.pointList[j], elt.pointList[j+1])
-                self._addSegment(seg)
-        
-        #Brute force connectivity finding
+        # Find the points lying inside the edges of the elements
+        splits = self._edgeSplits() if self.splitEdges else {}
+
+        # Generate segment list: shared edges are found through the segment
+        # map, keyed by the unordered pair of extremities. Split edges give
+        # one segment for each part.
         for i in range(self.nbElements):
             elt = self.elementList[i]
             for j in range(elt.nbPoints-1):
                 p1 = elt.pointList[j]
                 p2 = elt.pointList[j+1]
-                for k in range(self.nbSegments):
-                    seg=self.segmentList[k]
-                    if (p1 == seg.p1 and p2 == seg.p2) or (p2 == seg.p1 and p1 == seg.p2):
-                        seg.setElement(elt)
-                        elt.segmentList[elt.nbSegments] = seg
-                        elt.nbSegments += 1
-                        break
+                split = splits.get(frozenset((p1, p2)))
+                if split is None:
+                    pts = [p1, p2]
+                elif split[0] is p1:
+                    pts = split
+                else:
+                    pts = split[::-1]
+                for k in range(len(pts)-1):
+                    seg = self._addSegment(Segment(pts[k], pts[k+1]))
+                    seg.setElement(elt)
+                    elt.segmentList.append(seg)
+                    elt.nbSegments += 1
+
+        # Generate the adjacency arrays
+        self._buildAdjacency()
 
         #Sort elements by floor
         for i in range(self.nbElements):
-            for j in range(self.nbFloors):
-                if self.elementList[i].floorId == j:
-                    self.floorList[j].addElement(self.elementList[i])
+            floorId = self.elementList[i].floorId
+            if 0 <= floorId < self.nbFloors:
+                self.floorList[floorId].addElement(self.elementList[i])
+
+        # Renumber the elements, the floors keeping them in the file order
+        if self.renumber:
+            self._renumber(self.rcmOrder())
+
+        # Find the symmetries of the geometry, the keys of the elements and
+        # the arrays of the measures of the lots
+        self._findSymmetries()
+        self._hashKeys()
+        self._borderArrays()
+
+
+
+    def newMark(self) -> int:
+        """
+        Method that gets the stamp marking the elements of a new traversal:
+        no element is marked with it yet, without resetting the marks of the
+        elements, which are only allocated again when the number of elements
+        changes
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        stamp : int
+            The stamp to set in marks for the elements reached
+        """
+
+        if len(self.marks) != self.nbElements or self._stamp >= 2**31 - 1:
+            self.marks = array('l', [0]) * self.nbElements
+            self._stamp = 0
+        self._stamp += 1
+        return self._stamp
+
+
+    def lotMeasures(self, distribution:List[int],
+                    nbLots:int) -> Tuple[List[float], List[float], List[float]]:
+        """
+        Method that computes the area, the sum of the bonuses weighted by
+        the areas, and the length of the border of each lot of a
+        distribution. With numpy, they are summed by lot with bincount, and
+        the borders between different lots found in one vector comparison;
+        the elements and their borders are summed in the same order as lot
+        by lot, so that the results are the same
+
+        Parameters
+        ----------
+        distribution : list[int]
+            The lot of each element, -1 if it is in no lot
+        nbLots : int
+            The number of lots, greater than the lots of the distribution
+
+        Returns
+        -------
+        areas, bonuses, lengths : list[float], list[float], list[float]
+            The measures of each lot
+        """
+
+        if np is not None and self._borders is not None:
+            sources, targets, lengths, starts = self._borders
+            lots = np.empty(self.nbElements + 1, dtype=np.intp)
+            lots[:-1] = distribution
+            lots[-1] = -2
+            # the lots are shifted by one, for the elements in no lot
+            bins = lots[:-1] + 1
+            outer = np.where(lots[sources] != lots[targets], lengths, 0.0)
+            return (
+                np.bincount(bins, self.areas, nbLots + 1)[1:].tolist(),
+                np.bincount(bins, self.bonusAreas, nbLots + 1)[1:].tolist(),
+                np.bincount(bins, np.add.reduceat(outer, starts),
+                            nbLots + 1)[1:].tolist())
+
+        areas = [0.0] * nbLots
+        bonuses = [0.0] * nbLots
+        lengths = [0.0] * nbLots
+        adjOffsets = self.adjOffsets
+        adjIndices = self.adjIndices
+        adjLengths = self.adjLengths
+        for i, lot in enumerate(distribution):
+            if lot < 0:
+                continue
+            areas[lot] += self.areas[i]
+            bonuses[lot] += self.bonusAreas[i]
+            outer = self.extLengths[i]
+            for k in range(adjOffsets[i], adjOffsets[i+1]):
+                if distribution[adjIndices[k]] != lot:
+                    outer += adjLengths[k]
+            lengths[lot] += outer
+        return areas, bonuses, lengths
+
+
+    def canonical(self, distribution:List[int]) -> List[int]:
+        """
+        Method that gets the canonical form of a distribution under the
+        symmetries of the geometry: the smallest of its images by the
+        symmetries, the lots being numbered in order of appearance, so that
+        two distributions are equivalent if and only if they have the same
+        canonical form
+
+        Parameters
+        ----------
+        distribution : list[int]
+            The lot of each element
+
+        Returns
+        -------
+        canonical : list[int]
+            The canonical form of the distribution
+        """
+
+        best = self._relabel(distribution)
+        image = [0] * self.nbElements
+        for perm in self.symmetries:
+            for i in range(self.nbElements):
+                image[perm[i]] = distribution[i]
+            relabeled = self._relabel(image)
+            if relabeled < best:
+                best = relabeled
+        return best
+
+
+    def _relabel(self, distribution:List[int]) -> List[int]:
+        """
+        Method that numbers the lots of a distribution in order of
+        appearance, the common lot and the free elements keeping their
+        number
+
+        Parameters
+        ----------
+        distribution : list[int]
+            The lot of each element
+
+        Returns
+        -------
+        distribution : list[int]
+            The distribution with its lots renumbered
+        """
+
+        numbers = {0: 0, -1: -1}
+        relabeled = []
+        for lot in distribution:
+            if lot not in numbers:
+                numbers[lot] = len(numbers) - 1
+            relabeled.append(numbers[lot])
+        return relabeled
+
+
+    def _findSymmetries(self) -> None:
+        """
+        Method that finds the symmetries of the built geometry. The
+        candidates are the reflections and the half-turn of each floor about
+        the center of its elements, and the translations between floors with
+        the same number of elements; a candidate is kept if it maps the
+        centroid of each element on the centroid of an element with the same
+        area, flags and bonus, and keeps the adjacency. The group they
+        generate is then enumerated, up to maxSymmetries permutations.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self.symmetries = []
+        if self.nbElements == 0:
+            return
+
+        # elements of each floor, the elements without floor being apart
+        groups = {}
+        for elt in self.elementList:
+            groups.setdefault(elt.floorId, []).append(elt.index)
+        groups = [groups[k] for k in sorted(groups)]
+        centers = []
+        for indices in groups:
+            area = sum(self.elementList[i].area for i in indices)
+            if area > 0:
+                centers.append((
+                    sum(self.elementList[i].centroid[0] * self.elementList[i].area
+                        for i in indices) / area,
+                    sum(self.elementList[i].centroid[1] * self.elementList[i].area
+                        for i in indices) / area))
+            else:
+                centers.append(self.elementList[indices[0]].centroid)
+
+        # tolerance on the coordinates, relative to the size of the geometry
+        xs = [elt.centroid[0] for elt in self.elementList]
+        ys = [elt.centroid[1] for elt in self.elementList]
+        tol = 1e-6 * (1.0 + max(max(xs) - min(xs), max(ys) - min(ys)))
+
+        # candidate generators
+        generators = []
+        for f, indices in enumerate(groups):
+            cx, cy = centers[f]
+            for sx, sy in ((-1, 1), (1, -1), (-1, -1)):
+                perm = self._matchElements(
+                    indices, indices, tol,
+                    lambda x, y: (cx + sx * (x - cx), cy + sy * (y - cy)))
+                if perm is not None:
+                    generators.append(perm)
+            for g in range(f):
+                if len(groups[g]) != len(indices):
+                    continue
+                dx = centers[f][0] - centers[g][0]
+                dy = centers[f][1] - centers[g][1]
+                perm = self._matchElements(groups[g], indices, tol,
+                                           lambda x, y: (x + dx, y + dy))
+                if perm is not None:
+                    # swap the two floors
+                    for i in groups[g]:
+                        perm[perm[i]] = i
+                    generators.append(perm)
+                    break
+
+        # group generated, without the identity
+        identity = tuple(range(self.nbElements))
+        seen = set([identity])
+        queue = [identity]
+        k = 0
+        while k < len(queue) and len(seen) <= self.maxSymmetries:
+            current = queue[k]
+            k += 1
+            for gen in generators:
+                composed = tuple(gen[i] for i in current)
+                if composed not in seen and len(seen) <= self.maxSymmetries:
+                    seen.add(composed)
+                    queue.append(composed)
+        self.symmetries = [array('l', perm) for perm in queue[1:]]
+
+
+    def _hashKeys(self) -> None:
+        """
+        Method that sets the hash keys of the elements: the elements of a
+        same orbit of the symmetries share the key derived from the
+        smallest index of the orbit
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        # orbits of the symmetries, by union-find
+        orbits = [i for i in range(self.nbElements)]
+        def find(i):
+            while orbits[i] != i:
+                orbits[i] = orbits[orbits[i]]
+                i = orbits[i]
+            return i
+        for perm in self.symmetries:
+            for i in range(self.nbElements):
+                a, b = find(i), find(perm[i])
+                if a != b:
+                    orbits[max(a, b)] = min(a, b)
+
+        self.hashKeys = [
+            mix_hash(((find(i) + 1) * 0x9E3779B97F4A7C15) & HASH_MASK)
+            for i in range(self.nbElements)]
+
+
+    def _borderArrays(self) -> None:
+        """
+        Method that sets the weighted bonuses of the elements, and with
+        numpy the flat layout of their borders used by lotMeasures
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self.bonusAreas = [elt.bonus * elt.area for elt in self.elementList]
+        self._borders = None
+        if np is None or self.nbElements == 0:
+            return
+        self.bonusAreas = np.array(self.bonusAreas, dtype=float)
+
+        # each element has its exterior border first, then its neighbours
+        n = self.nbElements
+        offsets = np.array(self.adjOffsets, dtype=np.intp)
+        starts = offsets[:-1] + np.arange(n)
+        sources = np.repeat(np.arange(n), np.diff(offsets) + 1)
+        targets = np.full(len(sources), n, dtype=np.intp)
+        lengths = np.empty(len(sources), dtype=float)
+        neighbours = np.ones(len(sources), dtype=bool)
+        neighbours[starts] = False
+        targets[neighbours] = np.array(self.adjIndices, dtype=np.intp)
+        lengths[neighbours] = np.array(self.adjLengths, dtype=float)
+        lengths[starts] = np.array(self.extLengths, dtype=float)
+        self._borders = (sources, targets, lengths, starts)
+
+
+    def _matchElements(self, sources:List[int], targets:List[int], tol:float,
+                       transform) -> List[int]:
+        """
+        Method that matches the elements of sources on the elements of
+        targets by a transformation of their centroids
+
+        Parameters
+        ----------
+        sources : list[int]
+            The indexes of the elements to transform
+        targets : list[int]
+            The indexes of the elements on which they are mapped
+        tol : float
+            The distance under which two centroids are the same point
+        transform : callable
+            The transformation of the coordinates (x, y) of a centroid
+
+        Returns
+        -------
+        perm : list[int]
+            The permutation of all the elements of the geometry mapping each
+            source on its target and keeping the adjacency, identity
+            elsewhere, or None if there is none
+        """
+
+        # targets indexed by the cell of their centroid
+        grid = {}
+        for j in targets:
+            x, y = self.elementList[j].centroid
+            grid.setdefault((int(floor(x / tol)), int(floor(y / tol))), []).append(j)
+
+        perm = [i for i in range(self.nbElements)]
+        used = set()
+        for i in sources:
+            elt = self.elementList[i]
+            x, y = transform(elt.centroid[0], elt.centroid[1])
+            cx, cy = int(floor(x / tol)), int(floor(y / tol))
+            match = None
+            for key in ((cx + a, cy + b) for a in (-1, 0, 1) for b in (-1, 0, 1)):
+                for j in grid.get(key, ()):
+                    other = self.elementList[j]
+                    if (j not in used and abs(other.centroid[0] - x) <= tol and
+                            abs(other.centroid[1] - y) <= tol and
+                            abs(other.area - elt.area) <= tol * (1 + elt.area) and
+                            other.common == elt.common and
+                            other.imposed == elt.imposed and
+                            other.exit == elt.exit and
+                            other.bonus == elt.bonus):
+                        match = j
+                        break
+                if match is not None:
+                    break
+            if match is None:
+                return None
+            used.add(match)
+            perm[i] = match
+
+        # the adjacency must be kept, with the lengths of the borders
+        for i in sources:
+            j = perm[i]
+            mapped = {}
+            for k in range(self.adjOffsets[i], self.adjOffsets[i+1]):
+                mapped[perm[self.adjIndices[k]]] = self.adjLengths[k]
+            if self.adjOffsets[j+1] - self.adjOffsets[j] != len(mapped):
+                return None
+            for k in range(self.adjOffsets[j], self.adjOffsets[j+1]):
+                length = mapped.get(self.adjIndices[k])
+                if length is None or abs(length - self.adjLengths[k]) > tol * (1 + length):
+                    return None
+        return perm
+
+
+    def components(self, common:bool=True) -> List[List[int]]:
+        """
+        Method that finds the connected components of the elements of the
+        built geometry, by a breadth-first traversal of the adjacency arrays.
+        Elements of different floors or of separate buildings are never
+        connected, so that each component can be solved independently.
+
+        Parameters
+        ----------
+        common : bool, optional
+            If False, the common elements are left out, and do not connect
+            the elements around them (default is True)
+
+        Returns
+        -------
+        componentList : list[list[int]]
+            The indexes of the elements of each component, in increasing
+            order, the components being ordered by their first element
+        """
+
+        component = [-1] * self.nbElements
+        componentList = []
+        for i in range(self.nbElements):
+            if component[i] > -1 or (not common and self.elementList[i].common):
+                continue
+            component[i] = len(componentList)
+            indices = [i]
+            k = 0
+            while k < len(indices):
+                j = indices[k]
+                k += 1
+                for l in range(self.adjOffsets[j], self.adjOffsets[j+1]):
+                    n = self.adjIndices[l]
+                    if component[n] < 0 and (common or
+                                             not self.elementList[n].common):
+                        component[n] = component[i]
+                        indices.append(n)
+            indices.sort()
+            componentList.append(indices)
+        return componentList
+
 
+    def rcmOrder(self) -> List[int]:
+        """
+        Method that finds the reverse Cuthill-McKee order of the elements of
+        the built geometry: each connected component is traversed breadth
+        first from a pseudo-peripheral element, the neighbours of an element
+        being visited by increasing degree, and the whole order is reversed.
+        Neighbour elements are close in this order, whatever the order of
+        the elements in the file.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        order : list[int]
+            The indexes of the elements, in their new order
+        """
+
+        offsets = self.adjOffsets
+        degree = [offsets[i+1] - offsets[i] for i in range(self.nbElements)]
+        visited = [False] * self.nbElements
+        order = []
+        for start in sorted(range(self.nbElements), key=lambda i: degree[i]):
+            if visited[start]:
+                continue
+            # pseudo-peripheral element: restart from the last level while
+            # it gets deeper
+            levels = self._levels(start)
+            while True:
+                last = min(levels[-1], key=lambda i: degree[i])
+                nextLevels = self._levels(last)
+                if len(nextLevels) <= len(levels):
+                    break
+                start, levels = last, nextLevels
+            # Cuthill-McKee traversal
+            visited[start] = True
+            k = len(order)
+            order.append(start)
+            while k < len(order):
+                i = order[k]
+                k += 1
+                neighbours = [self.adjIndices[l]
+                              for l in range(offsets[i], offsets[i+1])
+                              if not visited[self.adjIndices[l]]]
+                neighbours.sort(key=lambda j: degree[j])
+                for j in neighbours:
+                    visited[j] = True
+                    order.append(j)
+        order.reverse()
+        return order
+
+
+    def _levels(self, start:int) -> List[List[int]]:
+        """
+        Method that finds the level structure of the component of an
+        element: the elements at each distance from it
+
+        Parameters
+        ----------
+        start : int
+            The index of the root element
+
+        Returns
+        -------
+        levels : list[list[int]]
+            The indexes of the elements of each level, the first level
+            being [start]
+        """
+
+        stamp = self.newMark()
+        self.marks[start] = stamp
+        levels = [[start]]
+        while True:
+            level = []
+            for i in levels[-1]:
+                for l in range(self.adjOffsets[i], self.adjOffsets[i+1]):
+                    j = self.adjIndices[l]
+                    if self.marks[j] != stamp:
+                        self.marks[j] = stamp
+                        level.append(j)
+            if len(level) == 0:
+                return levels
+            levels.append(level)
+
+
+    def _renumber(self, order:List[int]) -> None:
+        """
+        Method that renumbers the elements of the built geometry: their
+        indexes, measures and adjacency arrays follow the new order
+
+        Parameters
+        ----------
+        order : list[int]
+            The indexes of the elements, in their new order
+
+        Returns
+        -------
+        None
+        """
+
+        # in place, as the solutions share the list
+        self.elementList[:] = [self.elementList[i] for i in order]
+        for i, elt in enumerate(self.elementList):
+            elt.index = i
+        if np is not None:
+            order = np.array(order, dtype=int)
+            self.areas = self.areas[order]
+            self.perimeters = self.perimeters[order]
+            self.centroids = self.centroids[order]
+            self.bboxes = self.bboxes[order]
+        else:
+            self.areas = [self.areas[i] for i in order]
+            self.perimeters = [self.perimeters[i] for i in order]
+            self.centroids = [self.centroids[i] for i in order]
+            self.bboxes = [self.bboxes[i] for i in order]
+        self._buildAdjacency()
+
+
+    def pack(self, indices:List[int]=None) -> dict:
+        """
+        Method that exports the built geometry as plain data (numbers, lists
+        and dictionaries only), so that it can be saved and restored by
+        unpack without building it again. A part of the geometry made of
+        whole connected components can be exported alone, as a geometry of
+        its own.
+
+        Parameters
+        ----------
+        indices : list[int], optional
+            The indexes of the elements to export, which must be a union of
+            connected components (default is all the elements)
+
+        Returns
+        -------
+        data : dict
+            The points, elements, segments, measures and adjacency arrays of
+            the geometry
+        """
+
+        if indices is None:
+            indices = range(self.nbElements)
+            elementList = self.elementList
+            segmentList = self.segmentList
+            pointList = self.pointList
+        else:
+            elementList = [self.elementList[i] for i in indices]
+            segmentList = []
+            used = set()
+            for elt in elementList:
+                used.update(id(pt) for pt in elt.pointList)
+                for seg in elt.segmentList:
+                    if id(seg) not in used:
+                        used.add(id(seg))
+                        used.add(id(seg.p1))
+                        used.add(id(seg.p2))
+                        segmentList.append(seg)
+            pointList = [pt for pt in self.pointList if id(pt) in used]
+
+        pointIds = dict((id(pt), i) for i, pt in enumerate(pointList))
+        eltIds = dict((id(elt), i) for i, elt in enumerate(elementList))
+        segIds = dict((id(seg), i) for i, seg in enumerate(segmentList))
+
+        # adjacency arrays, renumbered
+        offsets = [0]
+        neighbours = []
+        lengths = []
+        for i in indices:
+            for k in range(self.adjOffsets[i], self.adjOffsets[i+1]):
+                n = eltIds.get(id(self.elementList[self.adjIndices[k]]))
+                if n is None:
+                    raise Exception("Cannot pack E{}: neighbour not packed".format(
+                        self.elementList[i].no))
+                neighbours.append(n)
+                lengths.append(self.adjLengths[k])
+            offsets.append(len(neighbours))
+
+        return {
+            'floors': [(floor.no, [eltIds[id(elt)] for elt in floor.elementList
+                                   if id(elt) in eltIds])
+                       for floor in self.floorList],
+            'points': [(pt.no, pt.x, pt.y, pt.floorId) for pt in pointList],
+            'elements': [(elt.no, elt.floorId, elt.bonus, elt.exit, elt.common,
+                          elt.imposed, elt.area, elt.perimeter, elt.centroid,
+                          elt.bbox, [pointIds[id(pt)] for pt in elt.pointList],
+                          [segIds[id(seg)] for seg in elt.segmentList])
+                         for elt in elementList],
+            'segments': [(pointIds[id(seg.p1)], pointIds[id(seg.p2)],
+                          eltIds.get(id(seg.e1), -1), eltIds.get(id(seg.e2), -1))
+                         for seg in segmentList],
+            'nbWelded': self.nbWelded,
+            'adjacency': (offsets, neighbours, lengths,
+                          [self.extLengths[i] for i in indices]),
+        }
+
+
+    def unpack(self, data:dict) -> None:
+        """
+        Method that restores in an empty geometry a built geometry exported
+        by pack
+
+        Parameters
+        ----------
+        data : dict
+            The data returned by pack
+
+        Returns
+        -------
+        None
+        """
+
+        for no, _ in data['floors']:
+            self.addFloor(Floor(no))
+        self.pointList = [Point(x, y, floorId, no)
+                          for no, x, y, floorId in data['points']]
+        self.nbPoints = len(self.pointList)
+        self.pointMap = dict((pt.no, pt) for pt in self.pointList)
+        self.segmentList = []
+        for p1, p2, e1, e2 in data['segments']:
+            seg = Segment(self.pointList[p1], self.pointList[p2])
+            self._segmentMap[frozenset((seg.p1, seg.p2))] = seg
+            self.segmentList.append(seg)
+        self.nbSegments = len(self.segmentList)
+        for (no, floorId, bonus, exit, common, imposed, area, perimeter,
+             centroid, bbox, pointIds, segIds) in data['elements']:
+            elt = Element(floorId, no)
+            elt.bonus = bonus
+            elt.exit = exit
+            elt.common = common
+            elt.imposed = imposed
+            elt.area = area
+            elt.perimeter = perimeter
+            elt.centroid = tuple(centroid)
+            elt.bbox = tuple(bbox)
+            elt.pointList = [self.pointList[i] for i in pointIds]
+            elt.nbPoints = len(elt.pointList)
+            elt.segmentList = [self.segmentList[i] for i in segIds]
+            elt.nbSegments = len(elt.segmentList)
+            elt.index = len(self.elementList)
+            self.elementList.append(elt)
+            self.elementMap[no] = elt
+        self.nbElements = len(self.elementList)
+        for floor, (_, eltIds) in zip(self.floorList, data['floors']):
+            for i in eltIds:
+                floor.addElement(self.elementList[i])
+        for seg, (_, _, e1, e2) in zip(self.segmentList, data['segments']):
+            seg.e1 = self.elementList[e1] if e1 > -1 else None
+            seg.e2 = self.elementList[e2] if e2 > -1 else None
+        self.nbWelded = data['nbWelded']
+
+        # measures and adjacency arrays
+        self.areas = [elt.area for elt in self.elementList]
+        self.perimeters = [elt.perimeter for elt in self.elementList]
+        self.centroids = [elt.centroid for elt in self.elementList]
+        self.bboxes = [elt.bbox for elt in self.elementList]
+        if np is not None:
+            self.areas = np.array(self.areas, dtype=float)
+            self.perimeters = np.array(self.perimeters, dtype=float)
+            self.centroids = np.array(self.centroids, dtype=float)
+            self.bboxes = np.array(self.bboxes, dtype=float)
+        offsets, indices, lengths, extLengths = data['adjacency']
+        self.adjOffsets = array('l', offsets)
+        self.adjIndices = array('l', indices)
+        self.adjLengths = array('d', lengths)
+        self.extLengths = array('d', extLengths)
+        self._findSymmetries()
+        self._hashKeys()
+        self._borderArrays()
+
+
+    def weldPoints(self, tolerance:float) -> int:
+        """
+        Method that merges the points of a same floor which are closer than
+        the tolerance, and updates the elements using them. Points are
+        bucketed in a uniform grid of cells of the size of the tolerance, so
+        that only the neighbouring cells of a point are searched. Must be
+        called before the elements are closed.
+
+        Parameters
+        ----------
+        tolerance : float
+            The distance under which two points are merged
+
+        Returns
+        -------
+        nb : int
+            The number of points removed from the geometry
+        """
+
+        if tolerance <= 0:
+            return 0
+
+        # bucket the points in the grid, merging each point with the first
+        # point already kept within the tolerance
+        grid = {}
+        kept = []
+        merged = {}
+        for pt in self.pointList:
+            cx = int(floor(pt.x / tolerance))
+            cy = int(floor(pt.y / tolerance))
+            target = self._weldTarget(grid, pt, cx, cy, tolerance)
+            if target is None:
+                grid.setdefault((pt.floorId, cx, cy), []).append(pt)
+                kept.append(pt)
+            else:
+                merged[pt] = target
+        if len(merged) == 0:
+            return 0
+
+        # replace the merged points in the elements, removing the edges
+        # which have become degenerated
+        for elt in self.elementList:
+            pointList = []
+            for pt in elt.pointList:
+                pt = merged.get(pt, pt)
+                if len(pointList) == 0 or pointList[-1] is not pt:
+                    pointList.append(pt)
+            while len(pointList) > 1 and pointList[-1] is pointList[0]:
+                pointList.pop()
+            elt.pointList = pointList
+            elt.nbPoints = len(pointList)
+
+        self.pointList = kept
+        self.nbPoints = len(kept)
+        for pt in merged:
+            if self.pointMap.get(pt.no) is pt:
+                del self.pointMap[pt.no]
+        return len(merged)
+
+
+    def _weldTarget(self, grid:dict, pt:Point, cx:int, cy:int,
+                    tolerance:float) -> Point:
+        """
+        Method that searches the grid cells around a point for a point of the
+        same floor within the tolerance
+
+        Parameters
+        ----------
+        grid : dict[tuple[int, int, int], list[Point]]
+            The points already kept, by floor and cell coordinates
+        pt : Point
+            The point to merge
+        cx, cy : int
+            The coordinates of the cell of the point
+        tolerance : float
+            The distance under which two points are merged
+
+        Returns
+        -------
+        target : Point
+            The point in which pt must be merged, or None if there is none
+        """
+
+        for i in range(cx-1, cx+2):
+            for j in range(cy-1, cy+2):
+                for other in grid.get((pt.floorId, i, j), ()):
+                    if ((other.x - pt.x)**2 + (other.y - pt.y)**2 <=
+                            tolerance**2):
+                        return other
+        return None
+
+
+    def _measureElements(self) -> None:
+        """
+        Method that computes the area, perimeter, centroid and bounding box
+        of all the closed elements in one vectorised pass: the points of all
+        elements are packed in flat coordinate arrays, and the per-edge terms
+        are summed element by element.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        if self.nbElements == 0:
+            return
+
+        # pack the closed rings of the elements
+        xs = np.array([p.x for elt in self.elementList for p in elt.pointList],
+                      dtype=float)
+        ys = np.array([p.y for elt in self.elementList for p in elt.pointList],
+                      dtype=float)
+        sizes = np.array([elt.nbPoints for elt in self.elementList])
+        starts = np.zeros(self.nbElements, dtype=int)
+        np.cumsum(sizes[:-1], out=starts[1:])
+
+        # per edge terms, null for the pairs joining two different rings
+        last = starts[1:] - 1
+        cross = xs[:-1] * ys[1:] - xs[1:] * ys[:-1]
+        cross[last] = 0
+        lengths = np.hypot(xs[1:] - xs[:-1], ys[1:] - ys[:-1])
+        lengths[last] = 0
+        cx = (xs[:-1] + xs[1:]) * cross
+        cy = (ys[:-1] + ys[1:]) * cross
+
+        # sum them by element
+        area = np.add.reduceat(cross, starts)
+        if np.any(area == 0):
+            elt = self.elementList[int(np.argmax(area == 0))]
+            raise Exception("Cannot close element E{}: area is null".format(elt.no))
+        self.areas = np.abs(area) * 0.5
+        self.perimeters = np.add.reduceat(lengths, starts)
+        self.centroids = np.column_stack((
+            np.add.reduceat(cx, starts) / (3 * area),
+            np.add.reduceat(cy, starts) / (3 * area)))
+        self.bboxes = np.column_stack((
+            np.minimum.reduceat(xs, starts), np.minimum.reduceat(ys, starts),
+            np.maximum.reduceat(xs, starts), np.maximum.reduceat(ys, starts)))
+
+        # report them on the elements
+        for elt, area, perimeter, centroid, bbox in zip(
+                self.elementList, self.areas.tolist(), self.perimeters.tolist(),
+                self.centroids.tolist(), self.bboxes.tolist()):
+            elt.area = area
+            elt.perimeter = perimeter
+            elt.centroid = tuple(centroid)
+            elt.bbox = tuple(bbox)
+
+
+    def _buildAdjacency(self) -> None:
+        """
+        Method that generates the adjacency arrays of the elements from their
+        segments, in compressed sparse row layout: the neighbours of each
+        element, and the length of border shared with each of them.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        self.adjOffsets = array('l', [0])
+        self.adjIndices = array('l')
+        self.adjLengths = array('d')
+        self.extLengths = array('d')
+        for elt in self.elementList:
+            shared = {}
+            ext = 0.0
+            for seg in elt.segmentList:
+                next = seg.nextOf(elt)
+                if next is None:
+                    ext += seg.length
+                elif next is not elt:
+                    shared[next.index] = shared.get(next.index, 0.0) + seg.length
+            self.adjIndices.extend(shared.keys())
+            self.adjLengths.extend(shared.values())
+            self.adjOffsets.append(len(self.adjIndices))
+            self.extLengths.append(ext)
+
+
+    def _edgeSplits(self) -> dict:
+        """
+        Method that finds the edges of the elements containing points of
+        collinear edges (T-junctions). Edges are grouped by floor and
+        supporting line, then the extremities of each group are swept along
+        the line so that the points inside an edge are found by dichotomy.
+        Must be called after the elements are closed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        splits : dict[frozenset[Point], list[Point]]
+            For each split edge, the list of its points ordered along the
+            edge, from one extremity to the other
+        """
+
+        eps = self.weldTolerance if self.weldTolerance > 0 else 1e-6
+
+        # group the edges by floor and supporting line
+        lines = {}
+        for elt in self.elementList:
+            for j in range(elt.nbPoints-1):
+                p1 = elt.pointList[j]
+                p2 = elt.pointList[j+1]
+                length = sqrt((p2.x - p1.x)**2 + (p2.y - p1.y)**2)
+                if length <= eps:
+                    continue
+                ux = (p2.x - p1.x) / length
+                uy = (p2.y - p1.y) / length
+                if ux < -eps or (ux <= eps and uy < 0):
+                    ux, uy = -ux, -uy
+                key = (p1.floorId, round(ux / eps), round(uy / eps),
+                       round((ux * p1.y - uy * p1.x) / eps))
+                line = lines.setdefault(key, (ux, uy, {}))
+                line[2][frozenset((p1, p2))] = (p1, p2)
+
+        # sweep the extremities of the edges along each line
+        splits = {}
+        for ux, uy, edges in lines.values():
+            if len(edges) < 2:
+                continue
+            points = {}
+            for p1, p2 in edges.values():
+                points[p1] = ux * p1.x + uy * p1.y
+                points[p2] = ux * p2.x + uy * p2.y
+            events = sorted((t, i, pt)
+                            for i, (pt, t) in enumerate(points.items()))
+            abscissas = [t for t, _, _ in events]
+            for key, (p1, p2) in edges.items():
+                t1 = points[p1]
+                t2 = points[p2]
+                forward = t1 < t2
+                low, high = (t1, t2) if forward else (t2, t1)
+                start = bisect_right(abscissas, low + eps)
+                end = bisect_left(abscissas, high - eps)
+                if start >= end:
+                    continue
+                inner = [p1]
+                last = low
+                for t, _, pt in events[start:end]:
+                    if t - last > eps:
+                        inner.append(pt)
+                        last = t
+                if len(inner) == 1:
+                    continue
+                if forward:
+                    splits[key] = inner + [p2]
+                else:
+                    splits[key] = [p1] + inner[:0:-1] + [p2]
+        return splits
 
 
     def addPoint(self, pt:Point) -> None:
@@ -130,12 +1212,12 @@ class Geom:
         # check if pointlist is not none
         if self.pointList is None:
             raise Exception("AddPointError : null pointList")
-        # check if element is not already added
-        for i in range(self.nbPoints):
-            if pt == self.pointList[i]:
-                raise Exception("AddPointError : pt P{} already defined".format(pt.no))
+        # check if a point with the same numero is not already added
+        if pt.no in self.pointMap:
+            raise Exception("AddPointError : pt P{} already defined".format(pt.no))
         # add the point
         self.pointList.append(pt)
+        self.pointMap[pt.no] = pt
         self.nbPoints += 1
 
 
@@ -159,12 +1241,12 @@ class Geom:
         # check if pointlist is not none
         if self.elementList is None:
             raise Exception("AddElementError : null elementList")
-        # check if element is not already added
-        for i in range(self.nbElements):
-            if elt == self.elementList[i]:
-                raise Exception("AddElementError : elt E{} already defined".format(elt.no))
+        # check if an element with the same numero is not already added
+        if elt.no in self.elementMap:
+            raise Exception("AddElementError : elt E{} already defined".format(elt.no))
         # add the element
         self.elementList.append(elt)
+        self.elementMap[elt.no] = elt
         elt.index = self.nbElements
         self.nbElements += 1
 
@@ -188,18 +1270,19 @@ class Geom:
         # check if floorlist is not none
         if self.floorList is None:
             raise Exception("AddFloorError : null floorList")
-        # check if element is not already added
-        for i in range(self.nbFloors):
-            if floor == self.floorList[i]:
-                raise Exception("AddFloorError : floor F{} already defined".format(floor.no))
+        # check if a floor with the same numero is not already added
+        if floor.no in self.floorMap:
+            raise Exception("AddFloorError : floor F{} already defined".format(floor.no))
         # add the element
         self.floorList.append(floor)
+        self.floorMap[floor.no] = floor
         self.nbFloors += 1
 
 
     def _addSegment(self, seg:Segment) -> Segment:
         """
-        Method that adds a segment to the geometry
+        Method that adds a segment to the geometry, unless a segment with the
+        same extremities is already defined
         
         Parameters
         ----------
@@ -209,7 +1292,8 @@ class Geom:
         Returns
         -------
         seg : Segment
-            Return the passed segment if already added
+            The segment of the geometry having the extremities of the passed
+            segment (the passed segment itself if it has been added)
         """
 
         # check if the segment is not null
@@ -218,12 +1302,13 @@ class Geom:
         # check if floorlist is not none
         if self.segmentList is None:
             raise Exception("AddSegmentError : null segmentList")
-        # check if floor is not already added
-        for i in range(self.nbSegments):
-            if seg == self.segmentList[i]:
-                return seg
-        # add the element
+        # check if segment is not already added
+        key = frozenset((seg.p1, seg.p2))
+        found = self._segmentMap.get(key)
+        if found is not None:
+            return found
+        # add the segment
+        self._segmentMap[key] = seg
         self.segmentList.append(seg)
         self.nbSegments += 1
-        return None
-
+        return seg
@@ -1,12 +1,15 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from typing import List
+from typing import List, Tuple
 
 from .solution import Solution
+from .border import Border
 from .segment import Segment
 from .element import Element
 from .point import Point
+from .exitForest import ExitForest
+from .utils import HASH_MASK, in_ring, lot_hash, ring_area
 
 class Lot:
     """
@@ -18,6 +21,16 @@ class Lot:
     ----------
     fitness : float
         The value (score) of the lot
+    value : float
+        The fitness of the lot before its reduction to unit area (see
+        Algo.evaluate)
+    bonus : float
+        The sum of the bonus of the elements of the lot, weighted by their
+        area
+    key : int
+        The sum of the hash keys of the elements of the lot (see
+        Geom.hashKeys), modulo 2**64, from which the hash of the solution
+        is computed (see Solution.__hash__)
     length : float
         The length of the border of the lot (perimeter of the lot)
     index : int
@@ -30,19 +43,33 @@ class Lot:
         The numero of the type the lot is
     solution : Solution
         The global solution in which this lot exists
-    segmentList : List[Segment]
-        The list of segments defining the border of the lot
+    segmentList : Border
+        The segments defining the border of the lot, in the order in which
+        they were added, accessed by position as in a list
     elementList : List[Element]
         The list of elements defining the lot
     nbElements : int
         Length of the element list
     nbSegments : int
         Length of the segment list
+    _cuts : List[frozenset[int]]
+        A cell holding the indexes of the cut elements of the lot (see
+        cutElements), or None until they are computed. The cell is shared
+        with the identical lots of the copies of the solution, and replaced
+        by a new one when the elements of the lot change
+    _exits : ExitForest
+        The forest of the elements of the common lot reached from its exits,
+        or None until it is built (see stillConnected). It is shared with
+        the identical lots of the copies of the solution until it changes
     
     Methods
     -------
     I'm lazy sorry, perhaps one day?
     """
+
+    __slots__ = ('fitness', 'value', 'bonus', 'key', 'length', 'index',
+                 'common', 'area', 'typeNo', 'solution', 'segmentList',
+                 'elementList', 'nbElements', 'nbSegments', '_cuts', '_exits')
     
     def __init__(self, sol:Solution, index:int) -> None:
         """
@@ -61,16 +88,21 @@ class Lot:
         """
 
         self.fitness = 0.0
+        self.value = 0.0
+        self.bonus = 0.0
+        self.key = 0
         self.length = 0.0
         self.index = index
         self.common = False
         self.area = 0.0
         self.typeNo = 0
         self.solution = sol
-        self.segmentList = []
+        self.segmentList = Border()
         self.elementList = []
         self.nbElements = 0
         self.nbSegments = 0
+        self._cuts = [None]
+        self._exits = None
 
 
     def stillConnex(self, removed:Element) -> bool:
@@ -99,28 +131,96 @@ class Lot:
         if self.nbElements < 2 or removed.imposed:
             return False
 
-        # Initialize the marks
-        for i in range(self.nbElements):
-            self.elementList[i].mark = False
-        removed.mark = True
-
-        # Get first neigbour in this lot
-        elt = None
-        for seg in removed.segmentList:
-            elt = seg.nextOf(removed)
-            if elt is not None and elt.getLot(self.solution) == self.index:
+        # The lot remains connex unless the element is a cut element, the
+        # cut elements being computed once until the lot changes
+        if self._cuts[0] is None:
+            self._cuts[0] = self.cutElements()
+        return removed.index not in self._cuts[0]
+
+
+    def cutElements(self) -> frozenset:
+        """Find the cut elements of the lot, that is to say the articulation
+        points of the graph of its elements, whose removal disconnects the
+        lot. They are found in linear time by an iterative depth-first
+        search (Tarjan): an element is a cut element if one of its children
+        in the search tree has no back edge going above it. If the lot is not
+        connex, all its elements are cut elements.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        cuts : frozenset[int]
+            The indexes of the cut elements
+        """
+
+        if self.nbElements == 0:
+            return frozenset()
+        adjOffsets = self.solution.geom.adjOffsets
+        adjIndices = self.solution.geom.adjIndices
+        distribution = self.solution.distribution
+
+        root = self.elementList[0].index
+        disc = {root: 0}
+        low = {root: 0}
+        cuts = set()
+        nbChildren = 0
+        # stack of (element, parent, next position in the adjacency arrays)
+        stack = [(root, -1, adjOffsets[root])]
+        while len(stack) > 0:
+            i, parent, k = stack[-1]
+            end = adjOffsets[i+1]
+            while k < end:
+                j = adjIndices[k]
+                k += 1
+                if distribution[j] != self.index or j == parent:
+                    continue
+                if j in disc:
+                    low[i] = min(low[i], disc[j])
+                    continue
+                # go down the tree edge to j
+                stack[-1] = (i, parent, k)
+                disc[j] = low[j] = len(disc)
+                stack.append((j, i, adjOffsets[j]))
                 break
+            else:
+                # all neighbours of i explored: go back up to the parent
+                stack.pop()
+                if parent == root:
+                    nbChildren += 1
+                elif parent > -1:
+                    if low[i] >= disc[parent]:
+                        cuts.add(parent)
+                if parent > -1:
+                    low[parent] = min(low[parent], low[i])
+        if nbChildren > 1:
+            cuts.add(root)
+
+        if len(disc) < self.nbElements:
+            return frozenset(elt.index for elt in self.elementList)
+        return frozenset(cuts)
+
+
+    def shareIndexes(self, lot) -> None:
+        """Share the cut elements and the exit forest of an identical lot of
+        another solution, so that they are computed once for both lots.
 
-        # Diffuse the marks from first neigbour in this lot
-        self._markFrom(elt)
+        Parameters
+        ----------
+        lot : Lot
+            The lot of the other solution, with the same elements
 
-        # Count the marks
-        nb = 0
-        for elt in self.elementList:
-            if elt.mark: nb += 1
-        
-        # Return true if all elements have been marked
-        return nb == self.nbElements
+        Returns
+        -------
+        None
+        """
+
+        self._cuts = lot._cuts
+        if lot._exits is not None:
+            lot._exits.shared = True
+            self._exits = lot._exits
 
     
     def stillConnected(self, removed:Element) -> bool:
@@ -155,23 +255,11 @@ class Lot:
                 if removed.imposed:
                     return False
 
-                # Initialise the marks
-                for i in range(self.nbElements):
-                    self.elementList[i].mark = self.elementList[i].exit
-                removed.mark = True
-
-                # Diffuse the marks from entrance
-                for elt in self.elementList:
-                    if elt.exit:
-                        self._markFrom(elt)
-                
-                # Count the marks
-                nb = 0
-                for elt in self.elementList:
-                    if elt.mark: nb += 1
-                
-                # return true if all elements have been marked
-                return nb == self.nbElements
+                # Check that the elements of the subtree of the removed
+                # element in the exit forest can be reattached to the exits
+                if self._exits is None:
+                    self._exits = ExitForest(self)
+                return self._exits.canRemove(self, removed)
             
             # Case of the other lots
             else:
@@ -221,6 +309,10 @@ class Lot:
             False if no element was merged
         """
 
+        adjOffsets = self.solution.geom.adjOffsets
+        adjIndices = self.solution.geom.adjIndices
+        distribution = self.solution.distribution
+
         for i in range(self.nbSegments):
             seg = self.segmentList[i]
             
@@ -236,21 +328,22 @@ class Lot:
                     if self.mergeElement(elt): return True
                 
                 # else if neighbour in common test before merging
-                elif lotID == 0 and not elt.imposed:
-
-                    # test if neighbour lot remains connected
-                    j = 0
-                    while j < elt.nbSegments:
-                        seg = elt.segmentList[j]
-                        nextElt = seg.nextOf(elt)
-                        lotID = (-1 if nextElt is None 
-                                    else nextElt.getLot(self.solution))
-                        if lotID > -1 and lotID != self.index:
+                elif lotID == 0 and not (elt.imposed or elt.fixed):
+
+                    # test if neighbour lots remain connected
+                    connected = True
+                    checked = set()
+                    for k in range(adjOffsets[elt.index],
+                                   adjOffsets[elt.index+1]):
+                        lotID = distribution[adjIndices[k]]
+                        if (lotID > -1 and lotID != self.index and
+                                lotID not in checked):
                             if not self.solution.lotList[lotID].stillConnected(elt):
+                                connected = False
                                 break
-                        j += 1
+                            checked.add(lotID)
                     
-                    if j == elt.nbSegments:
+                    if connected:
                         # remove element from common lot
                         self.solution.lotList[0].removeElement(elt)
                         # add element to this lot
@@ -274,6 +367,7 @@ class Lot:
         """
 
         # for each element
+        self.length = 0.0
         for j in range(self.nbElements):
             elt = self.elementList[j]
             # for each segment of each element
@@ -281,14 +375,63 @@ class Lot:
                 seg = elt.segmentList[i]
                 # if the element on the other side of the segment is in the lot,
                 # segment must not be in the border list, else it must be.
-                elt2 = seg.nextOf(elt)
                 if self.contain(seg.nextOf(elt)):
                     self._removeSegment(seg)
                 else:
                     self._addSegment(seg)
+            # update length
+            self.length += self._borderLengths(elt)[1]
         
 
 
+    def fill(self, elementList:List[Element], area:float, bonus:float,
+             length:float) -> None:
+        """Set the elements of an empty lot, already in the lot in the
+        distribution of the solution, with the measures computed by the
+        geometry (see Solution.setLots), and build its border. The hash of
+        the solution is not updated.
+
+        Parameters
+        ----------
+        elementList : List[Element]
+            The elements of the lot
+        area : float
+            The area of the lot
+        bonus : float
+            The sum of the bonus of the elements, weighted by their area
+        length : float
+            The length of the border of the lot
+
+        Returns
+        -------
+        None
+        """
+
+        distribution = self.solution.distribution
+        hashKeys = self.solution.geom.hashKeys
+        index = self.index
+        key = self.key
+        segmentList = []
+        for elt in elementList:
+            if elt.exit: self.common = True
+            key += hashKeys[elt.index]
+            # the segments whose other element is not in the lot
+            for seg in elt.segmentList:
+                next = seg.nextOf(elt)
+                if next is None or distribution[next.index] != index:
+                    segmentList.append(seg)
+        self.key = key & HASH_MASK
+        self.elementList = elementList
+        self.nbElements = len(elementList)
+        self.segmentList = Border(segmentList)
+        self.nbSegments = len(segmentList)
+        self.area = area
+        self.bonus = bonus
+        self.length = length
+        self._cuts = [None]
+        self._exits = None
+
+
     def contain(self, elt:Element) -> bool:
         """
         Method that checks if an element is contained is the solution associated to this lot
@@ -311,7 +454,8 @@ class Lot:
 
     def addElement(self, elt:Element) -> None:
         """Add an element to the element list. Build a predifined valid lot. 
-        Don't build the border so that elements can be added in any order.
+        Don't build the border so that elements can be added in any order,
+        nor update the hash of the solution (see Solution.setLots).
         
         Parameters
         ----------
@@ -341,13 +485,17 @@ class Lot:
         #add the element to the list
         self.elementList.append(elt)
         self.nbElements += 1
+        self._cuts = [None]
+        self._exits = None
 
         # Update the solution distribution
         self.solution.distribution[elt.index]=self.index
         if elt.exit: self.common=True
 
-        # update area
+        # update area, bonus and key
         self.area += elt.area
+        self.bonus += elt.bonus * elt.area
+        self.key = (self.key + self.solution.geom.hashKeys[elt.index]) & HASH_MASK
     
 
     def mergeElement(self, elt:Element) -> bool:
@@ -375,6 +523,11 @@ class Lot:
         # add the element tp the list
         self.elementList.append(elt)
         self.nbElements += 1
+        self._cuts = [None]
+
+        # update length
+        shared, outer = self._borderLengths(elt)
+        self.length += outer - shared
 
         # rebuild border list of segments
         for seg in elt.segmentList:
@@ -386,8 +539,14 @@ class Lot:
         # update the solution distribution
         self.solution.distribution[elt.index] = self.index
 
-        # update area
+        # update the exit forest
+        if self._exits is not None:
+            self._ownExits().add(self, elt)
+
+        # update area, bonus and key
         self.area += elt.area
+        self.bonus += elt.bonus * elt.area
+        self._setKey(self.key + self.solution.geom.hashKeys[elt.index])
         
         return True
 
@@ -414,6 +573,7 @@ class Lot:
                 # remove element
                 self.elementList.pop(i)
                 self.nbElements -= 1
+                self._cuts = [None]
 
                 # rebuild the border
                 for seg in elt.segmentList:
@@ -425,8 +585,18 @@ class Lot:
                 # update the solution distribution
                 self.solution.distribution[elt.index] = -1
 
-                # update area
+                # update the exit forest
+                if self._exits is not None:
+                    self._ownExits().remove(self, elt)
+
+                # update length
+                shared, outer = self._borderLengths(elt)
+                self.length += shared - outer
+
+                # update area, bonus and key
                 self.area -= elt.area
+                self.bonus -= elt.bonus * elt.area
+                self._setKey(self.key - self.solution.geom.hashKeys[elt.index])
 
                 # exit
                 return True
@@ -436,38 +606,62 @@ class Lot:
                 
 
 
-    def _markFrom(self, elt:Element) -> None:
-        """Diffuse a mark from elt to all neighbours which are in the same lot.
-        Recursive call. No diffusion from already marked elements. 
-        The attribute mark must be initialised for all elements.
+    def _setKey(self, key:int) -> None:
+        """Change the key of the lot, and update the hash of the solution
+        with it."""
 
-        This method allows to check if all elements of a lot are connected one
-        to each other (see the method stillConnex), by exploring all neighbours
-        of an element recursively.
+        key &= HASH_MASK
+        sol = self.solution
+        sol.hashKey = (sol.hashKey - lot_hash(self.key, self.index) +
+                       lot_hash(key, self.index)) & HASH_MASK
+        self.key = key
+
+
+
+    def _ownExits(self) -> ExitForest:
+        """Get the exit forest of the lot, copied first if it is shared, so
+        that it can be changed."""
+
+        if self._exits.shared:
+            self._exits = self._exits.copy()
+        return self._exits
+
+
+
+    def _borderLengths(self, elt:Element) -> Tuple[float, float]:
+        """Split the border of an element between the part shared with the
+        other elements of the lot and the rest, using the adjacency arrays of
+        the geometry.
 
         Parameters
         ----------
         elt : Element
-            The source element from which we began the diffusion
+            The element whose border is measured
 
         Returns
-        -------       
-        None
+        -------
+        shared, outer : float, float
+            The length of the border of elt shared with other elements of the
+            lot, and the length of the remaining border
         """
 
-        elt.mark = True
-        for i in range(elt.nbSegments):
-            next = elt.segmentList[i].nextOf(elt)
-            if next is not None :
-                if next.getLot(self.solution)==self.index and not next.mark:
-                    next.mark = True
-                    self._markFrom(next)
+        geom = self.solution.geom
+        distribution = self.solution.distribution
+        shared = 0.0
+        outer = geom.extLengths[elt.index]
+        for k in range(geom.adjOffsets[elt.index], geom.adjOffsets[elt.index+1]):
+            if distribution[geom.adjIndices[k]] == self.index:
+                shared += geom.adjLengths[k]
+            else:
+                outer += geom.adjLengths[k]
+        return shared, outer
 
 
 
     def _addSegment(self, seg:Segment) -> None:
         """
-        Method that adds a segment to the list of border segments of the lot
+        Method that adds a segment at the end of the border segments of the
+        lot, in O(1), unless it is already in the border
         
         Parameters
         ----------
@@ -479,15 +673,13 @@ class Lot:
         None
         """
         
-        self.segmentList.append(seg)
-        self.nbSegments += 1
-        #update length
-        self.length += seg.length
+        if self.segmentList.add(seg):
+            self.nbSegments += 1
 
 
     def _removeSegment(self, seg:Segment) -> None:
-        """Remove a segment from the list of segments representing the border
-        of the lot. Update also nbSegments and length attributes.
+        """Remove a segment from the segments representing the border of the
+        lot, in O(1). Update also the nbSegments attribute.
         
         Parameters
         ----------
@@ -499,18 +691,20 @@ class Lot:
         None
         """
         
-        try:
-            self.segmentList.remove(seg)
+        if self.segmentList.remove(seg):
             self.nbSegments -= 1
-            self.length -= seg.length
-        except ValueError:
-            # segment to remove is not in the list
-            pass
 
 
-    def getPointList(self) -> List[Point]:
-        """Get the list of all the points defining the border of the lot,
-        following the order of the border.
+    def getRings(self) -> Tuple[List[List[Point]], List[List[Point]]]:
+        """Get the rings of points bounding the lot: its outer rings,
+        counterclockwise, and the rings of its holes (e.g. a courtyard),
+        clockwise. Each ring is walked once through a map from each point to
+        the border segments ending at it, so that the rings are found in
+        O(B) for B segments in the border. Rings touching at a point (e.g.
+        a courtyard reaching the outer border at a corner) are walked as one
+        and split where the walk comes back to a point, so that each ring
+        is simple. A ring is a hole if it is inside an odd number of the
+        other rings of its floor.
 
         Parameters
         ----------
@@ -518,40 +712,85 @@ class Lot:
 
         Returns
         -------
-        A list of Point representing the border of the lot
+        outers, holes : List[List[Point]], List[List[Point]]
+            The outer rings and the rings of the holes, each a list of
+            points following the border, the first one not repeated at the
+            end
         """
 
-        # if empty
-        if len(self.segmentList) == 0: return []
-        # we use the marks to know if we have visited a segment
-        # init
+        # the border segments ending at each point
+        ends = {}
         for seg in self.segmentList:
-            seg.mark = False
-        # take the points of the first segment
-        prevSeg = self.segmentList[0]
-        prevSeg.mark = True
-        pointList = [prevSeg.p1, prevSeg.p2]
-        # while we do not have all the points
-        while len(pointList) != len(self.segmentList):
-            for nextSeg in self.segmentList:
-                # we try to find the segment which is linked to the previous one
-                # and when we find it, we mark it as read and search the next
-                # one in the list
-                if not nextSeg.mark and nextSeg.p1 == pointList[-1]:
-                    pointList.append(nextSeg.p2)
-                    nextSeg.mark = True
-                    prevSeg = nextSeg
-                    break
-                if not nextSeg.mark and nextSeg.p2 == pointList[-1]:
-                    pointList.append(nextSeg.p1)
-                    nextSeg.mark = True
-                    prevSeg = nextSeg
+            ends.setdefault(seg.p1, []).append(seg)
+            ends.setdefault(seg.p2, []).append(seg)
+
+        # walk each ring from its first segment not visited yet
+        visited = set()
+        rings = []
+        for first in self.segmentList:
+            if id(first) in visited:
+                continue
+            visited.add(id(first))
+            ring = [first.p1]
+            positions = {id(first.p1): 0}
+            point = first.p2
+            while point is not ring[0]:
+                i = positions.get(id(point))
+                if i is None:
+                    positions[id(point)] = len(ring)
+                    ring.append(point)
+                else:
+                    # back to a point of the ring: the points walked since
+                    # form a ring of their own
+                    rings.append(ring[i:])
+                    for p in ring[i+1:]:
+                        del positions[id(p)]
+                    del ring[i+1:]
+                for seg in ends[point]:
+                    if id(seg) not in visited:
+                        break
+                else:
+                    # open border, should not happen
                     break
-        # when we have all points in order, return it
-        return pointList
+                visited.add(id(seg))
+                point = seg.p2 if seg.p1 is point else seg.p1
+            rings.append(ring)
+
+        # sort the rings, by their nesting if there are several
+        outers = []
+        holes = []
+        for ring in rings:
+            inside = False
+            if len(rings) > 1:
+                # the middle of a segment is on no other ring
+                x = (ring[0].x + ring[1].x) * 0.5
+                y = (ring[0].y + ring[1].y) * 0.5
+                for other in rings:
+                    if (other is not ring and
+                            other[0].floorId == ring[0].floorId and
+                            in_ring(x, y, other)):
+                        inside = not inside
+            if (ring_area(ring) < 0) != inside:
+                ring.reverse()
+            (holes if inside else outers).append(ring)
+        return outers, holes
 
-                    
 
+    def getPointList(self) -> List[Point]:
+        """Get the list of all the points defining the outer border of the
+        lot, following the order of the border, counterclockwise. If the
+        lot has several outer rings (see getRings), the largest one.
 
+        Parameters
+        ----------
+        None
 
+        Returns
+        -------
+        A list of Point representing the border of the lot
+        """
 
+        outers, _ = self.getRings()
+        if len(outers) == 0:
+            return []
+        return max(outers, key=ring_area)
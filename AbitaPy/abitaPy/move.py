@@ -0,0 +1,204 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from typing import Tuple
+
+from .solution import Solution
+
+
+class Move:
+    """Class representing the move of an element to a neighbour lot through
+    a segment of its border (see Solution.swap). A move can be applied to
+    its solution in place and undone, and the fitness of the solution it
+    leads to is computed without changing the solution: the solution is
+    only copied when the move is kept.
+
+    Applying a move saves the state of the two lots it changes (lists of
+    elements and segments, measures, keys and shared indexes) and the hash
+    of the solution, so that undoing it restores them exactly.
+
+    Attributes
+    ----------
+    solution : Solution
+        The solution the move applies to
+    lotID : int
+        The index of the lot the element moves to
+    element : Element
+        The element to move, None if the move is not valid
+    source : int
+        The index of the lot the element moves from, -1 if the move is not
+        valid
+    _saved : Tuple[int, List[Tuple]]
+        The hash of the solution and the state of the two lots before the
+        move was applied, None if it is not applied
+
+    Methods
+    -------
+    __init__(sol: Solution, lotID: int, segID: int) -> None
+        Create the move of the neighbour of a lot through a segment
+    valid() -> bool
+        Check if the move can be applied
+    apply() -> None
+        Apply the move to the solution
+    undo() -> None
+        Undo the move applied to the solution
+    fitness(algo: Algo) -> float
+        Compute the fitness of the solution after the move
+    copy(algo: Algo) -> Solution
+        Copy the solution, apply the move to the copy and evaluate it
+    """
+
+    __slots__ = ('solution', 'lotID', 'element', 'source', '_saved')
+
+    def __init__(self, sol: Solution, lotID: int, segID: int) -> None:
+        """Constructor of the Move class: the element moved is the neighbour
+        of the lot through the segment, if it can be moved (see
+        Solution.canSwap).
+
+        Parameters
+        ----------
+        sol : Solution
+            The solution, with its lots built
+        lotID : int
+            The index of the lot the element moves to
+        segID : int
+            The index of the segment in the border of the lot
+        """
+
+        self.solution = sol
+        self.lotID = lotID
+        self.element = None
+        self.source = -1
+        self._saved = None
+        if sol.canSwap(lotID, segID):
+            lot = sol.lotList[lotID]
+            seg = lot.segmentList[segID]
+            self.element = seg.e2 if lot.contain(seg.e1) else seg.e1
+            self.source = sol.distribution[self.element.index]
+
+
+    def valid(self) -> bool:
+        """Check if the move can be applied.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A boolean, True if the element can be moved to the lot
+        """
+
+        return self.element is not None
+
+
+    def apply(self) -> None:
+        """Apply the move to the solution, in place.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        if self.element is None or self._saved is not None:
+            raise Exception("MoveError: move not valid or already applied")
+        source = self.solution.lotList[self.source]
+        target = self.solution.lotList[self.lotID]
+        self._saved = (self.solution.hashKey,
+                       [self._save(source), self._save(target)])
+        source.removeElement(self.element)
+        target.mergeElement(self.element)
+
+
+    def undo(self) -> None:
+        """Undo the move applied to the solution, restoring the lots as they
+        were before.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        if self._saved is None:
+            raise Exception("MoveError: move not applied")
+        hashKey, lots = self._saved
+        for (lot, elementList, segmentList, length, area, bonus, key, cuts,
+             exits, shared) in lots:
+            lot.elementList = elementList
+            lot.nbElements = len(elementList)
+            lot.segmentList = segmentList
+            lot.nbSegments = len(segmentList)
+            lot.length = length
+            lot.area = area
+            lot.bonus = bonus
+            lot.key = key
+            lot._cuts = cuts
+            lot._exits = exits
+            if exits is not None:
+                exits.shared = shared
+        self.solution.distribution[self.element.index] = self.source
+        self.solution.hashKey = hashKey
+        self._saved = None
+
+
+    def fitness(self, algo: 'Algo') -> float:
+        """Compute the fitness of the solution after the move, from the
+        measures of the two lots it changes (see Algo.moveFitness). The
+        solution must be evaluated.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm evaluating the solution
+
+        Returns
+        -------
+        fitness : float
+            The fitness of the solution after the move
+        """
+
+        return algo.moveFitness(self.solution, self.element, self.lotID)
+
+
+    def copy(self, algo: 'Algo') -> Solution:
+        """Copy the solution, apply the move to the copy, and evaluate it.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm evaluating the solution
+
+        Returns
+        -------
+        sol : Solution
+            The evaluated copy of the solution after the move
+        """
+
+        sol = Solution(self.solution)
+        sol.lotList[self.source].removeElement(self.element)
+        sol.lotList[self.lotID].mergeElement(self.element)
+        algo.evaluate(sol)
+        return sol
+
+
+    def _save(self, lot: 'Lot') -> Tuple:
+        """Save the state of a lot before the move. Its exit forest is marked
+        as shared, and its border replaced by a copy, so that the move
+        changes copies of them."""
+
+        shared = False
+        if lot._exits is not None:
+            shared = lot._exits.shared
+            lot._exits.shared = True
+        segmentList = lot.segmentList
+        lot.segmentList = segmentList.copy()
+        return (lot, lot.elementList[:], segmentList, lot.length,
+                lot.area, lot.bonus, lot.key, lot._cuts, lot._exits, shared)
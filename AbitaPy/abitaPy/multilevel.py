@@ -0,0 +1,305 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from typing import List, Tuple
+
+from .algo import Algo
+from .geom import Geom
+from .population import Population
+from .solution import Solution
+from .tx import Tx
+
+
+class MultilevelSolver:
+    """Class solving a problem on coarser geometries first. The geometry is
+    coarsened by merging adjacent elements into super-elements, whose area
+    stays under a fraction of the smallest area of the types, level after
+    level. The coarsest problem is solved by the algorithm, then its
+    solutions are projected on each finer level and improved there by local
+    changes only, up to the geometry of the problem.
+
+    The super-elements keep the area, the bonus and the border lengths of
+    their elements, so that a solution of a coarse level has the fitness of
+    its projection.
+
+    Attributes
+    ----------
+    algo : Algo
+        The algorithm, with the geometry, the population to fill, and the
+        parameters of the problem
+    fraction : float
+        The maximum area of a super-element, as a fraction of the smallest
+        area of the types
+    minElements : int
+        The number of elements under which a geometry is not coarsened
+    minReduction : float
+        The minimum fraction of elements removed by a coarsening, under
+        which the coarsening stops
+    levelList : List[Tuple[Geom, List[int]]]
+        The coarse geometries, from the finest, with the index of the
+        super-element of each element of the finer level
+    initIT : int
+        The number of random iterations of the coarsest level, -1 for a
+        default one
+    endIT : int
+        The maximum number of local iterations of each level, -1 for a
+        default one
+
+    Methods
+    -------
+    __init__(algo: Algo) -> None
+        Create a solver for the problem of an algorithm
+    run() -> None
+        Solve the problem and fill the population of the algorithm
+    coarsen(geom: Geom, areaMax: float) -> Tuple[Geom, List[int]]
+        Merge the elements of a geometry into super-elements
+    project(distribution: List[int], mapping: List[int]) -> List[int]
+        Project a distribution of a coarse level on the finer level
+    """
+
+    def __init__(self, algo: Algo) -> None:
+        """Constructor of the MultilevelSolver class.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm, whose geometry is built
+        """
+
+        self.algo = algo
+        self.fraction = 0.5
+        self.minElements = 100
+        self.minReduction = 0.1
+        self.levelList = []
+        self.initIT = algo.initIT
+        self.endIT = algo.endIT
+
+
+    def run(self) -> None:
+        """Solve the problem and fill the population of the algorithm. A
+        geometry which cannot be coarsened is solved as a whole.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        algo = self.algo
+        algo.setDefaultTypes()
+        areaMin = min([t.areaMin for t in algo.typeList
+                       if t.nbMax > 0 and t.areaMin > 0] or [0])
+
+        # coarsen while it removes enough elements
+        self.levelList = []
+        geom = algo.geom
+        while geom.nbElements >= self.minElements:
+            coarse, mapping = self.coarsen(geom, self.fraction * areaMin)
+            if coarse.nbElements > (1 - self.minReduction) * geom.nbElements:
+                break
+            self.levelList.append((coarse, mapping))
+            geom = coarse
+        if len(self.levelList) == 0:
+            while algo.run():
+                pass
+            return
+
+        # solve the coarsest level, then refine each finer level
+        distributions = []
+        initIT = self.initIT
+        for level in range(len(self.levelList) - 1, -1, -1):
+            geom, mapping = self.levelList[level]
+            popu = self._solve(geom, distributions, initIT)
+            initIT = 0
+            distributions = [self.project(sol.distribution, mapping)
+                             for sol in popu.solutionList]
+
+        # refine the geometry of the problem, in the population of algo
+        for distribution in distributions[:algo.nbSols]:
+            sol = Solution(algo.geom)
+            sol.distribution = distribution
+            sol.sortLots()
+            if not algo.popu.contains(sol):
+                algo.popu.addSolution(sol)
+        algo.initIT = 0
+        algo.endIT = self.endIT
+        while algo.run():
+            pass
+
+
+    def coarsen(self, geom: Geom, areaMax: float) -> Tuple[Geom, List[int]]:
+        """Merge the elements of a built geometry into super-elements: each
+        element, from the smallest, is matched with the free neighbour with
+        which it shares the longest border, if they have the same status
+        (private, common, imposed or exit) and their area is under areaMax.
+
+        Parameters
+        ----------
+        geom : Geom
+            The built geometry
+        areaMax : float
+            The maximum area of a super-element
+
+        Returns
+        -------
+        coarse : Geom
+            The built geometry of the super-elements
+        mapping : List[int]
+            The index of the super-element of each element of geom
+        """
+
+        elementList = geom.elementList
+        adjOffsets = geom.adjOffsets
+        adjIndices = geom.adjIndices
+        adjLengths = geom.adjLengths
+
+        def status(elt):
+            return (elt.common, elt.imposed, elt.exit)
+
+        # heavy edge matching
+        mapping = [-1] * geom.nbElements
+        groups = []
+        for i in sorted(range(geom.nbElements), key=lambda i: elementList[i].area):
+            if mapping[i] > -1:
+                continue
+            elt = elementList[i]
+            best = -1
+            bestLength = 0.0
+            for k in range(adjOffsets[i], adjOffsets[i+1]):
+                j = adjIndices[k]
+                other = elementList[j]
+                if (mapping[j] < 0 and adjLengths[k] > bestLength and
+                        status(other) == status(elt) and
+                        elt.area + other.area <= areaMax):
+                    best = j
+                    bestLength = adjLengths[k]
+            mapping[i] = len(groups)
+            if best > -1:
+                mapping[best] = len(groups)
+                groups.append([i, best])
+            else:
+                groups.append([i])
+
+        # segments between different super-elements
+        segIds = {}
+        segments = []
+        groupSegs = [[] for _ in groups]
+        pointIds = dict((id(pt), n) for n, pt in enumerate(geom.pointList))
+        for elt in elementList:
+            for seg in elt.segmentList:
+                if id(seg) in segIds:
+                    continue
+                g1 = mapping[seg.e1.index] if seg.e1 is not None else -1
+                g2 = mapping[seg.e2.index] if seg.e2 is not None else -1
+                if g1 == g2:
+                    segIds[id(seg)] = -1
+                    continue
+                segIds[id(seg)] = len(segments)
+                for g in (g1, g2):
+                    if g > -1:
+                        groupSegs[g].append(len(segments))
+                segments.append((pointIds[id(seg.p1)], pointIds[id(seg.p2)],
+                                 g1, g2))
+
+        # super-elements and their adjacency
+        elements = []
+        offsets = [0]
+        neighbours = []
+        lengths = []
+        extLengths = []
+        for g, indices in enumerate(groups):
+            elts = [elementList[i] for i in indices]
+            area = sum(e.area for e in elts)
+            first = elts[0]
+            shared = {}
+            for i in indices:
+                for k in range(adjOffsets[i], adjOffsets[i+1]):
+                    n = mapping[adjIndices[k]]
+                    if n != g:
+                        shared[n] = shared.get(n, 0.0) + adjLengths[k]
+            ext = sum(geom.extLengths[i] for i in indices)
+            neighbours.extend(shared.keys())
+            lengths.extend(shared.values())
+            offsets.append(len(neighbours))
+            extLengths.append(ext)
+            if area > 0:
+                bonus = sum(e.bonus * e.area for e in elts) / area
+                centroid = (sum(e.centroid[0] * e.area for e in elts) / area,
+                            sum(e.centroid[1] * e.area for e in elts) / area)
+            else:
+                bonus = first.bonus
+                centroid = first.centroid
+            bbox = (min(e.bbox[0] for e in elts), min(e.bbox[1] for e in elts),
+                    max(e.bbox[2] for e in elts), max(e.bbox[3] for e in elts))
+            elements.append((g + 1, first.floorId, bonus, first.exit,
+                             first.common, first.imposed, area,
+                             ext + sum(shared.values()), centroid, bbox, [],
+                             groupSegs[g]))
+
+        floors = []
+        for floor in geom.floorList:
+            ids = []
+            for elt in floor.elementList:
+                g = mapping[elt.index]
+                if groups[g][0] == elt.index:
+                    ids.append(g)
+            floors.append((floor.no, ids))
+
+        coarse = Geom()
+        coarse.unpack({
+            'floors': floors,
+            'points': [(pt.no, pt.x, pt.y, pt.floorId) for pt in geom.pointList],
+            'elements': elements,
+            'segments': segments,
+            'nbWelded': 0,
+            'adjacency': (offsets, neighbours, lengths, extLengths),
+        })
+        return coarse, mapping
+
+
+    def project(self, distribution: List[int], mapping: List[int]) -> List[int]:
+        """Project a distribution of a coarse level on the finer level: each
+        element is in the lot of its super-element.
+
+        Parameters
+        ----------
+        distribution : List[int]
+            The distribution of the coarse level
+        mapping : List[int]
+            The index of the super-element of each element of the finer level
+
+        Returns
+        -------
+        distribution : List[int]
+            The distribution of the finer level
+        """
+
+        return [distribution[g] for g in mapping]
+
+
+    def _solve(self, geom: Geom, distributions: List[List[int]],
+               initIT: int) -> Population:
+        """Solve the problem on a coarse geometry, from the distributions of
+        the coarser level, with initIT random iterations before the local
+        changes."""
+
+        popu = Population()
+        algo = Algo(geom, popu)
+        algo.nbSols = self.algo.nbSols
+        algo.alpha = self.algo.alpha
+        algo.initIT = initIT
+        algo.endIT = self.endIT
+        for t in self.algo.typeList:
+            algo.addType(Tx(t.benefit, t.areaMin, t.areaMax, t.nbMin, t.nbMax, t.no))
+        for distribution in distributions[:algo.nbSols]:
+            sol = Solution(geom)
+            sol.distribution = distribution
+            sol.sortLots()
+            if not popu.contains(sol):
+                popu.addSolution(sol)
+        while algo.run():
+            pass
+        return popu
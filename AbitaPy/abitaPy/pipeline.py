@@ -0,0 +1,209 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from typing import List, Tuple
+
+from .algo import Algo
+from .components import ComponentSolver
+
+
+class FloorPipeline(ComponentSolver):
+    """Class solving a problem floor by floor. The minimum and maximum
+    numbers of lots of each type, which are counted on the whole building,
+    are split into quotas for each floor, in proportion to the area of the
+    floors. Each floor is solved under its quotas, then the quotas of the
+    floors which could not meet them are reallocated to the other floors,
+    and the floors whose quotas changed are solved again, until the
+    combined solutions meet the numbers of the whole building.
+
+    Attributes
+    ----------
+    maxRounds : int
+        The maximum number of rounds of solving and reallocation
+    nbRounds : int
+        The number of rounds done by the last run
+    quotaList : List[List[List[int]]]
+        For each floor, the minimum and maximum numbers of lots of each type
+
+    Methods
+    -------
+    __init__(algo: Algo, nbJobs: int) -> None
+        Create a pipeline for the problem of an algorithm
+    run() -> None
+        Solve the problem and fill the population of the algorithm
+    floorParts() -> List[List[int]]
+        Get the indexes of the elements of each floor
+    """
+
+    def __init__(self, algo: Algo, nbJobs: int = 0) -> None:
+        """Constructor of the FloorPipeline class.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm, whose geometry is built
+        nbJobs : int, optional
+            The number of processes, default to 0 (one per processor)
+        """
+
+        ComponentSolver.__init__(self, algo, nbJobs)
+        self.maxRounds = 5
+        self.nbRounds = 0
+        self.quotaList = []
+
+
+    def run(self) -> None:
+        """Solve the problem and fill the population of the algorithm. A
+        geometry with only one floor is solved as a whole.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        algo = self.algo
+        parts = self.floorParts()
+        if len(parts) < 2:
+            while algo.run():
+                pass
+            self.nbRounds = 1
+            return
+
+        # initial quotas, in proportion to the area of the floors
+        algo.setDefaultTypes()
+        elementList = algo.geom.elementList
+        weights = [sum(elementList[i].area for i in part) for part in parts]
+        self.quotaList = [[] for _ in parts]
+        for type in algo.typeList:
+            for quota, nbMin, nbMax in zip(
+                    self.quotaList, self._split(type.nbMin, weights),
+                    self._split(type.nbMax, weights)):
+                quota.append([nbMin, max(nbMin, nbMax)])
+
+        # solve the floors whose quotas changed, until the numbers of lots
+        # of the whole building are met
+        solutions = [None] * len(parts)
+        changed = list(range(len(parts)))
+        self.nbRounds = 0
+        while len(changed) > 0 and self.nbRounds < self.maxRounds:
+            self.nbRounds += 1
+            results = self.solve([parts[i] for i in changed],
+                                 [self.quotaList[i] for i in changed])
+            for i, sols in zip(changed, results):
+                solutions[i] = sols
+            self.combine(parts, solutions)
+            if algo.popu.nbSolutions > 0 and algo.popu.solutionList[0].fitness > 0:
+                break
+            changed = self._reallocate(solutions, weights)
+
+
+    def floorParts(self) -> List[List[int]]:
+        """Get the indexes of the elements of each floor, without the empty
+        floors. The elements of an undefined floor are gathered in a last
+        part.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        parts : List[List[int]]
+            The indexes of the elements of each floor, in increasing order
+        """
+
+        geom = self.algo.geom
+        parts = [[] for _ in range(geom.nbFloors)]
+        others = []
+        for elt in geom.elementList:
+            if 0 <= elt.floorId < geom.nbFloors:
+                parts[elt.floorId].append(elt.index)
+            else:
+                others.append(elt.index)
+        parts.append(others)
+        return [part for part in parts if len(part) > 0]
+
+
+    def _reallocate(self, solutions: List[List[Tuple[float, List[int], List[int]]]],
+                    weights: List[float]) -> List[int]:
+        """Reallocate the quotas of the floors from the solutions of the last
+        round: the quotas of the floors without valid solution are widened
+        to the numbers of lots of their best solution, and the difference is
+        moved to the other floors, so that the minimums of all floors still
+        add up to at least the minimum of the whole building, and their
+        maximums to at most its maximum. The maximums are lowered on the
+        other floors first, then on the floors without valid solution.
+
+        Parameters
+        ----------
+        solutions : List[List[Tuple[float, List[int], List[int]]]]
+            For each floor, the fitness, the distribution and the number of
+            lots of each type of its solutions, by decreasing fitness
+        weights : List[float]
+            The area of each floor
+
+        Returns
+        -------
+        changed : List[int]
+            The floors whose quotas changed
+        """
+
+        before = [[list(quota) for quota in quotas]
+                  for quotas in self.quotaList]
+        failed = [sols[0][0] <= 0 for sols in solutions]
+        targets = [i for i in range(len(solutions)) if not failed[i]]
+        if len(targets) == 0:
+            targets = list(range(len(solutions)))
+
+        for j, type in enumerate(self.algo.typeList):
+            # accept the numbers of lots of the floors which failed
+            for i, sols in enumerate(solutions):
+                if failed[i]:
+                    nb = sols[0][2][j]
+                    quota = self.quotaList[i][j]
+                    quota[0] = min(quota[0], nb)
+                    quota[1] = max(quota[1], nb)
+
+            # move the missing minimum to the other floors
+            deficit = type.nbMin - sum(q[j][0] for q in self.quotaList)
+            if deficit > 0:
+                for i, nb in zip(targets, self._split(
+                        deficit, [weights[i] for i in targets])):
+                    quota = self.quotaList[i][j]
+                    quota[0] += nb
+                    quota[1] = max(quota[1], quota[0])
+
+            # remove the exceeding maximum from the other floors, then from
+            # the floors which failed if it is not enough
+            excess = sum(q[j][1] for q in self.quotaList) - type.nbMax
+            others = [i for i in range(len(solutions)) if i not in targets]
+            for i in (sorted(targets, key=lambda i: -weights[i]) +
+                      sorted(others, key=lambda i: -weights[i])):
+                quota = self.quotaList[i][j]
+                nb = min(excess, quota[1] - quota[0])
+                if nb > 0:
+                    quota[1] -= nb
+                    excess -= nb
+
+        return [i for i in range(len(solutions))
+                if self.quotaList[i] != before[i]]
+
+
+    def _split(self, total: int, weights: List[float]) -> List[int]:
+        """Split an integer in proportion to weights, by the largest
+        remainder method."""
+
+        sumWeights = sum(weights)
+        if sumWeights <= 0:
+            weights = [1] * len(weights)
+            sumWeights = len(weights)
+        exact = [total * w / sumWeights for w in weights]
+        shares = [int(x) for x in exact]
+        order = sorted(range(len(weights)), key=lambda i: shares[i] - exact[i])
+        for i in order[:total - sum(shares)]:
+            shares[i] += 1
+        return shares
@@ -26,6 +26,8 @@ class Point:
         Compare X, Y coordinates and the floor proeprties with another point
     """
 
+    __slots__ = ('x', 'y', 'floorId', 'no')
+
     def __init__(self, x:float, y:float, floor:int, no:int) -> None:
         """Constructor for a new point
         
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from statistics import mean
+from typing import Dict, List
 from .solution import Solution
 
 class Population:
@@ -25,6 +26,9 @@ class Population:
         The list of all solutions calculated
     _sizeMax : int
         The maxmimum size of the list of solutions
+    _hashes : Dict[int, List[Solution]]
+        The solutions of the list indexed by their hash, so that a solution
+        is only compared with the solutions of the same hash
     
     Methods
     -------
@@ -36,6 +40,12 @@ class Population:
         Remove a solution in the list at a given index
     insertSolution(sol : Solution) -> boolean
         Insert a solution in the list according to its fitness
+    accepts(fitness : float) -> boolean
+        Check if a solution of a given fitness could be inserted
+    contains(sol : Solution) -> boolean
+        Check if a solution is in the list
+    reindex() -> None
+        Index again the solutions changed while in the list
     resize(sizeMax : int) -> None
         Change the value of _sizeMax
     sortSolutions() -> None
@@ -63,10 +73,13 @@ class Population:
         self.nbSolutions = 0
         self.solutionList = []
         self._sizeMax = 2147483647  # we suppose it's for capacity memory
+        self._hashes = {}
     
 
     def addSolution(self, sol:Solution) -> None:
-        """Add another solution in the list of all solutions.
+        """Add another solution in the list of all solutions. Its lots are
+        numbered in order of appearance first (see Solution.sortLots), so
+        that it compares equal to the same partition of the elements.
         
         Parameters
         ----------
@@ -81,13 +94,14 @@ class Population:
         # check if the solutions is a solution 
         if sol is None:
             raise Exception("Population.addSolution(sol) : sol is none")
+        sol.sortLots()
         # check if solution is not already added
-        for s in self.solutionList:
-            if (s == sol):
-                raise Exception("Population.addSolution(sol) : sol already added")
+        if self.contains(sol):
+            raise Exception("Population.addSolution(sol) : sol already added")
         # add the solution
         self.solutionList.append(sol)
         self.nbSolutions += 1
+        self._hashes.setdefault(hash(sol), []).append(sol)
 
 
     def removeSolution(self, index:int) -> None:
@@ -107,13 +121,16 @@ class Population:
         if index < 0 or index > self.nbSolutions-1:
             return
         # remove the solution
-        self.solutionList.pop(index)
+        sol = self.solutionList.pop(index)
         self.nbSolutions -= 1
+        self._unindex(sol)
         
 
     def insertSolution(self, sol: Solution) -> bool:
         """Insert a solution at its place, ordered
         by fitnesses. Returns true if added, else false.
+        The lots of the solution are numbered in order
+        of appearance (see Solution.sortLots).
         
         Parameters
         ----------
@@ -131,9 +148,9 @@ class Population:
             self.addSolution(sol)
             return True
         # check if solution is already in the list
-        for s in self.solutionList:
-            if s == sol:
-                return False
+        sol.sortLots()
+        if self.contains(sol):
+            return False
         self.nbTest += 1
         # get the position where we want to place sol
         i = 0
@@ -155,6 +172,89 @@ class Population:
             return True
 
 
+    def contains(self, sol: Solution) -> bool:
+        """Check if a solution is in the list, comparing it only with the
+        solutions of the same hash. Its lots must be numbered in order of
+        appearance (see Solution.sortLots).
+        
+        Parameters
+        ----------
+        sol : Solution
+            The solution to look for
+        
+        Returns
+        -------
+        A boolean, True if an equal solution is in the list
+        """
+
+        for s in self._hashes.get(hash(sol), ()):
+            if s == sol:
+                return True
+        return False
+
+
+    def reindex(self) -> None:
+        """Index again the solutions of the list by their hash, and number
+        their lots in order of appearance, after their distributions were
+        changed while in the list.
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        None
+        """
+
+        self._hashes = {}
+        for sol in self.solutionList:
+            sol.sortLots()
+            self._hashes.setdefault(hash(sol), []).append(sol)
+
+
+    def accepts(self, fitness: float) -> bool:
+        """Check if a solution of a given fitness could be inserted in the
+        list (see insertSolution), unless it is already in it, so that a
+        solution is only built when it can be kept. The fitness is compared
+        up to rounding errors.
+        
+        Parameters
+        ----------
+        fitness : float
+            The fitness of the solution
+        
+        Returns
+        -------
+        A boolean, False if the list is full of solutions with a better or
+        equal fitness
+        """
+
+        if self.nbSolutions < self._sizeMax:
+            return True
+        if self._sizeMax == 0:
+            return False
+        last = self.solutionList[self.nbSolutions-1].fitness
+        return fitness > last - 1e-9 * (1 + abs(last))
+
+
+    def _unindex(self, sol: Solution) -> None:
+        """Remove a solution from the index of the hashes, searching all
+        of it if the solution was changed since it was indexed."""
+
+        h = hash(sol)
+        keys = [h] if h in self._hashes else []
+        keys += [k for k in self._hashes if k != h]
+        for k in keys:
+            solutions = self._hashes[k]
+            for i, s in enumerate(solutions):
+                if s is sol:
+                    solutions.pop(i)
+                    if len(solutions) == 0:
+                        del self._hashes[k]
+                    return
+
+
     def resize(self, sizeMax: int) -> None:
         """Change the value of the sizeMax attribute.
         
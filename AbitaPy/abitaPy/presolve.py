@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import heapq
+from math import ceil
+from typing import List
+
+
+class Presolve:
+    """Class analysing a problem once, before any solution is built, to
+    shrink the search space of the algorithm.
+
+    A private lot is connected and stays in contact with the common lot, so
+    an element can only be in a private lot if a connected set of elements
+    joins it to a common element without exceeding the largest area of the
+    types. The smallest area of such a set is bounded by the shortest path
+    to the element, weighted by the area of the elements, from the elements
+    touching a common element. The common elements which cannot be in a
+    private lot are fixed in the common lot, and are then never moved by
+    the algorithm.
+
+    The numbers of lots are also bounded by the area to share between the
+    private lots: all the private elements must be in a lot whose area is
+    in the range of a type.
+
+    Attributes
+    ----------
+    algo : Algo
+        The algorithm, whose geometry is built and types are set
+    distances : List[float]
+        For each element, the smallest area of a connected set of elements
+        joining it to a common element, infinite if there is none or if the
+        element is imposed
+    fixedList : List[Element]
+        The common elements fixed in the common lot
+    deadList : List[Element]
+        The private elements which cannot be in any lot of a valid solution:
+        if there is one, no solution can have a positive fitness
+    minLots : int
+        The minimum number of private lots of a valid solution
+    maxLots : int
+        The maximum number of private lots of a valid solution
+
+    Methods
+    -------
+    __init__(algo: Algo) -> None
+        Create the presolve of the problem of an algorithm
+    run() -> None
+        Analyse the problem and fix the elements
+    feasible() -> bool
+        Check if a solution can have a positive fitness
+    """
+
+    def __init__(self, algo: 'Algo') -> None:
+        """Constructor of the Presolve class.
+
+        Parameters
+        ----------
+        algo : Algo
+            The algorithm, whose geometry is built and types are set
+        """
+
+        self.algo = algo
+        self.distances = []
+        self.fixedList = []
+        self.deadList = []
+        self.minLots = 0
+        self.maxLots = 0
+
+
+    def run(self) -> None:
+        """Analyse the problem: compute the distances of the elements, fix
+        the common elements which cannot be in a private lot, and bound the
+        number of private lots.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+
+        geom = self.algo.geom
+        types = [t for t in self.algo.typeList if t.nbMax > 0]
+        areaMax = max([t.areaMax for t in types] or [0])
+        areaMin = min([t.areaMin for t in types] or [0])
+
+        self.distances = self._distances()
+        self.fixedList = []
+        self.deadList = []
+        freeArea = 0.0
+        privateArea = 0.0
+        for elt in geom.elementList:
+            elt.fixed = False
+            if self.distances[elt.index] <= areaMax:
+                freeArea += elt.area
+                if not elt.common:
+                    privateArea += elt.area
+            elif elt.common:
+                elt.fixed = not elt.imposed
+                if elt.fixed:
+                    self.fixedList.append(elt)
+            else:
+                self.deadList.append(elt)
+                privateArea += elt.area
+
+        # each private lot has an area in the range of a type: at most
+        # areaMax, and more than areaMin
+        self.minLots = int(ceil(privateArea / areaMax)) if areaMax > 0 else 0
+        if areaMin > 0:
+            self.maxLots = max(0, int(ceil(freeArea / areaMin)) - 1)
+        else:
+            self.maxLots = geom.nbElements
+
+
+    def feasible(self) -> bool:
+        """Check if a solution can have a positive fitness.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        A boolean, False if an element cannot be in any lot or if the bounds
+        of the number of lots are incompatible
+        """
+
+        return len(self.deadList) == 0 and self.minLots <= self.maxLots
+
+
+    def _distances(self) -> List[float]:
+        """Compute for each element the smallest area of a connected set of
+        elements joining it to a common element, by the Dijkstra algorithm
+        from the elements touching a common element, the imposed elements
+        being left out."""
+
+        geom = self.algo.geom
+        elementList = geom.elementList
+        adjOffsets = geom.adjOffsets
+        adjIndices = geom.adjIndices
+        distances = [float('inf')] * geom.nbElements
+        heap = []
+        for elt in elementList:
+            if elt.imposed:
+                continue
+            for k in range(adjOffsets[elt.index], adjOffsets[elt.index+1]):
+                if elementList[adjIndices[k]].common:
+                    distances[elt.index] = elt.area
+                    heap.append((elt.area, elt.index))
+                    break
+        heapq.heapify(heap)
+        while len(heap) > 0:
+            d, i = heapq.heappop(heap)
+            if d > distances[i]:
+                continue
+            for k in range(adjOffsets[i], adjOffsets[i+1]):
+                j = adjIndices[k]
+                if not elementList[j].imposed:
+                    dj = d + elementList[j].area
+                    if dj < distances[j]:
+                        distances[j] = dj
+                        heapq.heappush(heap, (dj, j))
+        return distances
@@ -39,6 +39,8 @@ class Segment:
         Returns the other element linked to the segment
     """
 
+    __slots__ = ('p1', 'p2', 'floorId', 'mark', 'length', 'e1', 'e2')
+
 
     def __init__(self, p1:Point, p2:Point) -> None:
         """Constructor of a segment
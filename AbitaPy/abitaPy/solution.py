@@ -4,6 +4,8 @@
 from typing import Any
 from random import random
 
+from .utils import HASH_MASK, lot_hash
+
 class Solution:
     """Class representing a solution, ie a configuration
     of the elements regrouped in lots.
@@ -18,6 +20,8 @@ class Solution:
         The list of lots which defines this solution
     elementList : List[Element]
         The list of elements we use
+    geom : Geom
+        The geometry of the elements, which gives their adjacency arrays
     distribution : List[int]
         A list registering the lot where each element is.
         For example: distribution[elt.index] = index of the lot in listLot,
@@ -27,6 +31,12 @@ class Solution:
         The length of the lot list
     nbElements : int
         The length of the element list
+    typeCounts : List[int]
+        The number of lots of each type of the list of types of the
+        algorithm, set when the solution is evaluated
+    hashKey : int
+        The hash of the distribution when the lots are built, updated by the
+        lots as their elements change (see __hash__)
     
     Methods
     -------
@@ -34,18 +44,26 @@ class Solution:
         Constructor of the class
     setLots() -> None
         Create the lot list from the chosen distribution
+    canSwap(lotID:int, segID:int) -> boolean
+        Check if swap would move an element, without moving it
     swap(lotID:int, segID:int) -> boolean
         *We don't know what it does*
     sortLots() -> None
-        Sort the list of lots following the distribution
+        Number the lots in order of appearance in the distribution
     rndSet(nbSeeds:int) -> None
         *We don't know what it does*
     __eq__(other:Solution) -> boolean
         Implements the == operator
     __ne__(other:Solution) -> boolean
         Implements the != operator
+    __hash__() -> int
+        Get the hash of the distribution, the same for equal solutions
     """
 
+    __slots__ = ('mark', 'fitness', 'nbLots', 'lotList', 'nbElements',
+                 'elementList', 'geom', 'distribution', 'typeCounts',
+                 'hashKey')
+
 
     def __init__(self, solOrGeom:Any=None) -> None:
         """Constructor of the Solution class. You can create a Solution object
@@ -69,7 +87,10 @@ class Solution:
         self.lotList = []
         self.nbElements = 0
         self.elementList = []
+        self.geom = None
         self.distribution = []
+        self.typeCounts = []
+        self.hashKey = 0
         # constructor if called with a geometry
         from .geom import Geom
         if isinstance(solOrGeom, Geom):
@@ -78,14 +99,20 @@ class Solution:
                 raise Exception("Already initialized")
             self.nbElements = geom.nbElements
             self.elementList = geom.elementList
+            self.geom = geom
             self.distribution = [-1] * self.nbElements
         # constructor if called with a solution
         elif isinstance(solOrGeom, Solution):
             sol = solOrGeom
             self.nbElements = sol.nbElements
             self.elementList = sol.elementList
+            self.geom = sol.geom
             self.distribution = [i for i in sol.distribution]
             self.setLots()
+            # the lots are identical to those of sol until they change
+            for lot, other in zip(self.lotList, sol.lotList):
+                if lot.nbElements == other.nbElements:
+                    lot.shareIndexes(other)
         # error if solOrGeom not correct type
         elif solOrGeom is not None:
             raise Exception("solOrGeom is neither a solution or a geometry")
@@ -102,6 +129,7 @@ class Solution:
         if self.nbElements == 0: return
         # Clean the current lot list
         self.lotList = []
+        self.hashKey = 0
         # Count the lots
         self.nbLots = max(self.distribution) + 1
         if self.nbLots == 0: return
@@ -109,19 +137,38 @@ class Solution:
         from .lot import Lot
         for i in range(self.nbLots):
             self.lotList.append(Lot(self, i))
-        # build each lot from the distribution :
-        # set element list
-        for j in range(self.nbElements):
-            lotID = self.distribution[j]
+        # build each lot from the distribution: its elements, its measures
+        # summed by the geometry (see Geom.lotMeasures), its border, and the
+        # hash
+        elementLists = [[] for _ in range(self.nbLots)]
+        for elt, lotID in zip(self.elementList, self.distribution):
             if lotID > -1:
-                self.lotList[lotID].addElement(self.elementList[j])
-        # build borders
+                elementLists[lotID].append(elt)
+        areas, bonuses, lengths = self.geom.lotMeasures(self.distribution,
+                                                        self.nbLots)
         for lot in self.lotList:
-            lot.buildBorder()
+            i = lot.index
+            lot.fill(elementLists[i], areas[i], bonuses[i], lengths[i])
+            self.hashKey = (self.hashKey + lot_hash(lot.key, lot.index)) & HASH_MASK
         
 
-    def swap(self, lotID:int, segID:int) -> bool:
-        """I think it does something, but I don't know what..."""
+    def canSwap(self, lotID:int, segID:int) -> bool:
+        """Check if the neighbour element of a lot through one of its
+        segments can be moved to the lot (see swap), without changing the
+        solution, so that the moves which would fail are pruned before
+        copying the solution.
+
+        Parameters
+        ----------
+        lotID : int
+            The index of the lot
+        segID : int
+            The index of the segment in the border of the lot
+
+        Returns
+        -------
+        A boolean, True if swap would move the element
+        """
 
         if self.nbLots < 2:
             return False
@@ -136,9 +183,9 @@ class Solution:
             return False
         seg = lot.segmentList[segID]
 
-        # check if neighbour element exists and not imposed
+        # check if neighbour element exists and is not imposed nor fixed
         elt = seg.e2 if lot.contain(seg.e1) else seg.e1
-        if elt is None or elt.imposed:
+        if elt is None or elt.imposed or elt.fixed:
             return False
         
         # check neighbour lot
@@ -152,20 +199,30 @@ class Solution:
         if nlot > 0 and not self.lotList[nlot].stillConnex(elt):
             return False
         
-        # check if neighbour lot remains connected
+        # check if neighbour lots remain connected
         if lotID > 0:
-            j = 0
-            while j < elt.nbSegments:
-                seg = elt.segmentList[j]
-                next = seg.nextOf(elt)
-                i = -1 if next is None else self.distribution[next.index]
-                if i > -1 and i != lotID:
+            adjIndices = self.geom.adjIndices
+            checked = set()
+            for k in range(self.geom.adjOffsets[elt.index],
+                           self.geom.adjOffsets[elt.index+1]):
+                i = self.distribution[adjIndices[k]]
+                if i > -1 and i != lotID and i not in checked:
                     if not self.lotList[i].stillConnected(elt):
-                        break
-                j += 1
-            if j < elt.nbSegments:
-                return False
-        
+                        return False
+                    checked.add(i)
+        return True
+
+
+    def swap(self, lotID:int, segID:int) -> bool:
+        """I think it does something, but I don't know what..."""
+
+        if not self.canSwap(lotID, segID):
+            return False
+        lot = self.lotList[lotID]
+        seg = lot.segmentList[segID]
+        elt = seg.e2 if lot.contain(seg.e1) else seg.e1
+        nlot = self.distribution[elt.index]
+
         # remove elt from neighbour
         self.lotList[nlot].removeElement(elt)
 
@@ -175,40 +232,51 @@ class Solution:
 
 
     def sortLots(self) -> None:
-        """Sort the list of Lots following distribution order and
-        rebuild the distribution according the new order.
+        """Number the lots in order of first appearance in the distribution,
+        the common lot keeping the number 0, so that the same partition of
+        the elements always has the same distribution. The lots are
+        renumbered in one pass over the distribution; a solution whose lots
+        are not built only has its distribution renumbered.
+
+        The hash of the solution does not depend on the numbering of the
+        private lots (see __hash__), so that it is not changed.
         
         No parameters, no returns
         """
 
-        if self.nbLots < 2: return
-
-        # save list
-        oldList = self.lotList
-
-        # create new list
-        self.lotList = [None] * self.nbLots
-        self.lotList[0] = oldList[0]
-
-        # sort lotList following distribution order
-        # Note from the traductor (C++=>Python): I don't understand what it does
-        # exactly, so I keep the C++ way so it should work
-        i=0; j=1
-        while i < self.nbElements and j < self.nbLots:
-            k = 0
-            while k < j and oldList[self.distribution[i]] != self.lotList[k]:
-                k += 1
-            if k == j:
-                self.lotList[j] = oldList[self.distribution[i]]
-                j += 1
-            i += 1
+        distribution = self.distribution
+        nbLots = self.nbLots
+        if nbLots == 0:
+            nbLots = max(distribution or [-1]) + 1
+        if nbLots < 2: return
+
+        # new number of each lot, in order of first appearance
+        relabel = [-1] * nbLots
+        relabel[0] = 0
+        n = 1
+        changed = False
+        for lot in distribution:
+            if lot > 0 and relabel[lot] < 0:
+                relabel[lot] = n
+                changed = changed or lot != n
+                n += 1
+        if not changed:
+            return
         
         # rebuild the distribution
-        for i in range(self.nbLots):
-            self.lotList[i].index = i
-            for elt in self.lotList[i].elementList:
-                self.distribution[elt.index] = i
-            
+        distribution[:] = [lot if lot < 0 else relabel[lot]
+                           for lot in distribution]
+
+        # reorder the lots, those without element (if any) last
+        if self.nbLots > 0:
+            oldList = self.lotList
+            self.lotList = [None] * self.nbLots
+            for i, lot in enumerate(oldList):
+                if relabel[i] < 0:
+                    relabel[i] = n
+                    n += 1
+                lot.index = relabel[i]
+                self.lotList[lot.index] = lot
 
 
     def rndSet(self, nbSeeds:int) -> None:
@@ -225,6 +293,8 @@ class Solution:
                 nelt += 1
         
         # seed the domain: not optimal yet
+        adjOffsets = self.geom.adjOffsets
+        adjIndices = self.geom.adjIndices
         nb = 0
         j = None
         while nb < nbSeeds:
@@ -238,15 +308,11 @@ class Solution:
                 while j < self.nbElements:
                     # if it is not already in a lot : j == -1
                     if self.distribution[j] < 0:
-                        elt = self.elementList[j]
                         # for each neighbour element
-                        for l in range(elt.nbSegments):
-                            seg = elt.segmentList[l]
-                            next = seg.nextOf(elt)
-                            if next is not None:
-                                if self.distribution[next.index] == 0:
-                                    k += 1
-                                    break
+                        for l in range(adjOffsets[j], adjOffsets[j+1]):
+                            if self.distribution[adjIndices[l]] == 0:
+                                k += 1
+                                break
                     if k == i:
                         break
                     j += 1
@@ -284,7 +350,9 @@ class Solution:
     def __eq__(self, other) -> bool:
         """Define == operator for solutions. Two solutions are equal if they
         have the same list element (in adresses) and the same distribution 
-        (in values).
+        (in values), or if the distribution of one is the image of the
+        other by a symmetry of the geometry (see Geom.canonical): such
+        twins have the same fitness, which is checked first.
         
         Paramaters
         ----------
@@ -302,10 +370,14 @@ class Solution:
                 self.nbElements != other.nbElements or
                 self.elementList != other.elementList):
                 return False
-            for i in range(self.nbElements):
-                if self.distribution[i] != other.distribution[i]:
-                    return False
-            return True
+            if self.distribution == other.distribution:
+                return True
+            if (self.geom is None or len(self.geom.symmetries) == 0 or
+                    abs(self.fitness - other.fitness) >
+                    1e-9 * (1 + abs(self.fitness))):
+                return False
+            return (self.geom.canonical(self.distribution) ==
+                    self.geom.canonical(other.distribution))
         else:
             return NotImplemented
 
@@ -316,3 +388,44 @@ class Solution:
         See documentation of == operator for more infos.
         """
         return not(self.__eq__(other))
+
+
+    def __hash__(self) -> int:
+        """Get the hash of the distribution: the sum of the hashes of the
+        lots, each computed from the keys of its elements (see
+        Geom.hashKeys and Lot.key). It does not depend on the numbering of
+        the private lots, and equivalent distributions under the symmetries
+        of the geometry have the same hash, so that equal solutions have the
+        same hash. It is kept up to date by the lots in O(1) for each
+        element moved, and computed from the distribution if the lots are
+        not built.
+
+        The hash changes with the distribution: a solution must not be
+        changed while it is in a set or a population.
+
+        Returns
+        -------
+        hash : int
+            The hash of the solution
+        """
+
+        if self.nbLots > 0:
+            return self.hashKey
+        return self._hashDistribution()
+
+
+    def _hashDistribution(self) -> int:
+        """Compute the hash of the distribution without the lots."""
+
+        # no key before the geometry is built
+        if self.geom is None or len(self.geom.hashKeys) < self.nbElements:
+            return 0
+        hashKeys = self.geom.hashKeys
+        keys = {}
+        for i, lot in enumerate(self.distribution):
+            if lot > -1:
+                keys[lot] = keys.get(lot, 0) + hashKeys[i]
+        hashKey = 0
+        for lot, key in keys.items():
+            hashKey += lot_hash(key & HASH_MASK, lot)
+        return hashKey & HASH_MASK
@@ -1,7 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from typing import List, Any
+from typing import Any, Dict, List
 
 def get_by_attr(list:List[Any], attr:str, value:Any, unique=True) -> Any:
     """Get an element in a list by one of his attributes.
@@ -63,6 +63,120 @@ def exists_by_attr(list:List[Any], attr:str, value:Any) -> bool:
         return False
 
 
+def get_by_no(noMap:Dict[int, Any], no:int) -> Any:
+    """Get an item in an index map by its numero.
+
+    Parameters
+    ----------
+    noMap : Dict[int, Any]
+        The index map in which we search the item, keyed by numero
+    no : int
+        The numero of the item
+
+    Returns
+    -------
+    res : Any
+        The item with this numero
+    """
+    try:
+        return noMap[no]
+    except KeyError:
+        raise NotFoundException('no', no)
+
+
+HASH_MASK = 2**64 - 1
+
+
+def mix_hash(key:int) -> int:
+    """Mix the bits of a 64-bit key (finalizer of splitmix64), so that
+    close keys give unrelated hashes. The key 0 gives 0.
+
+    Parameters
+    ----------
+    key : int
+        The key, between 0 and 2**64 - 1
+
+    Returns
+    -------
+    hash : int
+        The mixed key, between 0 and 2**64 - 1
+    """
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return key ^ (key >> 31)
+
+
+def lot_hash(key:int, index:int) -> int:
+    """Get the part of the hash of a solution given by one of its lots,
+    from the sum of the keys of its elements (see Geom.hashKeys). It does
+    not depend on the index of a private lot, so that renumbering the lots
+    keeps the hash, but the common lot (index 0) is hashed apart. An empty
+    lot gives 0.
+
+    Parameters
+    ----------
+    key : int
+        The sum of the keys of the elements of the lot, modulo 2**64
+    index : int
+        The index of the lot in its solution
+
+    Returns
+    -------
+    hash : int
+        The hash of the lot, between 0 and 2**64 - 1
+    """
+    if index == 0:
+        key = (key * 0x9E3779B97F4A7C15) & HASH_MASK
+    return mix_hash(key)
+
+
+def ring_area(ring:List[Any]) -> float:
+    """Get the signed area of a ring of points (shoelace formula): positive
+    if the points turn counterclockwise, negative otherwise.
+
+    Parameters
+    ----------
+    ring : List[Point]
+        The points of the ring, the first one not repeated at the end
+
+    Returns
+    -------
+    area : float
+        The signed area enclosed by the ring
+    """
+    area = 0.0
+    prev = ring[-1]
+    for p in ring:
+        area += prev.x * p.y - p.x * prev.y
+        prev = p
+    return area * 0.5
+
+
+def in_ring(x:float, y:float, ring:List[Any]) -> bool:
+    """Check if a point is inside a ring of points (ray casting).
+
+    Parameters
+    ----------
+    x, y : float
+        The coordinates of the point, not on the ring
+    ring : List[Point]
+        The points of the ring, the first one not repeated at the end
+
+    Returns
+    -------
+    inside : bool
+        True if the point is inside the ring
+    """
+    inside = False
+    prev = ring[-1]
+    for p in ring:
+        if (p.y > y) != (prev.y > y):
+            if x < prev.x + (y - prev.y) * (p.x - prev.x) / (p.y - prev.y):
+                inside = not inside
+        prev = p
+    return inside
+
+
 class TooManyFoundException(Exception):
     """Too many items found in a list
 
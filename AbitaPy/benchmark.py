@@ -0,0 +1,277 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the solver on generated geometries.
+
+Usage: python3 benchmark.py build [sizes...]
+       python3 benchmark.py memory [sizes...]
+       python3 benchmark.py components [floors...]
+       python3 benchmark.py load [sizes...]
+       python3 benchmark.py renumber [sizes...]
+       python3 benchmark.py multilevel [sizes...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from abitaPy import Algo, Element, Floor, Geom, Point, Population, Solution
+from abitaPy.abiFile import AbiFile
+from abitaPy.components import ComponentSolver
+from abitaPy.multilevel import MultilevelSolver
+
+
+def gridGeom(nbElements: int, nbFloors: int = 1, size: float = 3.) -> Geom:
+    """Generate an unbuilt geometry made of square cells, 3m x 3m by
+    default.
+
+    Each floor is a grid of roughly nbElements/nbFloors cells. The first
+    column and one row out of three are common corridors, so that every other
+    cell touches a corridor. The first cell of each floor is an exit.
+
+    Parameters
+    ----------
+    nbElements : int
+        The approximate number of elements of the geometry
+    nbFloors : int, optional
+        The number of floors, default to 1
+    size : float, optional
+        The side of the cells in meters, default to 3
+
+    Returns
+    -------
+    geom : Geom
+        The generated geometry, not built yet
+    """
+
+    geom = Geom()
+    perFloor = max(1, nbElements // nbFloors)
+    nx = max(1, int(perFloor ** 0.5))
+    ny = max(1, perFloor // nx)
+    pointNo = 0
+    eltNo = 0
+    for floorId in range(nbFloors):
+        geom.addFloor(Floor(floorId + 1))
+        grid = []
+        for j in range(ny + 1):
+            row = []
+            for i in range(nx + 1):
+                pointNo += 1
+                pt = Point(size * i, size * j, floorId, pointNo)
+                geom.addPoint(pt)
+                row.append(pt)
+            grid.append(row)
+        for j in range(ny):
+            for i in range(nx):
+                eltNo += 1
+                elt = Element(floorId, eltNo)
+                elt.addPoint(grid[j][i])
+                elt.addPoint(grid[j][i+1])
+                elt.addPoint(grid[j+1][i+1])
+                elt.addPoint(grid[j+1][i])
+                if i == 0 or j % 3 == 1:
+                    elt.common = True
+                    elt.imposed = i == 0 and j == 0
+                    elt.exit = i == 0 and j == 0
+                geom.addElement(elt)
+    return geom
+
+
+def benchBuild(sizes) -> None:
+    """Print the time spent in Geom.build against the number of elements."""
+
+    print("elements   segments   build (s)")
+    for size in sizes:
+        geom = gridGeom(size)
+        start = time.perf_counter()
+        geom.build()
+        elapsed = time.perf_counter() - start
+        print("{:>8d} {:>10d} {:>11.4f}".format(
+            geom.nbElements, geom.nbSegments, elapsed))
+
+
+def gridSolution(geom: Geom, lotWidth: int = 6) -> Solution:
+    """Generate a solution of a built geometry generated by gridGeom, where
+    the cells along each corridor are grouped in lots of lotWidth cells.
+
+    Parameters
+    ----------
+    geom : Geom
+        The built geometry
+    lotWidth : int, optional
+        The number of cells of each lot, default to 6
+
+    Returns
+    -------
+    sol : Solution
+        The solution, with its lots
+    """
+
+    sol = Solution(geom)
+    lots = {}
+    for elt in geom.elementList:
+        if elt.common:
+            sol.distribution[elt.index] = 0
+        else:
+            i = int(elt.centroid[0] // 3)
+            j = int(elt.centroid[1] // 3)
+            key = (elt.floorId, j, (i - 1) // lotWidth)
+            sol.distribution[elt.index] = lots.setdefault(key, len(lots) + 1)
+    sol.setLots()
+    return sol
+
+
+def benchMemory(sizes, nbSols: int = 50) -> None:
+    """Print the memory used by the copies of a solution, with their lots,
+    against the number of elements."""
+
+    print("elements   lots   bytes/solution")
+    for size in sizes:
+        geom = gridGeom(size)
+        geom.build()
+        sol = gridSolution(geom)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        solutions = [Solution(sol) for _ in range(nbSols)]
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        print("{:>8d} {:>6d} {:>16d}".format(
+            geom.nbElements, sol.nbLots, used // len(solutions)))
+
+
+def benchComponents(floors, perFloor: int = 48, nbJobs: int = 0) -> None:
+    """Print the time spent and the best fitness found when solving a
+    geometry as a whole and by components, against the number of floors."""
+
+    print("floors   whole (s)   fitness   components (s)   fitness")
+    for nbFloors in floors:
+        results = []
+        for solve in (lambda algo: algo.run(), lambda algo:
+                      ComponentSolver(algo, nbJobs).run()):
+            random.seed(0)
+            geom = gridGeom(perFloor * nbFloors, nbFloors)
+            geom.build()
+            popu = Population()
+            algo = Algo(geom, popu)
+            algo.initIT = 50 * nbFloors
+            algo.endIT = 5
+            algo.nbSols = 20
+            start = time.perf_counter()
+            while solve(algo):
+                pass
+            results.append((time.perf_counter() - start, popu.maxFitness))
+        print("{:>6d} {:>11.2f} {:>9.2f} {:>16.2f} {:>9.2f}".format(
+            nbFloors, results[0][0], results[0][1], results[1][0],
+            results[1][1]))
+
+
+def benchLoad(sizes, nbFloors: int = 4) -> None:
+    """Print the time spent reading a generated .abi file, without cache,
+    against the number of elements."""
+
+    print("elements     points   read (s)")
+    for size in sizes:
+        geom = gridGeom(size, nbFloors)
+        geom.build()
+        algo = Algo(geom, Population())
+        fd, fileName = tempfile.mkstemp(suffix='.abi')
+        os.close(fd)
+        try:
+            AbiFile(fileName).write(geom, Population(), algo)
+            geom = Geom()
+            start = time.perf_counter()
+            AbiFile(fileName).read(geom, Population(), Algo(geom, Population()))
+            elapsed = time.perf_counter() - start
+        finally:
+            os.remove(fileName)
+        print("{:>8d} {:>10d} {:>10.4f}".format(
+            geom.nbElements, geom.nbPoints, elapsed))
+
+
+def benchRenumber(sizes, nbEvals: int = 20) -> None:
+    """Print the bandwidth of the adjacency (largest index difference of
+    two neighbours) and the time spent evaluating a solution, for elements
+    given in a random order and renumbered, against the number of
+    elements."""
+
+    print("elements   bandwidth   evaluate (s)   renumbered   evaluate (s)")
+    for size in sizes:
+        results = []
+        for renumber in (False, True):
+            random.seed(0)
+            geom = gridGeom(size)
+            random.shuffle(geom.elementList)
+            for i, elt in enumerate(geom.elementList):
+                elt.index = i
+            geom.renumber = renumber
+            geom.build()
+            bandwidth = max(abs(i - geom.adjIndices[k])
+                            for i in range(geom.nbElements)
+                            for k in range(geom.adjOffsets[i],
+                                           geom.adjOffsets[i+1]))
+            algo = Algo(geom, Population())
+            algo.setDefaultTypes()
+            sol = gridSolution(geom)
+            start = time.perf_counter()
+            for _ in range(nbEvals):
+                algo.evaluate(sol)
+            results.append((bandwidth, time.perf_counter() - start))
+        print("{:>8d} {:>11d} {:>14.4f} {:>12d} {:>14.4f}".format(
+            size, results[0][0], results[0][1], results[1][0],
+            results[1][1]))
+
+
+def benchMultilevel(sizes, initIT: int = 200, endIT: int = 3) -> None:
+    """Print the time spent and the best fitness found when solving a grid
+    of 1m x 1m cells as a whole and by levels, against the number of
+    elements."""
+
+    print("elements   whole (s)   fitness   multilevel (s)   fitness")
+    for size in sizes:
+        results = []
+        for solve in (lambda algo: algo.run(), lambda algo:
+                      MultilevelSolver(algo).run()):
+            random.seed(0)
+            geom = gridGeom(size, 1, 1.)
+            geom.build()
+            popu = Population()
+            algo = Algo(geom, popu)
+            algo.initIT = initIT
+            algo.endIT = endIT
+            algo.nbSols = 10
+            start = time.perf_counter()
+            while solve(algo):
+                pass
+            results.append((time.perf_counter() - start, popu.maxFitness))
+        print("{:>8d} {:>11.2f} {:>9.2f} {:>16.2f} {:>9.2f}".format(
+            size, results[0][0], results[0][1], results[1][0],
+            results[1][1]))
+
+
+BENCHMARKS = {
+    'build': (benchBuild, [500, 1000, 2000, 5000, 10000, 20000]),
+    'memory': (benchMemory, [500, 1000, 2000]),
+    'components': (benchComponents, [1, 2, 4, 8]),
+    'load': (benchLoad, [1000, 2000, 5000, 10000, 20000]),
+    'renumber': (benchRenumber, [1000, 2000, 5000]),
+    'multilevel': (benchMultilevel, [200, 400, 800]),
+}
+
+
+def main() -> None:
+    """Run the benchmark named by the first argument."""
+    args = sys.argv[1:]
+    if len(args) == 0 or args[0] not in BENCHMARKS:
+        print(__doc__)
+        exit()
+    bench, sizes = BENCHMARKS[args[0]]
+    if len(args) > 1:
+        sizes = [int(a) for a in args[1:]]
+    bench(sizes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,881 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Tests of the solver. Run from the AbitaPy folder with:
+python3 -m unittest tests/test.py
+"""
+
+import copy
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from abitaPy import algo as algoModule
+from abitaPy.abiFile import AbiFile
+from abitaPy.algo import Algo
+from abitaPy.border import Border
+from abitaPy.cache import GeomCache
+from abitaPy.catalogue import LotCatalogue
+from abitaPy.geom import Geom
+from abitaPy.move import Move
+from abitaPy.multilevel import MultilevelSolver
+from abitaPy.pipeline import FloorPipeline
+from abitaPy.point import Point
+from abitaPy.population import Population
+from abitaPy.presolve import Presolve
+from abitaPy.segment import Segment
+from abitaPy.solution import Solution
+from abitaPy.utils import ring_area
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def read(fileName, cache=None, **options):
+    """Read an .abi file, with the options of the geometry given, and
+    return its geometry, population and algorithm."""
+
+    geom = Geom()
+    for name, value in options.items():
+        setattr(geom, name, value)
+    popu = Population()
+    algo = Algo(geom, popu)
+    AbiFile(fileName, cache).read(geom, popu, algo)
+    return geom, popu, algo
+
+
+def readProgram(program):
+    """Read the content of an .abi file, and return its geometry, population
+    and algorithm."""
+
+    fd, fileName = tempfile.mkstemp(suffix='.abi')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(program)
+        return read(fileName)
+    finally:
+        os.remove(fileName)
+
+
+def grid(nx, ny, size, common=(), exits=(), solutions=()):
+    """Write the content of an .abi file of a grid of nx by ny square
+    elements, numbered row by row from 1, with the common and exit elements
+    and the solutions given by their lots (lists of element numbers, the
+    common lot first)."""
+
+    lines = ['F1']
+    for j in range(ny + 1):
+        for i in range(nx + 1):
+            lines.append('P{} {} {}'.format(j * (nx + 1) + i + 1,
+                                            i * size, j * size))
+    for j in range(ny):
+        for i in range(nx):
+            p = j * (nx + 1) + i + 1
+            lines.append('E{} 4 {} {} {} {}'.format(
+                j * nx + i + 1, p, p + 1, p + nx + 2, p + nx + 1))
+    lines.extend('C{}'.format(no) for no in common)
+    lines.extend('X{}'.format(no) for no in exits)
+    for n, lots in enumerate(solutions):
+        lines.append('S{} 0.00'.format(n))
+        for no, elts in enumerate(lots):
+            lines.append('L{} 0 0.00 {} {}'.format(
+                no, len(elts), ' '.join(str(e) for e in elts)))
+    return '\n'.join(lines) + '\n'
+
+
+def solve(algo, seed, initIT=300, endIT=30):
+    """Run the algorithm from a random seed, with few iterations."""
+
+    random.seed(seed)
+    algo.initIT = initIT
+    algo.endIT = endIT
+    while algo.run():
+        pass
+
+
+class GeomCacheTest(unittest.TestCase):
+    """A built geometry is restored from the cache when the geometry section
+    of a file and the build options are unchanged, and only then."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ,
+                                       {'ABITAPY_CACHE': self.directory})
+        self.environ.start()
+        self.fileName = os.path.join(DATA, 'G001_solved.abi')
+        with open(self.fileName) as f:
+            self.program = f.read()
+        self.cache = GeomCache()
+        read(self.fileName, self.cache)
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.directory)
+
+    def key(self, program, **options):
+        """Get the key of the geometry of a program in the cache."""
+        geom = Geom()
+        for name, value in options.items():
+            setattr(geom, name, value)
+        geometry, _ = self.cache.split(program)
+        return self.cache.key(geometry, geom)
+
+    def test_stored(self):
+        self.assertEqual(os.listdir(self.directory),
+                         [self.key(self.program) + '.pkl'])
+        self.assertTrue(self.cache.load(self.key(self.program), Geom()))
+
+    def test_other_commands(self):
+        key = self.key(self.program)
+        for pattern, new in ((r'A1\t3000', 'A1\t50'),
+                             (r'T2\t80.00', 'T2\t90.00'),
+                             (r'S1\t78.35', 'S1\t12.00'),
+                             (r'L1\t4\t50.00\t2\t1\t2', 'L1\t4\t50.00\t1\t1')):
+            program = re.sub(pattern, new, self.program, 1)
+            self.assertNotEqual(program, self.program)
+            self.assertEqual(self.key(program), key, new)
+
+    def test_geometry_commands(self):
+        key = self.key(self.program)
+        bonus = self.key(self.program + 'B1 0.5\n')
+        for pattern, new in ((r'P2\s+6.00', 'P2 6.50'),
+                             (r'E1\s+4\s+1\s+8\s+9\s+2', 'E1 4 1 2 9 8'),
+                             (r'C13', 'C12'),
+                             (r'X19', 'X18')):
+            program = re.sub(pattern, new, self.program, 1)
+            self.assertNotEqual(program, self.program)
+            self.assertNotEqual(self.key(program), key, new)
+        self.assertNotEqual(bonus, key)
+        self.assertNotEqual(self.key(self.program + 'B1 0.2\n'), bonus)
+
+    def test_build_options(self):
+        key = self.key(self.program)
+        self.assertNotEqual(self.key(self.program, weldTolerance=0.01), key)
+        self.assertNotEqual(self.key(self.program, splitEdges=True), key)
+        self.assertNotEqual(self.key(self.program, renumber=True), key)
+
+    def test_restored_geometry(self):
+        # G001.abi has the geometry of G001_solved.abi, already stored
+        fileName = os.path.join(DATA, 'G001.abi')
+        fresh = read(fileName)
+        restored = read(fileName, self.cache)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        solve(fresh[2], 0)
+        solve(restored[2], 0)
+        self.assertGreater(fresh[1].maxFitness, 0)
+        self.assertEqual([sol.fitness for sol in fresh[1].solutionList],
+                         [sol.fitness for sol in restored[1].solutionList])
+        self.assertEqual(fresh[1].solutionList[0].distribution,
+                         restored[1].solutionList[0].distribution)
+
+    def test_evict(self):
+        geom = read(self.fileName)[0]
+        size = os.path.getsize(os.path.join(self.directory,
+                                            os.listdir(self.directory)[0]))
+        cache = GeomCache(os.path.join(self.directory, 'evict'),
+                          int(2.5 * size))
+        for key, mtime in (('a', 1000), ('b', 1001), ('c', 1002)):
+            cache.store(key, geom)
+            os.utime(os.path.join(cache.directory, key + '.pkl'),
+                     (mtime, mtime))
+        # the oldest entry is removed
+        self.assertEqual(sorted(os.listdir(cache.directory)),
+                         ['b.pkl', 'c.pkl'])
+        # b is used, then c is the oldest
+        self.assertTrue(cache.load('b', Geom()))
+        cache.store('d', geom)
+        self.assertEqual(sorted(os.listdir(cache.directory)),
+                         ['b.pkl', 'd.pkl'])
+
+
+class FloorPipelineTest(unittest.TestCase):
+    """The quotas of lots of each type of the floors add up to the numbers
+    of the whole building, before and after their reallocation."""
+
+    def setUp(self):
+        self.geom, self.popu, self.algo = read(
+            os.path.join(DATA, 'G003.abi'))
+        self.algo.setDefaultTypes()
+        self.pipeline = FloorPipeline(self.algo, 1)
+
+    def test_split(self):
+        split = self.pipeline._split
+        self.assertEqual(split(7, [5, 3, 2]), [4, 2, 1])
+        self.assertEqual(split(10, [1, 1, 1]), [4, 3, 3])
+        self.assertEqual(split(3, [0, 0]), [2, 1])
+        rnd = random.Random(0)
+        for _ in range(500):
+            total = rnd.randint(0, 50)
+            weights = [rnd.uniform(0, 10) for _ in range(rnd.randint(1, 5))]
+            shares = split(total, weights)
+            self.assertEqual(sum(shares), total)
+            # each share is its exact value rounded down or up, and the
+            # shares rounded up have the largest remainders
+            exact = [total * w / sum(weights) for w in weights]
+            for share, x in zip(shares, exact):
+                self.assertTrue(int(x) <= share <= int(x) + 1)
+            up = [x - int(x) for share, x in zip(shares, exact)
+                  if share > int(x)]
+            down = [x - int(x) for share, x in zip(shares, exact)
+                    if share == int(x)]
+            if len(up) > 0 and len(down) > 0:
+                self.assertGreaterEqual(min(up), max(down))
+
+    def test_reallocate(self):
+        rnd = random.Random(0)
+        typeList = self.algo.typeList
+        for _ in range(500):
+            weights = [rnd.uniform(1, 100) for _ in range(rnd.randint(2, 4))]
+            for type in typeList:
+                type.nbMin = rnd.randint(0, 6)
+                type.nbMax = type.nbMin + rnd.randint(0, 6)
+            self.pipeline.quotaList = [[] for _ in weights]
+            for type in typeList:
+                for quota, nbMin, nbMax in zip(
+                        self.pipeline.quotaList,
+                        self.pipeline._split(type.nbMin, weights),
+                        self.pipeline._split(type.nbMax, weights)):
+                    quota.append([nbMin, max(nbMin, nbMax)])
+            solutions = [[(rnd.choice((0.0, 1.0)), [],
+                           [rnd.randint(0, 8) for _ in typeList])]
+                         for _ in weights]
+            before = copy.deepcopy(self.pipeline.quotaList)
+            changed = self.pipeline._reallocate(solutions, weights)
+            quotaList = self.pipeline.quotaList
+            self.assertEqual(changed, [i for i in range(len(weights))
+                                       if quotaList[i] != before[i]])
+            for j, type in enumerate(typeList):
+                self.assertGreaterEqual(sum(q[j][0] for q in quotaList),
+                                        type.nbMin)
+                self.assertLessEqual(sum(q[j][1] for q in quotaList),
+                                     type.nbMax)
+                for quota in quotaList:
+                    self.assertLessEqual(quota[j][0], quota[j][1])
+
+    def test_reallocate_unchanged(self):
+        """A floor which failed within its quotas changes nothing."""
+        for type in self.algo.typeList:
+            type.nbMin = 1
+            type.nbMax = 4
+        self.pipeline.quotaList = [[[1, 2] for _ in self.algo.typeList],
+                                   [[0, 2] for _ in self.algo.typeList]]
+        solutions = [[(0.0, [], [1] * self.algo.nbTypes)],
+                     [(1.0, [], [0] * self.algo.nbTypes)]]
+        self.assertEqual(self.pipeline._reallocate(solutions, [1, 1]), [])
+
+    def test_run(self):
+        bounds = ((6, 10), (0, 4), (2, 4), (0, 1000), (0, 1000))
+        for type, (nbMin, nbMax) in zip(self.algo.typeList, bounds):
+            type.nbMin = nbMin
+            type.nbMax = nbMax
+        random.seed(0)
+        self.pipeline.initIT = 200
+        self.pipeline.endIT = 30
+        self.pipeline.run()
+        self.assertEqual(len(self.pipeline.quotaList), 2)
+        sol = self.popu.solutionList[0]
+        self.algo.evaluate(sol)
+        self.assertGreater(sol.fitness, 0)
+        for type, (nbMin, nbMax) in zip(self.algo.typeList, bounds):
+            self.assertTrue(nbMin <= type.nb <= nbMax)
+
+
+class ConnectivityTest(unittest.TestCase):
+    """The cut elements of a lot (Lot.stillConnex) and the exit forest of
+    the common lot (Lot.stillConnected), kept across moves, agree with a
+    breadth-first search of the lot without the element."""
+
+    FILES = ('G001_solved.abi', 'G003_solved.abi', 'G004_solved.abi')
+
+    def reached(self, sol, lot, removed, roots):
+        """Get the elements of a lot reached from roots by a breadth-first
+        search, without the removed element."""
+
+        geom = sol.geom
+        seen = set(i for i in roots if i != removed)
+        queue = list(seen)
+        while len(queue) > 0:
+            i = queue.pop()
+            for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]):
+                j = geom.adjIndices[k]
+                if (j != removed and j not in seen and
+                        sol.distribution[j] == lot.index):
+                    seen.add(j)
+                    queue.append(j)
+        return seen
+
+    def checkCuts(self, sol):
+        """Check stillConnex for each element of each lot."""
+
+        for lot in sol.lotList:
+            indices = [elt.index for elt in lot.elementList]
+            connex = len(self.reached(sol, lot, -1, indices[:1])) == len(indices)
+            for elt in lot.elementList:
+                if lot.nbElements < 2 or elt.imposed:
+                    expected = False
+                else:
+                    others = [i for i in indices if i != elt.index]
+                    expected = connex and len(self.reached(
+                        sol, lot, elt.index, others[:1])) == len(others)
+                self.assertEqual(lot.stillConnex(elt), expected)
+
+    def checkExits(self, sol):
+        """Check stillConnected for each element of the common lot."""
+
+        lot = sol.lotList[0]
+        if not lot.common:
+            return
+        exits = [elt.index for elt in lot.elementList if elt.exit]
+        for elt in lot.elementList:
+            if elt.imposed:
+                continue
+            expected = len(self.reached(sol, lot, elt.index, exits)) == \
+                lot.nbElements - 1
+            self.assertEqual(lot.stillConnected(elt), expected)
+
+    def randomWalk(self, popu, seed, check, nbMoves=60):
+        """Walk through random moves from the solutions of a file, checking
+        the lots after each move and each undo."""
+
+        rnd = random.Random(seed)
+        for start in popu.solutionList[:4]:
+            sol = Solution(start)
+            check(sol)
+            for _ in range(nbMoves):
+                moves = [Move(sol, j, k) for j in range(sol.nbLots)
+                         for k in range(sol.lotList[j].nbSegments)]
+                moves = [move for move in moves if move.valid()]
+                if len(moves) == 0:
+                    break
+                move = rnd.choice(moves)
+                move.apply()
+                check(sol)
+                if rnd.random() < 0.5:
+                    move.undo()
+                    check(sol)
+                # copies share the indexes of their unchanged lots
+                if rnd.random() < 0.2:
+                    sol = Solution(sol)
+
+    def test_cut_elements(self):
+        for n, name in enumerate(self.FILES):
+            geom, popu, algo = read(os.path.join(DATA, name))
+            self.randomWalk(popu, n, self.checkCuts)
+
+    def test_exit_forest(self):
+        for n, name in enumerate(self.FILES):
+            geom, popu, algo = read(os.path.join(DATA, name))
+            self.randomWalk(popu, n, self.checkExits)
+
+
+class NoPresolve(Presolve):
+    """A presolve which fixes no element and leaves the numbers of lots."""
+
+    def run(self):
+        self.minLots = 0
+        self.maxLots = self.algo.geom.nbElements
+
+
+class PresolveTest(unittest.TestCase):
+    """The presolve fixes the common elements which cannot be in a private
+    lot, finds the private elements which cannot be in any lot, and bounds
+    the number of lots without removing valid solutions."""
+
+    # a single type, of 20 to 60 m2
+    TYPES = 'T1 100.00 20.00 60.00 0 10\n'
+
+    def row(self, widths, common=(), exits=()):
+        """Read a row of elements 10 m high, of the widths given, numbered
+        from 1, with the types of the class."""
+
+        xs = [0]
+        for width in widths:
+            xs.append(xs[-1] + width)
+        lines = ['F1']
+        for i, x in enumerate(xs):
+            lines.append('P{} {} 0'.format(2 * i + 1, x))
+            lines.append('P{} {} 10'.format(2 * i + 2, x))
+        for i in range(len(widths)):
+            lines.append('E{} 4 {} {} {} {}'.format(
+                i + 1, 2 * i + 1, 2 * i + 3, 2 * i + 4, 2 * i + 2))
+        lines.extend('C{}'.format(no) for no in common)
+        lines.extend('X{}'.format(no) for no in exits)
+        return readProgram(self.TYPES + '\n'.join(lines) + '\n')
+
+    def test_fixed(self):
+        # a common element of 200 m2, the exit, and a private element
+        geom, popu, algo = self.row((20, 5, 5), common=(1,), exits=(2,))
+        presolve = Presolve(algo)
+        presolve.run()
+        elementMap = geom.elementMap
+        self.assertEqual(presolve.fixedList, [elementMap[1]])
+        self.assertEqual([elt.no for elt in geom.elementList if elt.fixed],
+                         [1])
+        self.assertEqual(presolve.deadList, [])
+        self.assertTrue(presolve.feasible())
+        # 50 m2 to share in lots of 20 to 60 m2
+        self.assertEqual((presolve.minLots, presolve.maxLots), (1, 2))
+        # the fixed element stays in the common lot
+        solve(algo, 0, 20, 10)
+        self.assertGreater(popu.maxFitness, 0)
+        for sol in popu.solutionList:
+            self.assertEqual(sol.distribution[elementMap[1].index], 0)
+
+    def test_dead(self):
+        # the last private element is 100 m2 away from the common lot
+        geom, popu, algo = self.row((20, 5, 5, 5), common=(1,), exits=(2,))
+        presolve = Presolve(algo)
+        presolve.run()
+        self.assertEqual(presolve.deadList, [geom.elementMap[4]])
+        self.assertFalse(presolve.feasible())
+        with self.assertLogs(level='WARNING') as logs:
+            algo.initIT = 1
+            algo.endIT = 0
+            algo.run()
+        self.assertIn('E4', '\n'.join(logs.output))
+
+    def test_bounds(self):
+        # the private elements of G001 have 404 m2, in lots of at most
+        # 100 m2: at least 5 lots. All the elements but the exit have
+        # 443 m2, in lots of more than 30 m2: at most 14 lots. G003 has
+        # twice the floor of G001, with 808 and 886 m2.
+        for name, bounds in (('G001_solved.abi', (5, 14)),
+                             ('G003_solved.abi', (9, 29))):
+            geom, popu, algo = read(os.path.join(DATA, name))
+            presolve = Presolve(algo)
+            presolve.run()
+            self.assertEqual((presolve.minLots, presolve.maxLots), bounds)
+            self.assertEqual(presolve.fixedList, [])
+            self.assertTrue(presolve.feasible())
+            # the valid solutions of the file are kept
+            for sol in popu.solutionList:
+                if sol.fitness > 0:
+                    self.assertTrue(bounds[0] <= sol.nbLots - 1 <= bounds[1])
+
+    def test_best_fitness(self):
+        fitnesses = []
+        for presolve in (Presolve, NoPresolve):
+            geom, popu, algo = read(os.path.join(DATA, 'G003_solved.abi'))
+            best = popu.maxFitness
+            with mock.patch.object(algoModule, 'Presolve', presolve):
+                solve(algo, 0, 200, 30)
+            fitnesses.append(popu.maxFitness)
+        self.assertEqual(fitnesses, [best, best])
+
+
+class MultilevelTest(unittest.TestCase):
+    """The super-elements of a coarse geometry keep the measures of their
+    elements, so that a coarse solution has the fitness of its projection."""
+
+    def setUp(self):
+        self.geom, self.popu, self.algo = read(os.path.join(DATA, 'G003.abi'))
+        self.algo.setDefaultTypes()
+        self.algo.alpha = 0.3
+        self.solver = MultilevelSolver(self.algo)
+
+    def coarsen(self, areaMax):
+        coarse, mapping = self.solver.coarsen(self.geom, areaMax)
+        self.assertEqual(len(mapping), self.geom.nbElements)
+        self.assertLess(coarse.nbElements, self.geom.nbElements)
+        return coarse, mapping
+
+    def test_measures(self):
+        geom = self.geom
+        for areaMax in (15.0, 100.0):
+            coarse, mapping = self.coarsen(areaMax)
+            for g, elt in enumerate(coarse.elementList):
+                area = sum(e.area for e in geom.elementList
+                           if mapping[e.index] == g)
+                self.assertAlmostEqual(elt.area, area)
+                self.assertLessEqual(elt.area, max(areaMax, area))
+            self.assertAlmostEqual(sum(coarse.extLengths),
+                                   sum(geom.extLengths))
+            # the borders inside the super-elements are counted twice in
+            # the adjacency of the geometry
+            inner = 0.0
+            for i in range(geom.nbElements):
+                for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]):
+                    if mapping[geom.adjIndices[k]] == mapping[i]:
+                        inner += geom.adjLengths[k]
+            self.assertGreater(inner, 0)
+            self.assertAlmostEqual(sum(coarse.adjLengths),
+                                   sum(geom.adjLengths) - inner)
+            for g in range(coarse.nbElements):
+                for k in range(coarse.adjOffsets[g], coarse.adjOffsets[g+1]):
+                    h = coarse.adjIndices[k]
+                    length = 0.0
+                    for i in range(geom.nbElements):
+                        if mapping[i] == g:
+                            for n in range(geom.adjOffsets[i],
+                                           geom.adjOffsets[i+1]):
+                                if mapping[geom.adjIndices[n]] == h:
+                                    length += geom.adjLengths[n]
+                    self.assertAlmostEqual(coarse.adjLengths[k], length)
+
+    def test_status(self):
+        for areaMax in (15.0, 100.0, 1000.0):
+            coarse, mapping = self.coarsen(areaMax)
+            for elt in self.geom.elementList:
+                superElt = coarse.elementList[mapping[elt.index]]
+                self.assertEqual(
+                    (elt.common, elt.imposed, elt.exit),
+                    (superElt.common, superElt.imposed, superElt.exit))
+
+    def test_projection(self):
+        coarse, mapping = self.coarsen(15.0)
+        coarseAlgo = Algo(coarse, Population())
+        coarseAlgo.alpha = self.algo.alpha
+        coarseAlgo.setDefaultTypes()
+        random.seed(0)
+        nbPositive = 0
+        for n in range(500):
+            sol = Solution(coarse)
+            sol.rndSet(8 + n % 8)
+            coarseAlgo.evaluate(sol)
+            fine = Solution(self.geom)
+            fine.distribution = self.solver.project(sol.distribution,
+                                                    mapping)
+            fine.setLots()
+            self.algo.evaluate(fine)
+            self.assertAlmostEqual(fine.fitness, sol.fitness, places=9)
+            if sol.fitness > 0:
+                nbPositive += 1
+        self.assertGreater(nbPositive, 0)
+
+
+class SymmetryTest(unittest.TestCase):
+    """The symmetries of a geometry map its adjacency onto itself, and the
+    images of a solution by them are equal to it, with the same hash."""
+
+    # a grid of 3 by 3 elements, the middle row common, and two solutions of
+    # the same fitness which are not images of each other
+    GRID = 'T1 70.00 30.00 45.00 0 10\nT2 100.00 60.00 75.00 0 10\n' + grid(
+        3, 3, 6.0, common=(4, 6), exits=(5,), solutions=(
+        ([4, 5, 6], [1, 2], [3], [7, 8], [9]),
+        ([4, 5, 6], [1, 2], [3], [7], [8, 9])))
+
+    def image(self, sol, perm):
+        """Get the image of an evaluated solution by a permutation of the
+        elements, evaluated."""
+        image = Solution(sol.geom)
+        image.distribution = [-1] * sol.nbElements
+        for i, lot in enumerate(sol.distribution):
+            image.distribution[perm[i]] = lot
+        image.setLots()
+        return image
+
+    def checkAdjacency(self, geom):
+        for perm in geom.symmetries:
+            self.assertEqual(sorted(perm), list(range(geom.nbElements)))
+            for i in range(geom.nbElements):
+                neighbours = sorted(
+                    (perm[geom.adjIndices[k]], geom.adjLengths[k])
+                    for k in range(geom.adjOffsets[i], geom.adjOffsets[i+1]))
+                j = perm[i]
+                images = sorted(
+                    (geom.adjIndices[k], geom.adjLengths[k])
+                    for k in range(geom.adjOffsets[j], geom.adjOffsets[j+1]))
+                self.assertEqual(neighbours, images)
+
+    def test_adjacency(self):
+        geom, popu, algo = readProgram(self.GRID)
+        # the two mirrors and the half turn
+        self.assertEqual(len(geom.symmetries), 3)
+        self.checkAdjacency(geom)
+        geom, popu, algo = read(os.path.join(DATA, 'G003_solved.abi'))
+        # the two floors are exchanged
+        self.assertEqual(len(geom.symmetries), 1)
+        self.checkAdjacency(geom)
+
+    def test_images(self):
+        for geom, popu, algo in (readProgram(self.GRID),
+                                 read(os.path.join(DATA, 'G003_solved.abi'))):
+            nbMoved = 0
+            for sol in popu.solutionList[:10]:
+                for perm in geom.symmetries:
+                    image = self.image(sol, perm)
+                    algo.evaluate(image)
+                    self.assertEqual(image.fitness, sol.fitness)
+                    self.assertEqual(image, sol)
+                    self.assertEqual(hash(image), hash(sol))
+                    if image.distribution != sol.distribution:
+                        nbMoved += 1
+            self.assertGreater(nbMoved, 0)
+
+    def test_not_equivalent(self):
+        geom, popu, algo = readProgram(self.GRID)
+        sol, other = popu.solutionList
+        self.assertGreater(sol.fitness, 0)
+        self.assertEqual(sol.fitness, other.fitness)
+        self.assertNotEqual(sol, other)
+        self.assertNotEqual(other, sol)
+
+    def test_no_symmetry(self):
+        geom, popu, algo = read(os.path.join(DATA, 'G001_solved.abi'))
+        self.assertEqual(geom.symmetries, [])
+        sol = popu.solutionList[0]
+        self.assertNotEqual(sol, popu.solutionList[1])
+        self.assertEqual(sol, Solution(sol))
+
+
+class CatalogueTest(unittest.TestCase):
+    """The candidate lots of the catalogue are distinct connected sets of
+    private elements, touching the common lot, whose area is in the range of
+    a type."""
+
+    def test_candidates(self):
+        geom, popu, algo = read(os.path.join(DATA, 'G003.abi'))
+        algo.setDefaultTypes()
+        catalogue = LotCatalogue(algo)
+        catalogue.build()
+        self.assertGreater(catalogue.nbLots, 0)
+        self.assertEqual(len(set(catalogue.lotList)), catalogue.nbLots)
+        for indices in catalogue.lotList:
+            self.assertEqual(list(indices), sorted(indices))
+            elts = [geom.elementList[i] for i in indices]
+            self.assertFalse(any(elt.common or elt.imposed for elt in elts))
+            area = sum(elt.area for elt in elts)
+            self.assertTrue(any(t.areaMin < area <= t.areaMax
+                                for t in algo.typeList))
+            neighbours = set()
+            for i in indices:
+                neighbours.update(geom.adjIndices[geom.adjOffsets[i]:
+                                                  geom.adjOffsets[i+1]])
+            self.assertTrue(any(geom.elementList[j].common
+                                for j in neighbours))
+            # connected
+            seen = set(indices[:1])
+            queue = list(seen)
+            while len(queue) > 0:
+                i = queue.pop()
+                for j in geom.adjIndices[geom.adjOffsets[i]:
+                                         geom.adjOffsets[i+1]]:
+                    if j in indices and j not in seen:
+                        seen.add(j)
+                        queue.append(j)
+            self.assertEqual(len(seen), len(indices))
+
+    def test_seed(self):
+        geom, popu, algo = read(os.path.join(DATA, 'G003.abi'))
+        algo.setDefaultTypes()
+        algo.catalogue = LotCatalogue(algo)
+        algo.catalogue.build()
+        random.seed(0)
+        for _ in range(20):
+            sol = Solution(geom)
+            algo.catalogue.seed(sol, 8)
+            self.assertNotIn(-1, sol.distribution)
+            self.assertEqual(sol.nbLots, max(sol.distribution) + 1)
+
+
+class MoveFitnessTest(unittest.TestCase):
+    """The fitness of a move computed incrementally (Algo.moveFitness) is
+    exactly the fitness evaluate gives to the solution after the move."""
+
+    def setUp(self):
+        self.geom, self.popu, self.algo = read(
+            os.path.join(DATA, 'G003_solved.abi'))
+        self.algo.setDefaultTypes()
+
+    def randomWalk(self, seed, nbMoves=200):
+        """Walk through random moves from a solution of the file, checking
+        the fitness of each move before applying it. Return the number of
+        moves leading to a positive fitness."""
+
+        rnd = random.Random(seed)
+        sol = Solution(rnd.choice(self.popu.solutionList))
+        self.algo.evaluate(sol, False)
+        nbPositive = 0
+        for _ in range(nbMoves):
+            moves = [Move(sol, j, k) for j in range(sol.nbLots)
+                     for k in range(sol.lotList[j].nbSegments)]
+            moves = [move for move in moves if move.valid()]
+            if len(moves) == 0:
+                break
+            move = rnd.choice(moves)
+            fitness = self.algo.moveFitness(sol, move.element, move.lotID)
+            move.apply()
+            self.algo.evaluate(sol, False)
+            self.assertEqual(fitness, sol.fitness)
+            if fitness > 0:
+                nbPositive += 1
+            # undo most moves, so as to stay close to valid solutions
+            if rnd.random() < 0.8:
+                move.undo()
+                self.algo.evaluate(sol, False)
+        return nbPositive
+
+    def test_random_moves(self):
+        nbPositive = 0
+        for seed in range(5):
+            nbPositive += self.randomWalk(seed)
+        self.assertGreater(nbPositive, 0)
+
+    def test_random_moves_aspect_ratio(self):
+        self.algo.alpha = 0.3
+        nbPositive = 0
+        for seed in range(5, 10):
+            nbPositive += self.randomWalk(seed)
+        self.assertGreater(nbPositive, 0)
+
+    def test_evaluated_copy(self):
+        """A move copied and evaluated has the fitness of the move."""
+        sol = self.popu.solutionList[0]
+        self.assertGreater(sol.fitness, 0)
+        for j in range(sol.nbLots):
+            for k in range(sol.lotList[j].nbSegments):
+                move = Move(sol, j, k)
+                if move.valid():
+                    self.assertAlmostEqual(move.fitness(self.algo),
+                                           move.copy(self.algo).fitness,
+                                           places=9)
+
+
+class BorderTest(unittest.TestCase):
+    """A border keeps its segments in the order a list would, whatever the
+    segments removed, and the border of a lot follows its elements."""
+
+    def setUp(self):
+        self.segments = [Segment(Point(i, 0, 0, i + 1),
+                                 Point(i + 1, 0, 0, i + 2))
+                         for i in range(10)]
+
+    def test_positions(self):
+        border = Border(self.segments)
+        expected = list(self.segments)
+        for i in (3, 5, 9, 0):
+            self.assertTrue(border.remove(self.segments[i]))
+            expected.remove(self.segments[i])
+            self.assertEqual(len(border), len(expected))
+            for n in range(len(expected)):
+                self.assertIs(border[n], expected[n])
+            self.assertIs(border[-1], expected[-1])
+        self.assertEqual(list(border), expected)
+        self.assertNotIn(self.segments[3], border)
+        self.assertIn(self.segments[4], border)
+        # the segments added back go at the end
+        for i in (5, 3):
+            self.assertTrue(border.add(self.segments[i]))
+            expected.append(self.segments[i])
+        self.assertEqual(list(border), expected)
+        self.assertIs(border[len(expected) - 1], self.segments[3])
+
+    def test_duplicates(self):
+        border = Border(self.segments[:5])
+        self.assertFalse(border.add(self.segments[2]))
+        self.assertEqual(len(border), 5)
+        self.assertTrue(border.remove(self.segments[2]))
+        self.assertFalse(border.remove(self.segments[2]))
+        self.assertFalse(border.remove(self.segments[7]))
+        self.assertEqual(list(border), self.segments[:2] + self.segments[3:5])
+
+    def test_copy(self):
+        border = Border(self.segments)
+        border.remove(self.segments[4])
+        border.remove(self.segments[1])
+        border.add(self.segments[4])
+        expected = list(border)
+        other = border.copy()
+        self.assertEqual(list(other), expected)
+        other.remove(self.segments[6])
+        other.add(self.segments[6])
+        border.remove(self.segments[0])
+        self.assertEqual(list(other), [s for s in expected
+                                       if s is not self.segments[6]] +
+                         [self.segments[6]])
+        self.assertEqual(list(border), expected[1:])
+
+    def test_lots(self):
+        """The borders of the lots are the segments between their elements
+        and the others, along random moves."""
+        geom, popu, algo = read(os.path.join(DATA, 'G003_solved.abi'))
+        rnd = random.Random(0)
+        sol = Solution(popu.solutionList[0])
+        for _ in range(100):
+            for lot in sol.lotList:
+                expected = set()
+                for elt in lot.elementList:
+                    for seg in elt.segmentList:
+                        if not lot.contain(seg.nextOf(elt)):
+                            expected.add(id(seg))
+                self.assertEqual(lot.nbSegments, len(lot.segmentList))
+                self.assertEqual(set(id(seg) for seg in lot.segmentList),
+                                 expected)
+                self.assertEqual(len(expected), len(lot.segmentList))
+            moves = [Move(sol, j, k) for j in range(sol.nbLots)
+                     for k in range(sol.lotList[j].nbSegments)]
+            move = rnd.choice([move for move in moves if move.valid()])
+            move.apply()
+            if rnd.random() < 0.3:
+                move.undo()
+
+
+class RingsTest(unittest.TestCase):
+    """The rings of a lot follow each segment of its border once, the outer
+    rings counterclockwise and the holes clockwise, and enclose its area."""
+
+    def checkRings(self, lot):
+        outers, holes = lot.getRings()
+        edges = []
+        for ring in outers + holes:
+            # a simple ring
+            self.assertEqual(len(set(id(p) for p in ring)), len(ring))
+            for n in range(len(ring)):
+                edges.append(frozenset((id(ring[n-1]), id(ring[n]))))
+        self.assertEqual(len(edges), lot.nbSegments)
+        self.assertEqual(set(edges), set(frozenset((id(seg.p1), id(seg.p2)))
+                                         for seg in lot.segmentList))
+        for ring in outers:
+            self.assertGreater(ring_area(ring), 0)
+        for ring in holes:
+            self.assertLess(ring_area(ring), 0)
+        self.assertAlmostEqual(sum(ring_area(ring) for ring in outers + holes),
+                               lot.area)
+        if len(outers) > 0:
+            self.assertEqual([id(p) for p in lot.getPointList()],
+                             [id(p) for p in max(outers, key=ring_area)])
+        return outers, holes
+
+    def test_files(self):
+        for name in ('G001_solved.abi', 'G003_solved.abi', 'G004_solved.abi'):
+            geom, popu, algo = read(os.path.join(DATA, name))
+            for sol in popu.solutionList:
+                for lot in sol.lotList:
+                    outers, holes = self.checkRings(lot)
+                    self.assertEqual(len(holes), 0)
+
+    def largestLot(self, program):
+        """Check the rings of the lots of the solution of a program, and
+        return the rings of its largest lot."""
+        geom, popu, algo = readProgram(program)
+        sol = popu.solutionList[0]
+        for lot in sol.lotList:
+            self.checkRings(lot)
+        return max(sol.lotList, key=lambda lot: lot.area).getRings()
+
+    def test_courtyard(self):
+        # the elements around the middle one of a grid of 3 by 3
+        outers, holes = self.largestLot(grid(3, 3, 6.0, common=(5,),
+            solutions=(([5], [1, 2, 3, 4, 6, 7, 8, 9]),)))
+        self.assertEqual([len(ring) for ring in outers], [12])
+        self.assertEqual([len(ring) for ring in holes], [4])
+        self.assertAlmostEqual(ring_area(outers[0]), 9 * 36.0)
+        self.assertAlmostEqual(ring_area(holes[0]), -36.0)
+
+    def test_pinch(self):
+        # the courtyard touches the notch of a corner at one point
+        for corner in (1, 3, 7, 9):
+            others = [no for no in range(1, 10) if no not in (5, corner)]
+            outers, holes = self.largestLot(grid(3, 3, 6.0, common=(5,),
+                solutions=(([5], others, [corner]),)))
+            self.assertEqual([round(ring_area(ring)) for ring in outers],
+                             [288])
+            self.assertEqual([round(ring_area(ring)) for ring in holes],
+                             [-36])
+
+
+if __name__ == '__main__':
+    unittest.main()